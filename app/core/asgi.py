@@ -5,12 +5,52 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+
+Under ASGI the read endpoints with async actions run on the event loop, see
+core.async_views. Every request runs its queries on threads of its own, so
+connections go back to the pool at the end of each instead of staying with
+a thread that is gone: DATABASE_POOL is on unless set otherwise.
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
-
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+os.environ.setdefault('DATABASE_POOL', 'True')
+
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers import asgi
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """Reads streaming responses in the thread of their request. Django 4.1
+    reads them on the event loop, where the queries of a streamed queryset
+    are refused."""
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        headers = [
+            (
+                header.encode("ascii") if isinstance(header, str) else bytes(header),
+                value.encode("latin1") if isinstance(value, str) else bytes(value),
+            )
+            for header, value in response.items()
+        ]
+        headers += [
+            (b"Set-Cookie", cookie.output(header="").encode("ascii").strip())
+            for cookie in response.cookies.values()
+        ]
+        await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+        parts = iter(response)
+        read = sync_to_async(next, thread_sensitive=True)
+        while (part := await read(parts, None)) is not None:
+            for chunk, _ in self.chunk_bytes(part):
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body"})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+application = ASGIHandler()
@@ -0,0 +1,77 @@
+"""
+Async viewset actions, served when the application runs under ASGI.
+
+A viewset with AsyncViewSetMixin may define an async counterpart of any of
+its actions, named after it with an a prefix as Django names its async
+methods: alist for list, aget_summary for get_summary. With ASYNC_VIEWS on,
+which core/asgi.py turns on, the views the router makes of the viewset are
+async and run those on the event loop, so a request waiting on the database
+holds no thread of the server while others are served. Actions without an
+async counterpart run in a thread as Django runs sync views under ASGI.
+Under WSGI nothing changes.
+
+Async actions use the async ORM, and aconcurrently() for the queries they can
+run at the same time. Authentication, which may read the user, runs in a
+thread. The rest of DRF's request handling does not query and runs as it is:
+content negotiation, permissions, filters and the renderers.
+"""
+from functools import update_wrapper
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+
+class AsyncViewSetMixin:
+
+    @classmethod
+    def async_actions(cls, actions):
+        return {
+            method: action for method, action in actions.items()
+            if hasattr(cls, f"a{action}")
+        }
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        async_actions = cls.async_actions(actions or {})
+        if not settings.ASYNC_VIEWS or not async_actions:
+            return view
+        sync_view = sync_to_async(view)
+
+        async def async_view(request, *args, **kwargs):
+            if request.method.lower() not in async_actions:
+                return await sync_view(request, *args, **kwargs)
+            self = cls(**initkwargs)
+            self.action_map = actions
+            for method, action in actions.items():
+                setattr(self, method, getattr(self, action))
+            return await self.adispatch(request, *args, **kwargs)
+
+        # cls, initkwargs and actions, which the router, schema generation
+        # and the warmup read, and csrf_exempt
+        update_wrapper(async_view, view)
+        return async_view
+
+    async def adispatch(self, request, *args, **kwargs):
+        """dispatch() awaiting the async counterpart of the action"""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.perform_authentication)(request)
+            self.initial(request, *args, **kwargs)
+            handler = getattr(self, f"a{self.action}")
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def apaginate_queryset(self, queryset):
+        """paginate_queryset() of async actions"""
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.utils.crypto import constant_time_compare
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from rest_framework import authentication, exceptions
+
+
+TOKEN_SALT = "core.authentication.token"
+USER_CACHE_SIZE = 10000
+
+
+def issue_token(user):
+    """Signed, timestamped token carrying the user id and session auth hash.
+    Changing the password or deactivating the user revokes it."""
+    return signing.dumps(
+        {"id": user.pk, "hash": user.get_session_auth_hash()}, salt=TOKEN_SALT
+    )
+
+
+class UserCache:
+    """In-process cache of user records so token checks skip the database.
+    Entries expire after AUTH_USER_CACHE_TTL seconds, which bounds how long a
+    revoked token keeps working in a worker."""
+
+    def __init__(self, size=USER_CACHE_SIZE):
+        self.size = size
+        self.users = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.users.get(user_id)
+            if entry is not None and entry[1] > now:
+                self.users.move_to_end(user_id)
+                return entry[0]
+
+        user = get_user_model().objects.filter(pk=user_id).first()
+        with self.lock:
+            self.users[user_id] = (user, now + settings.AUTH_USER_CACHE_TTL)
+            self.users.move_to_end(user_id)
+            while len(self.users) > self.size:
+                self.users.popitem(last=False)
+        return user
+
+    def discard(self, user_id):
+        with self.lock:
+            self.users.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.users.clear()
+
+
+user_cache = UserCache()
+
+
+class SignedTokenAuthentication(authentication.BaseAuthentication):
+    """
+    Stateless token authentication.
+
+    Clients send "Authorization: Bearer <token>". The token signature and age
+    are checked in process and the user comes from the in-process user cache,
+    so an authenticated request costs no database round trip.
+    """
+
+    keyword = "Bearer"
+
+    def authenticate(self, request):
+        auth = authentication.get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed("Invalid token header")
+
+        try:
+            token = auth[1].decode()
+            payload = signing.loads(
+                token, salt=TOKEN_SALT, max_age=settings.AUTH_TOKEN_MAX_AGE
+            )
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed("Token has expired")
+        except (signing.BadSignature, UnicodeError):
+            raise exceptions.AuthenticationFailed("Invalid token")
+
+        user = user_cache.get(payload.get("id"))
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed("User inactive or deleted")
+        if not constant_time_compare(payload.get("hash", ""), user.get_session_auth_hash()):
+            raise exceptions.AuthenticationFailed("Token has been revoked")
+        return (user, token)
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+class SignedTokenScheme(OpenApiAuthenticationExtension):
+    target_class = SignedTokenAuthentication
+    name = "Bearer"
+
+    def get_security_definition(self, auto_schema):
+        return {"type": "http", "scheme": "bearer"}
@@ -0,0 +1,72 @@
+"""
+Benchmarks run with manage.py benchmark <suite>.
+
+A suite is a function taking the command's options and returning one dict
+of measurements per variant it compares. Suites create what they need for a
+throwaway user and delete it afterwards, so point them at a development or
+staging database, never at production.
+"""
+import json
+import os
+import subprocess
+import sys
+import uuid
+from contextlib import contextmanager
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from core.db.sharding import tenant
+
+
+SUITES = {
+    "dashboard": "core.benchmarks.dashboard.run",
+    "responses": "core.benchmarks.responses.run",
+    "serializers": "core.benchmarks.serializers.run",
+    "servers": "core.benchmarks.servers.run",
+    "startup": "core.benchmarks.startup.run",
+    "writes": "core.benchmarks.writes.run",
+}
+
+
+@contextmanager
+def benchmark_user():
+    """A new user, the tenant of the queries run inside, deleted with
+    everything it owns on the way out"""
+    user = User.objects.create_user(f"benchmark-{uuid.uuid4().hex[:12]}")
+    try:
+        with tenant(user):
+            yield user
+    finally:
+        user.delete()
+
+
+def run_script(source, *args, **environ):
+    """JSON printed last by the Python source run in a new process, with
+    args and the environment given added to this one's. It shares this
+    process's secret key, so that tokens issued here are valid there."""
+    environ = dict(
+        os.environ,
+        SECRET_KEY=settings.SECRET_KEY,
+        DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "core.settings"),
+        **environ,
+    )
+    process = subprocess.run(
+        [sys.executable, "-c", source, *args],
+        cwd=settings.BASE_DIR, env=environ, capture_output=True, text=True,
+    )
+    if process.returncode:
+        raise RuntimeError(f"benchmark process failed:\n{process.stderr}")
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+def wal_position(using="default"):
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT pg_current_wal_insert_lsn()")
+        return cursor.fetchone()[0]
+
+
+def wal_bytes(start, using="default"):
+    """WAL written on the database since start, by every session"""
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT pg_wal_lsn_diff(pg_current_wal_insert_lsn(), %s)", [start])
+        return int(cursor.fetchone()[0])
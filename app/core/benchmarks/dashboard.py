@@ -0,0 +1,120 @@
+"""
+Time the POS home screen takes to load its data: with the five requests it
+made before order/dashboard/, and with the dashboard, reading its sections
+one after the other and concurrently. Each query takes ROUND_TRIP_SECONDS
+longer, the round trip to a database on another host, which is what the
+concurrent sections save.
+"""
+import statistics
+import time
+from unittest import mock
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.utils import timezone
+from core.authentication import issue_token
+from inventory.models import ProductInventory
+from order.models import Cart, Customer, Notification, Order, OrderItem
+from . import benchmark_user
+
+
+ROUND_TRIP_SECONDS = 0.002
+HOME_SCREEN = [
+    "/api/v1/inventorysummary/",
+    "/api/v1/ordercart/cart-details/",
+    "/api/v1/ordernotification/",
+    "/api/v1/ordernotification/restock-notice/",
+    "/api/v1/ordersales/?start={today}",
+]
+
+
+def round_trip(execute, sql, params, many, context):
+    time.sleep(ROUND_TRIP_SECONDS)
+    return execute(sql, params, many, context)
+
+
+def add_round_trip(connection, **kwargs):
+    if round_trip not in connection.execute_wrappers:
+        connection.execute_wrappers.append(round_trip)
+
+
+def in_turn(*functions):
+    return [function() for function in functions]
+
+
+def seed(user):
+    products = ProductInventory.objects.bulk_create([
+        ProductInventory(
+            name=f"benchmark {number}",
+            cost_price=5 + number % 7,
+            selling_price=8 + number % 11,
+            current_quantity=100 if number % 3 else 1,
+            minimum_stock_quantity=5,
+            category="benchmark",
+            created_by=user,
+        )
+        for number in range(200)
+    ])
+    Cart.objects.bulk_create([
+        Cart(product=product, selling_price=product.selling_price, total_price=product.selling_price, created_by=user)
+        for product in products[:10]
+    ])
+    Notification.objects.bulk_create([
+        Notification(receiver=user, product=product, text="benchmark", type="MSQ")
+        for product in products[:50]
+    ])
+    order = Order.objects.create(
+        customer=Customer.objects.create(customer_name="benchmark", created_by=user), created_by=user
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            product=product,
+            order=order,
+            product_cost_price=product.cost_price,
+            selling_price=product.selling_price,
+            total_price=product.selling_price,
+            created_by=user,
+        )
+        for product in products[:20]
+    ])
+
+
+def measure(client, paths, rounds):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for path in paths:
+            response = client.get(path)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} answered {response.status_code}")
+        timings.append(time.perf_counter() - started)
+    return {
+        "requests": len(paths),
+        "p50_ms": round(statistics.median(timings) * 1000, 1),
+        "max_ms": round(max(timings) * 1000, 1),
+    }
+
+
+def run(options):
+    with benchmark_user() as user:
+        seed(user)
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {issue_token(user)}")
+        connection_created.connect(add_round_trip)
+        connections.close_all()
+        try:
+            today = timezone.now().strftime("%Y-%m-%dT00:00:00Z")
+            paths = [path.format(today=today) for path in HOME_SCREEN]
+            results = [{"variant": "five requests", **measure(client, paths, options["rounds"])}]
+            with mock.patch("order.dashboard.concurrently", in_turn):
+                results.append({
+                    "variant": "dashboard, sections in turn",
+                    **measure(client, ["/api/v1/orderdashboard/"], options["rounds"]),
+                })
+            results.append({
+                "variant": "dashboard",
+                **measure(client, ["/api/v1/orderdashboard/"], options["rounds"]),
+            })
+        finally:
+            connection_created.disconnect(add_round_trip)
+            connections.close_all()
+    return results
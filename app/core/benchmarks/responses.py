@@ -0,0 +1,80 @@
+"""
+Time to the first byte, total time and peak Python memory of a response
+listing rounds pages worth of products: built whole by the model serializer
+and JSONRenderer, built whole from rows by FastJSONRenderer, and streamed as
+the export action does. Peak memory is measured in a separate pass, tracing
+allocations slows everything down.
+"""
+import time
+import tracemalloc
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from core.renderers import ROWS, STREAM_CHUNK_ROWS, FastJSONRenderer, StreamingJSONResponse
+from inventory.models import ProductInventory
+from inventory.serializers import ProductListInventorySerializer, ProductRowSerializer
+from . import benchmark_user
+
+
+def model_serializer(queryset):
+    data = ProductListInventorySerializer(queryset.prefetch_related("labels"), many=True).data
+    yield JSONRenderer().render(data)
+
+
+def row_serializer(queryset):
+    yield FastJSONRenderer().render(ProductRowSerializer(ProductRowSerializer.values(queryset)).data)
+
+
+def streamed(queryset):
+    rows = ProductRowSerializer.values(queryset).iterator(chunk_size=STREAM_CHUNK_ROWS)
+    response = StreamingJSONResponse(ROWS, map(ProductRowSerializer.encode, rows))
+    # the opening bracket goes out before the query runs, time the first rows
+    chunks = iter(response.streaming_content)
+    yield next(chunks) + next(chunks)
+    yield from chunks
+
+
+def measure(respond, queryset):
+    started = time.perf_counter()
+    chunks = respond(queryset)
+    size = len(next(chunks))
+    first_byte = time.perf_counter() - started
+    for chunk in chunks:
+        size += len(chunk)
+    seconds = time.perf_counter() - started
+
+    tracemalloc.start()
+    for chunk in respond(queryset):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "bytes": size,
+        "first_byte_ms": round(first_byte * 1000),
+        "total_ms": round(seconds * 1000),
+        "peak_kb": round(peak / 1024),
+    }
+
+
+def run(options):
+    count = options["rounds"] * settings.REST_FRAMEWORK["PAGE_SIZE"]
+    with benchmark_user() as user:
+        ProductInventory.objects.bulk_create([
+            ProductInventory(
+                name=f"benchmark {number}",
+                cost_price=5 + number % 7,
+                selling_price=8 + number % 11,
+                current_quantity=100,
+                category="benchmark",
+                created_by=user,
+            )
+            for number in range(count)
+        ], batch_size=1000)
+        queryset = ProductInventory.objects.filter(created_by=user).order_by("name")
+        return [
+            {"variant": variant, "products": count, **measure(respond, queryset)}
+            for variant, respond in (
+                ("model serializer", model_serializer),
+                ("row serializer", row_serializer),
+                ("streamed", streamed),
+            )
+        ]
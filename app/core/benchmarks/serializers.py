@@ -0,0 +1,109 @@
+"""
+Rows per second of the list endpoints' ModelSerializers against the row
+serializers that replace them. A round serializes one page of products,
+cart items and notifications the way the list views do, queries included,
+and both variants must render the same JSON. Products are also measured
+with their labels prefetched, the best the model serializer can do.
+"""
+import time
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from inventory.models import Label, ProductInventory
+from inventory.serializers import ProductListInventorySerializer, ProductRowSerializer
+from order.models import Cart, Notification
+from order.serializers import (
+    CartRowSerializer,
+    CartSerializer,
+    NotificationListSerializer,
+    NotificationRowSerializer,
+)
+from . import benchmark_user
+
+
+def seed(user, size):
+    labels = Label.objects.bulk_create([
+        Label(name=f"benchmark {priority}", value="benchmark", description="", priority=priority)
+        for priority in range(3)
+    ])
+    products = ProductInventory.objects.bulk_create([
+        ProductInventory(
+            name=f"benchmark {number}",
+            cost_price=5 + number % 7,
+            selling_price=8 + number % 11,
+            current_quantity=100,
+            minimum_stock_quantity=number % 5 or None,
+            category="benchmark",
+            created_by=user,
+        )
+        for number in range(size)
+    ])
+    ProductInventory.labels.through.objects.bulk_create([
+        ProductInventory.labels.through(productinventory=product, label=label)
+        for product in products for label in labels[:2]
+    ])
+    Cart.objects.bulk_create([
+        Cart(product=product, selling_price=product.selling_price, total_price=product.selling_price, created_by=user)
+        for product in products
+    ])
+    Notification.objects.bulk_create([
+        Notification(receiver=user, product=product if number % 2 else None, text="benchmark", type="MSQ")
+        for number, product in enumerate(products)
+    ])
+    return labels
+
+
+def serialize_instances(serializer, queryset, size):
+    return serializer(list(queryset[:size]), many=True).data
+
+
+def serialize_rows(serializer, queryset, size):
+    rows = serializer.values(queryset)
+    return serializer(list(rows[:size])).data
+
+
+def measure(function, serializer, queryset, size, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        data = function(serializer, queryset, size)
+    seconds = time.perf_counter() - started
+    return JSONRenderer().render(data), round(rounds * size / seconds)
+
+
+def compare(name, queryset, model_serializer, row_serializer, size, rounds, model_queryset=None):
+    if model_queryset is None:
+        model_queryset = queryset
+    expected, model_rate = measure(serialize_instances, model_serializer, model_queryset, size, rounds)
+    output, row_rate = measure(serialize_rows, row_serializer, queryset, size, rounds)
+    if output != expected:
+        raise AssertionError(f"{row_serializer.__name__} output differs from {model_serializer.__name__}")
+    return [
+        {"variant": f"{name} model serializer", "rows_per_s": model_rate},
+        {"variant": f"{name} row serializer", "rows_per_s": row_rate, "speedup": round(row_rate / model_rate, 1)},
+    ]
+
+
+def run(options):
+    rounds = options["rounds"]
+    size = settings.REST_FRAMEWORK["PAGE_SIZE"]
+    results = []
+    with benchmark_user() as user:
+        labels = seed(user, size)
+        try:
+            products = ProductInventory.objects.filter(created_by=user)
+            results += compare(
+                "products", products, ProductListInventorySerializer, ProductRowSerializer, size, rounds
+            )
+            results += compare(
+                "prefetched products", products, ProductListInventorySerializer, ProductRowSerializer,
+                size, rounds, model_queryset=products.prefetch_related("labels"),
+            )
+            results += compare(
+                "cart", Cart.objects.filter(created_by=user), CartSerializer, CartRowSerializer, size, rounds
+            )
+            results += compare(
+                "notifications", Notification.objects.filter(receiver=user),
+                NotificationListSerializer, NotificationRowSerializer, size, rounds,
+            )
+        finally:
+            Label.objects.filter(pk__in=[label.pk for label in labels]).delete()
+    return results
@@ -0,0 +1,193 @@
+"""
+Throughput of the WSGI and the ASGI application under a mix of slow and fast
+requests to the endpoints with async actions. A SLOW_SHARE of the requests,
+picked at random, stand for slow reports: each of their queries takes
+SLOW_QUERY_SECONDS longer. CLIENTS clients keep a request each in flight,
+rounds requests in all, against each application loaded in a new process.
+
+The WSGI application is served by WSGI_WORKERS threads taking a request at a
+time, as many sync gunicorn workers would: slow requests hold a worker while
+the fast ones queue. The ASGI application is called on an event loop, as
+uvicorn would, with its defaults: async views and pooled connections. Both
+run in one process, so neither gains from more CPUs than the other.
+"""
+import json
+import random
+import statistics
+from django.conf import settings
+from core.authentication import issue_token
+from inventory.models import ProductInventory
+from order.models import Notification
+from . import benchmark_user, run_script
+
+
+CLIENTS = 16
+WSGI_WORKERS = 4
+SLOW_SHARE = 0.1
+SLOW_QUERY_SECONDS = 0.5
+
+# run in the new process, prints the latencies of the requests as JSON
+WORKER = """
+import asyncio, json, os, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+server, clients, workers, delay = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), float(sys.argv[4])
+requests = json.loads(sys.argv[5])
+authorization = "Bearer " + os.environ["BENCHMARK_TOKEN"]
+if server == "asgi":
+    from core.asgi import application
+else:
+    from core.wsgi import application
+from django.db.backends.signals import connection_created
+from core.db.sharding import current_request
+
+def slow_query(execute, sql, params, many, context):
+    request = current_request.get()
+    if request is not None and "X-Benchmark-Slow" in request.headers:
+        time.sleep(delay)
+    return execute(sql, params, many, context)
+
+def add_slow_query(connection, **kwargs):
+    if slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query)
+
+connection_created.connect(add_slow_query)
+
+def wsgi(path, slow):
+    environ = {
+        "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": "", "SERVER_NAME": "testserver",
+        "SERVER_PORT": "80", "HTTP_HOST": "testserver", "HTTP_AUTHORIZATION": authorization,
+        "wsgi.url_scheme": "http", "wsgi.input": sys.stdin.buffer, "wsgi.errors": sys.stderr,
+    }
+    if slow:
+        environ["HTTP_X_BENCHMARK_SLOW"] = "1"
+    statuses = []
+    response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    body = b"".join(response)
+    response.close()
+    return int(statuses[0][:3]), body
+
+async def asgi(path, slow):
+    headers = [(b"host", b"testserver"), (b"authorization", authorization.encode())]
+    if slow:
+        headers.append((b"x-benchmark-slow", b"1"))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": headers, "server": ("testserver", 80), "client": ("127.0.0.1", 0),
+    }
+    received = asyncio.Event()
+    async def receive():
+        if received.is_set():
+            await asyncio.Event().wait()
+        received.set()
+        return {"type": "http.request", "body": b"", "more_body": False}
+    statuses = []
+    body = []
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+        else:
+            body.append(message.get("body", b""))
+    await application(scope, receive, send)
+    return statuses[0], b"".join(body)
+
+latencies = [None] * len(requests)
+
+def record(index, started, response):
+    status, body = response
+    if status != 200:
+        raise SystemExit(f"{requests[index][0]} answered {status}: {body[:1000]}")
+    latencies[index] = time.perf_counter() - started
+
+if server == "asgi":
+    async def client(queue):
+        while queue:
+            index = queue.pop()
+            started = time.perf_counter()
+            record(index, started, await asgi(*requests[index]))
+
+    async def load():
+        queue = list(reversed(range(len(requests))))
+        await asyncio.gather(*(client(queue) for _ in range(clients)))
+
+    started = time.perf_counter()
+    asyncio.run(load())
+else:
+    server_threads = ThreadPoolExecutor(workers)
+    queue = list(reversed(range(len(requests))))
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            with lock:
+                if not queue:
+                    return
+                index = queue.pop()
+            started = time.perf_counter()
+            record(index, started, server_threads.submit(wsgi, *requests[index]).result())
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as client_threads:
+        for future in [client_threads.submit(client) for _ in range(clients)]:
+            future.result()
+print(json.dumps({"seconds": time.perf_counter() - started, "latencies": latencies}))
+"""
+
+
+def seed(user):
+    products = ProductInventory.objects.bulk_create([
+        ProductInventory(
+            name=f"benchmark {number}",
+            cost_price=5 + number % 7,
+            selling_price=8 + number % 11,
+            current_quantity=100 if number % 3 else 1,
+            minimum_stock_quantity=5,
+            category="benchmark",
+            created_by=user,
+        )
+        for number in range(settings.REST_FRAMEWORK["PAGE_SIZE"] * 2)
+    ])
+    Notification.objects.bulk_create([
+        Notification(receiver=user, product=product, text="benchmark", type="MSQ")
+        for product in products
+    ])
+    return products
+
+
+def milliseconds(values, quantile):
+    return round(statistics.quantiles(values, n=100)[quantile - 1] * 1000, 1)
+
+
+def run(options):
+    with benchmark_user() as user:
+        products = seed(user)
+        paths = [
+            "/api/v1/inventory",
+            f"/api/v1/inventory{products[0].pk}/",
+            "/api/v1/inventorysummary/",
+            "/api/v1/ordernotification/",
+            "/api/v1/ordernotification/restock-notice/",
+        ]
+        picks = random.Random(0)
+        requests = [
+            (paths[number % len(paths)], picks.random() < SLOW_SHARE)
+            for number in range(options["rounds"])
+        ]
+        results = []
+        for server in ("wsgi", "asgi"):
+            run = run_script(
+                WORKER, server, str(CLIENTS), str(WSGI_WORKERS), str(SLOW_QUERY_SECONDS),
+                json.dumps(requests), BENCHMARK_TOKEN=issue_token(user),
+            )
+            fast = [latency for latency, (_, slow) in zip(run["latencies"], requests) if not slow]
+            slow = [latency for latency, (_, slow) in zip(run["latencies"], requests) if slow]
+            results.append({
+                "variant": server,
+                "requests": len(requests),
+                "requests_per_s": round(len(requests) / run["seconds"], 1),
+                "fast_p50_ms": milliseconds(fast, 50),
+                "fast_p99_ms": milliseconds(fast, 99),
+                "slow_p50_ms": milliseconds(slow, 50),
+            })
+    return results
@@ -0,0 +1,74 @@
+"""
+Cold start of a worker: each round starts a new Python process that loads
+the WSGI application and requests a few list endpoints twice. Measured are
+the time from starting the process to the application ready to serve, the
+first request, the first and the second pass over the endpoints, without
+and with the warmup gunicorn runs before a worker takes traffic. Rounds
+are processes, pass a small --rounds.
+"""
+import json
+import statistics
+import time
+from core.authentication import issue_token
+from . import benchmark_user, run_script
+
+
+PATHS = ["/api/v1/inventory", "/api/v1/ordercart/", "/api/v1/ordernotification/"]
+
+# run in the new process, prints its measurements as JSON
+WORKER = """
+import json, os, sys, time
+from wsgiref.util import setup_testing_defaults
+
+spawned = float(os.environ["BENCHMARK_SPAWNED"])
+from core.wsgi import application
+if sys.argv[1] == "warmed":
+    from core import warmup
+    warmup.warm_up()
+    warmup.connect()
+ready = time.time() - spawned
+
+def request(path):
+    environ = {"PATH_INFO": path, "HTTP_AUTHORIZATION": "Bearer " + os.environ["BENCHMARK_TOKEN"]}
+    setup_testing_defaults(environ)
+    started = time.perf_counter()
+    statuses = []
+    response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    for chunk in response:
+        pass
+    response.close()
+    if not statuses[0].startswith("200"):
+        raise SystemExit(f"{path} answered {statuses[0]}")
+    return time.perf_counter() - started
+
+passes = [[request(path) for path in json.loads(sys.argv[2])] for _ in range(2)]
+print(json.dumps({"ready": ready, "passes": passes}))
+"""
+
+
+def start(variant, token):
+    return run_script(
+        WORKER, variant, json.dumps(PATHS),
+        BENCHMARK_TOKEN=token, BENCHMARK_SPAWNED=repr(time.time()),
+    )
+
+
+def milliseconds(values):
+    return round(statistics.median(values) * 1000, 1)
+
+
+def run(options):
+    with benchmark_user() as user:
+        token = issue_token(user)
+        results = []
+        for variant in ("cold", "warmed"):
+            runs = [start(variant, token) for _ in range(options["rounds"])]
+            results.append({
+                "variant": variant,
+                "processes": len(runs),
+                "ready_ms": milliseconds([run["ready"] for run in runs]),
+                "first_request_ms": milliseconds([run["passes"][0][0] for run in runs]),
+                "first_pass_ms": milliseconds([sum(run["passes"][0]) for run in runs]),
+                "second_pass_ms": milliseconds([sum(run["passes"][1]) for run in runs]),
+            })
+    return results
@@ -0,0 +1,88 @@
+"""
+Statements and WAL written by everyday saves, with every column written as
+Django does by default and with only the changed ones. A round fills a cart,
+totals it, restocks the product, edits its price, submits the same edit
+again and marks a notification read twice.
+"""
+import time
+from django.db import connections, router
+from core.db.tracking import writing_every_column
+from inventory.models import ProductInventory
+from order.models import Cart, Notification
+from . import benchmark_user, wal_bytes, wal_position
+
+
+def play(user, product, notification):
+    cart = Cart.objects.create_cart(product, product.selling_price, user)
+    cart.add_to_cart()
+    cart.add_to_cart()
+    cart.get_total_price()
+    product.restock(100)
+
+    # what a serializer update sends: every field, one of them changed, then
+    # the same form submitted again
+    for price in (product.selling_price + 1, product.selling_price + 1):
+        for field in ("name", "category", "cost_price", "default_quantity", "minimum_stock_quantity"):
+            setattr(product, field, getattr(product, field))
+        product.selling_price = price
+        product.save()
+
+    for _ in range(2):
+        notification.status = "READ"
+        notification.save()
+    cart.delete()
+
+
+class StatementCounter:
+    def __init__(self):
+        self.statements = 0
+        self.updates = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.statements += 1
+        self.updates += sql.startswith("UPDATE")
+        return execute(sql, params, many, context)
+
+
+def measure(user, rounds, label):
+    product = ProductInventory.objects.create(
+        name=f"benchmark {label}",
+        cost_price=5,
+        selling_price=8,
+        current_quantity=100,
+        category="benchmark",
+        created_by=user,
+    )
+    notifications = Notification.objects.bulk_create(
+        [Notification(receiver=user, text="benchmark", type="MSQ") for _ in range(rounds)]
+    )
+    # rows as read back by a request
+    product = ProductInventory.objects.get(pk=product.pk)
+    notifications = list(Notification.objects.filter(pk__in=[n.pk for n in notifications]))
+
+    using = router.db_for_write(ProductInventory)
+    start = wal_position(using)
+    started = time.perf_counter()
+    counter = StatementCounter()
+    with connections[using].execute_wrapper(counter):
+        for notification in notifications:
+            play(user, product, notification)
+    seconds = time.perf_counter() - started
+    return {
+        "statements": counter.statements,
+        "updates": counter.updates,
+        "wal_kb": round(wal_bytes(start, using) / 1024),
+        "ms_per_round": round(seconds * 1000 / rounds, 2),
+    }
+
+
+def run(options):
+    rounds = options["rounds"]
+    with benchmark_user() as user:
+        with writing_every_column():
+            every_column = measure(user, rounds, "every column")
+        changed_columns = measure(user, rounds, "changed columns")
+    return [
+        {"variant": "every column", **every_column},
+        {"variant": "changed columns", **changed_columns},
+    ]
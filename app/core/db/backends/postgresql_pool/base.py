@@ -0,0 +1,68 @@
+"""
+PostgreSQL backend that checks connections out of a per-process pool.
+
+Configured through the POOL entry of the database settings:
+
+    "POOL": {
+        "MIN_SIZE": 2,         # connections opened when the pool is first used
+        "MAX_SIZE": 10,        # hard cap per worker process
+        "MAX_LIFETIME": 1800,  # seconds before a connection is recycled
+        "TIMEOUT": 10,         # seconds to wait for a free connection
+        "CHECK_IDLE": 10,      # ping connections idle at least this long
+    }
+
+Closing a Django connection returns it to the pool, so CONN_MAX_AGE should be
+0 to hand connections back at the end of every request.
+"""
+from django.db.backends.postgresql import base
+from core.db.pool import close_pools, get_pool
+
+
+class DatabaseCreation(base.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+    connection_pool = None
+
+    def get_pool(self, conn_params):
+        options = self.settings_dict.get("POOL") or {}
+        return get_pool(
+            self.alias,
+            conn_params,
+            lambda: base.Database.connect(**conn_params),
+            min_size=options.get("MIN_SIZE", 0),
+            max_size=options.get("MAX_SIZE", 10),
+            max_lifetime=options.get("MAX_LIFETIME", 1800),
+            timeout=options.get("TIMEOUT", 10),
+            check_idle=options.get("CHECK_IDLE", 10),
+        )
+
+    def get_new_connection(self, conn_params):
+        pool = self.get_pool(conn_params)
+        pool.fill()
+        connection = pool.getconn()
+        self.connection_pool = pool
+
+        options = self.settings_dict["OPTIONS"]
+        try:
+            self.isolation_level = options["isolation_level"]
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        base.psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                if self.connection_pool is None:
+                    return self.connection.close()
+                return self.connection_pool.putconn(self.connection)
@@ -0,0 +1,75 @@
+"""
+Independent queries run at the same time.
+
+A Django connection belongs to the thread that opened it and runs one query
+at a time, so the queries of a request run one after the other, in the async
+ORM of Django 4.1 too. concurrently(), or aconcurrently() in async code, runs
+each function it is given in a thread of its own instead, so on a connection
+of its own, with the caller's context: tenant and replica routing apply as
+they would in the caller. A thread closes its connections once the function
+returns, which hands them back to the pool with DATABASE_POOL. Kept for
+CONN_MAX_AGE instead, every thread of every worker would hold a connection
+idle between requests.
+
+The caller hands its pooled connections back before it waits for the
+threads, unless it is in a transaction: holding one while waiting for
+others, every request in flight could hold a connection of a full pool that
+the threads of none of them get.
+
+The threads come from a pool of CONCURRENT_QUERY_THREADS shared by the
+process, as many as the connections of its database pool by default: more
+would only wait for a connection. The default executor of asyncio, a few
+threads per CPU, would make the queries of fast requests wait behind slow
+ones.
+"""
+import asyncio
+import contextvars
+from asgiref.sync import sync_to_async
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from django.conf import settings
+from django.db import connections
+
+
+@lru_cache(maxsize=None)
+def executor():
+    return ThreadPoolExecutor(settings.CONCURRENT_QUERY_THREADS, thread_name_prefix="query")
+
+
+def release_connections():
+    for connection in connections.all(initialized_only=True):
+        pooled = getattr(connection, "connection_pool", None) is not None
+        if pooled and not connection.in_atomic_block:
+            connection.close()
+
+
+def managing_connections(function):
+    def run():
+        try:
+            return function()
+        finally:
+            for connection in connections.all(initialized_only=True):
+                connection.close()
+    return run
+
+
+def concurrently(*functions):
+    """Results of the functions, called concurrently, in order"""
+    release_connections()
+    futures = [
+        executor().submit(contextvars.copy_context().run, managing_connections(function))
+        for function in functions
+    ]
+    return [future.result() for future in futures]
+
+
+async def aconcurrently(*functions):
+    """concurrently() for async code"""
+    await sync_to_async(release_connections)()
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(
+        loop.run_in_executor(
+            executor(), contextvars.copy_context().run, managing_connections(function)
+        )
+        for function in functions
+    ))
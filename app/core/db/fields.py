@@ -0,0 +1,45 @@
+"""
+Columns the database computes from the other columns of their row.
+
+A generated column is declared with its SQL expression and stored, so it can
+be indexed and filtered on like any other column. Django never writes a
+value to it: saves send DEFAULT, which is all PostgreSQL accepts for a
+generated column, inserts read the computed value back and updates leave it
+to be loaded when it is next read.
+"""
+from django.db import models
+from django.db.models.expressions import Expression
+
+
+class Default(Expression):
+    """The DEFAULT keyword as the value of a column in an insert or update"""
+
+    def as_sql(self, compiler, connection):
+        return "DEFAULT", []
+
+
+class GeneratedBooleanField(models.BooleanField):
+    """Boolean column GENERATED ALWAYS AS (expression) STORED"""
+
+    generated = True
+    db_returning = True
+
+    def __init__(self, *args, expression, **kwargs):
+        self.expression = expression
+        kwargs["editable"] = False
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs.pop("editable", None)
+        kwargs["expression"] = self.expression
+        return name, path, args, kwargs
+
+    def db_type(self, connection):
+        return f"{super().db_type(connection)} GENERATED ALWAYS AS ({self.expression}) STORED"
+
+    def pre_save(self, model_instance, add):
+        # the value held is stale once saved, inserts return the new one
+        # and after an update it is loaded again on first access
+        model_instance.__dict__.pop(self.attname, None)
+        return Default()
@@ -0,0 +1,210 @@
+"""
+Monthly range partitions for tables partitioned by a timestamp column.
+
+Partitioned tables are created by hand in their migration, or converted by
+rebuild_table in one, with a DEFAULT partition, so inserts never fail for a
+month without a partition. Monthly partitions named <table>_pYYYYMM are
+created ahead of time; rows that already landed in the default partition for
+that month are moved into the new one.
+
+Models stored in a partitioned table set partition_by to the partition
+column. The primary key of the table includes that column.
+manage.py manage_partitions keeps the partitions of all of them in shape.
+Models can also set partition_keep to the filters of rows that must outlive
+the retention of their table: the partition of a month holding any of them
+is not expired.
+"""
+from datetime import date, datetime, time, timezone as dt_timezone
+from django.apps import apps
+from django.db import connections, transaction
+from django.utils import timezone
+
+
+def partitioned_models():
+    return [model for model in apps.get_models() if getattr(model, "partition_by", None)]
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(day, months):
+    years, month = divmod(day.month - 1 + months, 12)
+    return date(day.year + years, month + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def default_partition_name(table):
+    return f"{table}_default"
+
+
+def create_monthly_partition(table, column, month, using="default"):
+    """Creates the partition of table holding month, returns False when it
+    exists already"""
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    name = partition_name(table, month)
+    start, end = month_start(month), add_months(month, 1)
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is not None:
+            return False
+        cursor.execute(
+            f"CREATE TABLE {quote(name)} "
+            f"(LIKE {quote(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {quote(default_partition_name(table))} "
+            f"WHERE {quote(column)} >= %s AND {quote(column)} < %s RETURNING *) "
+            f"INSERT INTO {quote(name)} SELECT * FROM moved",
+            [start, end],
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+    return True
+
+
+def ensure_monthly_partitions(model, months_ahead=2, using="default"):
+    """Creates the partitions of model for this month and the months_ahead
+    following ones, returns the names of the partitions created"""
+    table = model._meta.db_table
+    this_month = month_start(timezone.now().date())
+    created = []
+    for months in range(months_ahead + 1):
+        month = add_months(this_month, months)
+        if create_monthly_partition(table, model.partition_by, month, using=using):
+            created.append(partition_name(table, month))
+    return created
+
+
+def monthly_partitions(table, using="default"):
+    """(month, name) of the monthly partitions attached to table"""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass",
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    prefix = f"{table}_p"
+    partitions = []
+    for name in names:
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            partitions.append((date(int(suffix[:4]), int(suffix[4:]), 1), name))
+    return sorted(partitions)
+
+
+def holds_kept_rows(model, month, using="default"):
+    """Whether the partition of model holding month has rows matching the
+    model's partition_keep filters"""
+    keep = getattr(model, "partition_keep", None)
+    if not keep:
+        return False
+    column = model.partition_by
+    start, end = (
+        datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+        for day in (month_start(month), add_months(month, 1))
+    )
+    return model._default_manager.using(using).filter(
+        **{f"{column}__gte": start, f"{column}__lt": end}, **keep
+    ).exists()
+
+
+def detach_partition(table, name, drop=False, using="default"):
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}")
+        if drop:
+            cursor.execute(f"DROP TABLE {quote(name)}")
+
+
+def rebuild_table(schema_editor, model, partition_by=None, months_ahead=2):
+    """
+    Rebuilds the table of model range partitioned by month on the
+    partition_by column, or back into a plain table without partition_by.
+    Rows, indexes and foreign keys are carried over, so run it in a
+    migration while the table is not written to. Tables other tables
+    reference, or with unique constraints besides the primary key, are not
+    supported.
+    """
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    rebuilt = f"{table}_rebuild"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM pg_constraint "
+            "WHERE (confrelid = %s::regclass AND contype = 'f') "
+            "OR (conrelid = %s::regclass AND contype IN ('u', 'x'))",
+            [table, table],
+        )
+        if cursor.fetchone()[0]:
+            raise ValueError(f"{table} has unique constraints or is referenced by foreign keys")
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            "SELECT i.relname, pg_get_indexdef(i.oid) FROM pg_index x "
+            "JOIN pg_class i ON i.oid = x.indexrelid "
+            "WHERE x.indrelid = %s::regclass AND NOT x.indisprimary",
+            [table],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'",
+            [table],
+        )
+        primary_key = cursor.fetchone()[0]
+
+        for name, _ in indexes:
+            cursor.execute(f"DROP INDEX {quote(name)}")
+        cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(rebuilt)}")
+        cursor.execute(
+            f"ALTER TABLE {quote(rebuilt)} RENAME CONSTRAINT {quote(primary_key)} "
+            f"TO {quote(rebuilt + '_pkey')}"
+        )
+
+        key = [model._meta.pk.column]
+        partitioning = ""
+        if partition_by:
+            key.append(partition_by)
+            partitioning = f" PARTITION BY RANGE ({quote(partition_by)})"
+        cursor.execute(
+            f"CREATE TABLE {quote(table)} (LIKE {quote(rebuilt)} "
+            f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS){partitioning}"
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(primary_key)} "
+            f"PRIMARY KEY ({', '.join(quote(column) for column in key)})"
+        )
+
+        if partition_by:
+            cursor.execute(
+                f"CREATE TABLE {quote(default_partition_name(table))} "
+                f"PARTITION OF {quote(table)} DEFAULT"
+            )
+            cursor.execute(f"SELECT min({quote(partition_by)}) FROM {quote(rebuilt)}")
+            oldest = cursor.fetchone()[0]
+            this_month = month_start(timezone.now().date())
+            month = month_start(oldest.date()) if oldest else this_month
+            while month <= add_months(this_month, months_ahead):
+                create_monthly_partition(table, partition_by, month, using=connection.alias)
+                month = add_months(month, 1)
+
+        cursor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(rebuilt)}")
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}")
+        cursor.execute(f"DROP TABLE {quote(rebuilt)}")
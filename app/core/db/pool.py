@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+from collections import deque
+from psycopg2 import Error, OperationalError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class ConnectionPool:
+    """Thread safe pool of psycopg2 connections.
+
+    Checkout hands out the most recently returned idle connection, opens a new
+    one while fewer than max_size exist, or waits up to timeout seconds for
+    one to be returned. Connections idle longer than check_idle seconds are
+    pinged before being handed out and connections older than max_lifetime
+    are closed instead of being reused.
+    """
+
+    def __init__(self, connect, min_size=0, max_size=10, max_lifetime=1800, timeout=10, check_idle=10):
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self.condition = threading.Condition()
+        # idle connections as (connection, created_at, returned_at)
+        self.idle = deque()
+        self.created_at = {}
+        self.size = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.timeouts = 0
+        self.opened = 0
+        self.discarded = 0
+
+    def fill(self):
+        """Opens connections up to min_size"""
+        while True:
+            with self.condition:
+                if self.size >= self.min_size:
+                    return
+                self.size += 1
+            connection = self.open()
+            self.putconn(connection)
+
+    def open(self):
+        try:
+            connection = self.connect()
+        except Exception:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.created_at[id(connection)] = time.monotonic()
+            self.opened += 1
+        return connection
+
+    def getconn(self):
+        started = time.monotonic()
+        while True:
+            idle = None
+            with self.condition:
+                while not self.idle and self.size >= self.max_size:
+                    remaining = self.timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(
+                            f"No database connection available within {self.timeout}s"
+                        )
+                    self.condition.wait(remaining)
+                if self.idle:
+                    idle = self.idle.pop()
+                else:
+                    self.size += 1
+
+            if idle is None:
+                connection = self.open()
+            else:
+                connection, created_at, returned_at = idle
+                if not self.is_healthy(connection, created_at, returned_at):
+                    self.discard(connection)
+                    continue
+            self.record_checkout(time.monotonic() - started)
+            return connection
+
+    def putconn(self, connection):
+        healthy = not connection.closed
+        if healthy and connection.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except Error:
+                healthy = False
+        created_at = self.created_at.get(id(connection), 0)
+        if not healthy or self.is_expired(created_at):
+            self.discard(connection)
+            return
+        with self.condition:
+            self.idle.append((connection, created_at, time.monotonic()))
+            self.condition.notify()
+
+    def discard(self, connection):
+        try:
+            connection.close()
+        except Error:
+            pass
+        with self.condition:
+            self.created_at.pop(id(connection), None)
+            self.size -= 1
+            self.discarded += 1
+            self.condition.notify()
+
+    def is_expired(self, created_at):
+        return time.monotonic() - created_at >= self.max_lifetime
+
+    def is_healthy(self, connection, created_at, returned_at):
+        if connection.closed or self.is_expired(created_at):
+            return False
+        if time.monotonic() - returned_at < self.check_idle:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except Error:
+            return False
+        return True
+
+    def record_checkout(self, waited):
+        with self.condition:
+            self.checkouts += 1
+            if waited > 0.001:
+                self.waits += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+    def close(self):
+        with self.condition:
+            idle, self.idle = self.idle, deque()
+        for connection, _, _ in idle:
+            self.discard(connection)
+
+    def stats(self):
+        with self.condition:
+            return {
+                "size": self.size,
+                "idle": len(self.idle),
+                "in_use": self.size - len(self.idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_time_total": round(self.wait_time_total, 6),
+                "wait_time_avg": round(self.wait_time_total / self.checkouts, 6) if self.checkouts else 0,
+                "wait_time_max": round(self.wait_time_max, 6),
+                "timeouts": self.timeouts,
+                "opened": self.opened,
+                "discarded": self.discarded,
+            }
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(alias, conn_params, connect, **options):
+    """Pool for the alias and connection parameters in this process. Keyed by
+    pid as well so workers forked from a preloaded master never share one."""
+    key = (os.getpid(), alias, repr(sorted(conn_params.items())))
+    with pools_lock:
+        pool = pools.get(key)
+        if pool is None:
+            pool = pools[key] = ConnectionPool(connect, **options)
+    return pool
+
+
+def pool_stats():
+    pid = os.getpid()
+    with pools_lock:
+        current = [(alias, pool) for (key_pid, alias, _), pool in pools.items() if key_pid == pid]
+    return {alias: pool.stats() for alias, pool in current}
+
+
+def close_pools(alias=None):
+    """Closes the idle connections of this process's pools, e.g. before the
+    test database is dropped"""
+    pid = os.getpid()
+    with pools_lock:
+        current = [
+            pool for (key_pid, key_alias, _), pool in pools.items()
+            if key_pid == pid and alias in (None, key_alias)
+        ]
+    for pool in current:
+        pool.close()
@@ -0,0 +1,133 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+from core.db.sharding import DEFAULT, TENANT_APPS, check_writable, current_shard
+
+
+REPLICA = "replica"
+
+read_alias = ContextVar("read_alias", default=None)
+
+
+def replica_configured():
+    return REPLICA in connections.settings
+
+
+def pin_key(user_id):
+    return f"replica-pin:{user_id}"
+
+
+def pin_to_primary(user):
+    """Reads of a user who just wrote stay on the primary for a few seconds"""
+    cache.set(pin_key(user.pk), 1, settings.REPLICA_STICKINESS)
+
+
+def is_pinned(user):
+    return cache.get(pin_key(user.pk)) is not None
+
+
+@contextmanager
+def use_replica():
+    token = read_alias.set(REPLICA if replica_configured() else None)
+    try:
+        yield
+    finally:
+        read_alias.reset(token)
+
+
+class TenantShardRouter:
+    """Sends inventory and order queries of tenants moved off the default
+    database to their shard. Everything else falls through to the next
+    router. The shard map itself is only migrated on the default database."""
+
+    def shard_for(self, model, hints):
+        if model._meta.app_label not in TENANT_APPS:
+            return None
+        instance = hints.get("instance")
+        if instance is not None and instance._meta.app_label in TENANT_APPS and instance._state.db:
+            return instance._state.db
+        shard = current_shard()
+        return None if shard == DEFAULT else shard
+
+    def db_for_read(self, model, **hints):
+        return self.shard_for(model, hints)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label in TENANT_APPS:
+            check_writable()
+        return self.shard_for(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == "core" and db != DEFAULT:
+            return False
+        return None
+
+
+class ReplicaRouter:
+    """Sends reads to the alias chosen for the current request, the primary
+    otherwise. Writes and migrations always go to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
+
+
+class ReplicaRoutingMixin:
+    """
+    Serves the viewset actions listed in replica_actions from the read
+    replica on GET requests. A user's writes pin their reads to the primary
+    for REPLICA_STICKINESS seconds so they always read their own writes.
+    Set replica_actions on a view to override which actions qualify.
+
+    Writes of a tenant frozen for a move are refused before the action runs,
+    so TenantShardMiddleware answers them with 503 whatever the action
+    catches.
+    """
+    replica_actions = ()
+    replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method not in SAFE_METHODS:
+            check_writable()
+        if (
+            request.method in SAFE_METHODS
+            and getattr(self, "action", None) in self.replica_actions
+            and replica_configured()
+            and not (request.user.is_authenticated and is_pinned(request.user))
+        ):
+            self.replica_token = read_alias.set(REPLICA)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            self.finish_routing(request)
+
+    async def adispatch(self, request, *args, **kwargs):
+        try:
+            return await super().adispatch(request, *args, **kwargs)
+        finally:
+            self.finish_routing(request)
+
+    def finish_routing(self, request):
+        if self.replica_token is not None:
+            read_alias.reset(self.replica_token)
+            self.replica_token = None
+        user = getattr(getattr(self, "request", None), "_user", None)
+        if request.method not in SAFE_METHODS and user is not None and user.is_authenticated:
+            pin_to_primary(user)
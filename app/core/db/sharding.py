@@ -0,0 +1,265 @@
+"""
+Tenant sharding by account owner.
+
+Every inventory and order row belongs to the user who created it, so a
+tenant's data can live on any database listed in settings.SHARDS. The shard
+map (core.TenantShard) stays on the default database and tenants without an
+entry live there too. TenantShardRouter sends queries on tenant models to the
+current tenant's shard, the tenant being the authenticated user of the
+request or the one selected with the tenant() context manager.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from django.apps import apps
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import DatabaseError, connections, router, transaction
+from django.utils import timezone
+from psycopg2.extras import execute_values
+
+
+DEFAULT = "default"
+TENANT_APPS = {"inventory", "order"}
+
+# Tenant tables in copy order with the lookup selecting a tenant's rows.
+# Rows are found again by updated_at (created_at for append-only tables)
+# during catch-up passes, so code updating tenant rows with QuerySet.update()
+# must set updated_at as well.
+TENANT_TABLES = [
+    ("auth.User", "id"),
+    ("inventory.Label", "productinventory__created_by"),
+    ("inventory.ProductInventory", "created_by"),
+    ("inventory.ProductInventory_labels", "productinventory__created_by"),
+    ("inventory.ProductStockShard", "product__created_by"),
+    ("inventory.StockMovement", "created_by"),
+    ("inventory.StockSnapshot", "created_by"),
+    ("inventory.ReorderSuggestion", "created_by"),
+    ("order.Customer", "created_by"),
+    ("order.Order", "created_by"),
+    ("order.OrderItem", "created_by"),
+    ("order.SalesRollup", "created_by"),
+    ("order.Cart", "created_by"),
+    ("order.Notification", "receiver"),
+]
+# copied for foreign keys but shared with other tenants or owned by default
+SHARED_TABLES = {"auth.User", "inventory.Label"}
+
+current_request = ContextVar("current_request", default=None)
+tenant_user = ContextVar("tenant_user", default=None)
+
+
+class TenantMoving(DatabaseError):
+    pass
+
+
+def sharding_enabled():
+    return len(settings.SHARDS) > 1
+
+
+class ShardMap:
+    """In-process cache of the shard map. Entries are trusted for
+    SHARD_MAP_CACHE_TTL seconds, which bounds how long a worker keeps routing
+    a moved tenant to its old shard."""
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        """(shard, state) of the tenant"""
+        if not sharding_enabled():
+            return DEFAULT, "ACTIVE"
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+
+        TenantShard = apps.get_model("core", "TenantShard")
+        value = TenantShard.objects.using(DEFAULT).filter(user_id=user_id).values_list(
+            "shard", "state"
+        ).first() or (DEFAULT, "ACTIVE")
+        with self.lock:
+            self.entries[user_id] = (value, now + settings.SHARD_MAP_CACHE_TTL)
+        return value
+
+    def invalidate(self, user_id=None):
+        with self.lock:
+            if user_id is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(user_id, None)
+
+
+shard_map = ShardMap()
+
+
+def current_tenant_id():
+    user_id = tenant_user.get()
+    if user_id is not None:
+        return user_id
+    request = current_request.get()
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user.pk
+    return None
+
+
+def current_shard():
+    user_id = current_tenant_id()
+    if user_id is None or not sharding_enabled():
+        return DEFAULT
+    return shard_map.get(user_id)[0]
+
+
+def check_writable():
+    """Rejects writes of a tenant frozen for the cutover of a move"""
+    user_id = current_tenant_id()
+    if user_id is not None and sharding_enabled() and shard_map.get(user_id)[1] == "FROZEN":
+        raise TenantMoving("Account is being moved to another database, retry shortly")
+
+
+@contextmanager
+def tenant(user):
+    """Routes tenant queries to the shard of user, e.g. in commands and jobs"""
+    token = tenant_user.set(getattr(user, "pk", user))
+    try:
+        yield
+    finally:
+        tenant_user.reset(token)
+
+
+def tenant_atomic(model):
+    """Transaction on the database writes of model are routed to, which is
+    the tenant's shard rather than always the default database"""
+    return transaction.atomic(using=router.db_for_write(model))
+
+
+def tenant_table(label):
+    if label == "inventory.ProductInventory_labels":
+        return apps.get_model("inventory", "ProductInventory").labels.through
+    return apps.get_model(label)
+
+
+class TenantCopy:
+    """
+    Copies one tenant's rows from source to target.
+
+    Rows are read in primary key order in batches and upserted on the target
+    with the source values, timestamps included. Passes after the first only
+    read rows updated since the previous pass started, less a margin for
+    transactions that committed late.
+    """
+
+    margin = timedelta(seconds=60)
+
+    def __init__(self, user_id, source, target, batch_size=1000):
+        self.user_id = user_id
+        self.source = source
+        self.target = target
+        self.batch_size = batch_size
+        self.last_pass = None
+
+    def tables(self):
+        return [(label, tenant_table(label), lookup) for label, lookup in TENANT_TABLES]
+
+    def copy(self):
+        """Runs one copy pass and returns the number of rows written"""
+        started = timezone.now()
+        since = self.last_pass - self.margin if self.last_pass else None
+        copied = 0
+        for _, model, lookup in self.tables():
+            copied += self.copy_table(model, lookup, since)
+        self.last_pass = started
+        return copied
+
+    def queryset(self, model, lookup, using):
+        return model._base_manager.using(using).filter(**{lookup: self.user_id})
+
+    def copy_table(self, model, lookup, since=None):
+        # generated columns are computed again on the target
+        fields = [
+            field for field in model._meta.concrete_fields if not getattr(field, "generated", False)
+        ]
+        pk_position = fields.index(model._meta.pk)
+        queryset = self.queryset(model, lookup, self.source)
+        timestamp = next(
+            (name for name in ("updated_at", "created_at") if any(field.name == name for field in fields)),
+            None,
+        )
+        if since is not None and timestamp is not None:
+            queryset = queryset.filter(**{f"{timestamp}__gte": since})
+        queryset = queryset.order_by("pk").distinct().values_list(
+            *[field.attname for field in fields]
+        )
+
+        copied = 0
+        last = None
+        while True:
+            batch = queryset if last is None else queryset.filter(pk__gt=last)
+            rows = list(batch[: self.batch_size])
+            if not rows:
+                break
+            self.upsert(model, fields, rows)
+            copied += len(rows)
+            last = rows[-1][pk_position]
+
+        if copied and any(field.get_internal_type().endswith("AutoField") for field in fields):
+            self.reset_sequence(model)
+        return copied
+
+    def upsert(self, model, fields, rows):
+        connection = connections[self.target]
+        quote = connection.ops.quote_name
+        # partitioned tables have the partition column in their primary key
+        key = [model._meta.pk.column] + [
+            model._meta.get_field(name).column for name in [getattr(model, "partition_by", None)] if name
+        ]
+        updates = ", ".join(
+            f"{quote(field.column)} = EXCLUDED.{quote(field.column)}"
+            for field in fields if field.column not in key
+        )
+        sql = (
+            f"INSERT INTO {quote(model._meta.db_table)} "
+            f"({', '.join(quote(field.column) for field in fields)}) VALUES %s "
+            f"ON CONFLICT ({', '.join(quote(column) for column in key)}) DO "
+            + (f"UPDATE SET {updates}" if updates else "NOTHING")
+        )
+        with connection.cursor() as cursor:
+            execute_values(cursor.cursor, sql, rows, page_size=self.batch_size)
+
+    def reset_sequence(self, model):
+        connection = connections[self.target]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+                cursor.execute(sql)
+
+    def remove_deleted(self):
+        """Deletes target rows that no longer exist on the source, children
+        first. Returns the number of rows removed."""
+        removed = 0
+        for label, model, lookup in reversed(self.tables()):
+            if label in SHARED_TABLES:
+                continue
+            source_ids = set(self.queryset(model, lookup, self.source).values_list("pk", flat=True))
+            stale = [
+                pk for pk in self.queryset(model, lookup, self.target).values_list("pk", flat=True)
+                if pk not in source_ids
+            ]
+            for start in range(0, len(stale), self.batch_size):
+                removed += model._base_manager.using(self.target).filter(
+                    pk__in=stale[start:start + self.batch_size]
+                )._raw_delete(self.target)
+        return removed
+
+    def purge_source(self):
+        """Deletes the tenant's rows from the source after the cutover"""
+        removed = 0
+        for label, model, lookup in reversed(self.tables()):
+            if label in SHARED_TABLES:
+                continue
+            removed += self.queryset(model, lookup, self.source)._raw_delete(self.source)
+        return removed
@@ -0,0 +1,137 @@
+"""
+Saves that only write the columns that changed.
+
+Models with DirtyFieldsMixin remember the column values they were loaded
+with or last saved. save() on a stored instance then updates only the
+columns that differ, plus the auto_now timestamps tenant moves rely on, and
+is skipped altogether when nothing changed. Saves given update_fields write
+those columns as before. save_where() writes the changes only while the row
+still matches a condition, e.g. a version for optimistic concurrency.
+
+Values are compared, not copied deeply: a JSON value changed in place must
+be assigned again to count as changed.
+"""
+import copy
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from django.db import models
+
+
+full_saves = ContextVar("full_saves", default=False)
+
+
+@contextmanager
+def writing_every_column():
+    """Saves inside write every column, as Django does by default. Meant for
+    comparisons."""
+    token = full_saves.set(True)
+    try:
+        yield
+    finally:
+        full_saves.reset(token)
+
+
+@lru_cache(maxsize=None)
+def tracked_fields(model):
+    return tuple(
+        field for field in model._meta.concrete_fields
+        if not field.primary_key and not getattr(field, "generated", False)
+    )
+
+
+@lru_cache(maxsize=None)
+def auto_now_fields(model):
+    return frozenset(
+        field.name for field in tracked_fields(model) if getattr(field, "auto_now", False)
+    )
+
+
+@lru_cache(maxsize=None)
+def generated_fields(model):
+    return tuple(
+        field.attname for field in model._meta.concrete_fields if getattr(field, "generated", False)
+    )
+
+
+class DirtyFieldsMixin(models.Model):
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember()
+        return instance
+
+    def remember(self, names=None):
+        """Marks the current values of the named fields, all by default, as
+        the ones stored"""
+        values = self.__dict__
+        saved = values.setdefault("_saved_values", {})
+        for field in tracked_fields(type(self)):
+            if field.attname in values and (names is None or field.name in names or field.attname in names):
+                value = values[field.attname]
+                saved[field.attname] = copy.copy(value) if isinstance(value, (dict, list)) else value
+
+    def dirty_fields(self):
+        """Names of the fields changed since the instance was loaded or saved"""
+        values = self.__dict__
+        saved = values.get("_saved_values", {})
+        return {
+            field.name for field in tracked_fields(type(self))
+            if field.attname in values
+            and (field.attname not in saved or saved[field.attname] != values[field.attname])
+        }
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self.remember(fields)
+
+    def save(self, *args, **kwargs):
+        if self._state.adding or kwargs.get("force_insert") or args or full_saves.get():
+            super().save(*args, **kwargs)
+            self.remember()
+            return
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None:
+            update_fields = self.dirty_fields()
+            if not update_fields:
+                return
+            kwargs["update_fields"] = update_fields | auto_now_fields(type(self))
+        super().save(*args, **kwargs)
+        self.forget_generated()
+        self.remember(kwargs["update_fields"])
+
+    def save_where(self, values=None, **lookups):
+        """
+        Writes the changed columns, with the auto_now timestamps and any
+        extra values, in a single UPDATE of this row that only applies while
+        the row also matches lookups. Returns whether it did. Fields set to
+        an expression are loaded again when next read.
+        """
+        model = type(self)
+        names = self.dirty_fields() | auto_now_fields(model)
+        updates = {
+            field.attname: field.pre_save(self, False)
+            for field in tracked_fields(model) if field.name in names
+        }
+        updates.update(values or {})
+        row = model._base_manager.using(self._state.db).filter(pk=self.pk, **lookups)
+        updated = row.update(**updates)
+        if not updated:
+            return False
+        for name, value in (values or {}).items():
+            attname = model._meta.get_field(name).attname
+            if hasattr(value, "resolve_expression"):
+                self.__dict__.pop(attname, None)
+            else:
+                setattr(self, attname, value)
+        self.forget_generated()
+        self.remember(names | set(values or ()))
+        return True
+
+    def forget_generated(self):
+        # generated columns changed with the row, read them again when used
+        for attname in generated_fields(type(self)):
+            self.__dict__.pop(attname, None)
@@ -0,0 +1,43 @@
+"""
+gunicorn settings of the production server, bin/start runs
+
+    gunicorn --config python:core.gunicorn core.wsgi
+
+or, with SERVER_INTERFACE=asgi, the ASGI application in uvicorn workers.
+The application is loaded in the master and warmed up there, see
+core.warmup, before the workers are forked from it: they start with the
+modules imported, the URL patterns compiled and the serializers built, shared
+with the master until written to. Each worker then opens its database
+connections before it takes its first request.
+"""
+import multiprocessing
+from decouple import config
+
+
+bind = f"0.0.0.0:{config('PORT', default=8000, cast=int)}"
+workers = config("WEB_CONCURRENCY", default=multiprocessing.cpu_count() * 2 + 1, cast=int)
+threads = config("GUNICORN_THREADS", default=1, cast=int)
+timeout = config("GUNICORN_TIMEOUT", default=30, cast=int)
+preload_app = True
+accesslog = "-"
+
+
+def when_ready(server):
+    # the application is loaded, no worker is forked yet
+    from django.db import connections
+    from core.warmup import warm_up
+
+    timings = warm_up()
+    # connections must not be shared with the workers
+    connections.close_all()
+    server.log.info(
+        "Warmed up in %.0f ms (%s)",
+        sum(timings.values()) * 1000,
+        ", ".join(f"{step} {seconds * 1000:.0f} ms" for step, seconds in timings.items()),
+    )
+
+
+def post_worker_init(worker):
+    from core.warmup import connect
+
+    connect()
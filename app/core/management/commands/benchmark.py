@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+from core.benchmarks import SUITES
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a benchmark suite against the configured databases and prints "
+        "one line per variant measured. Suites create and delete their own "
+        "data, never run them against production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("suite", choices=sorted(SUITES))
+        parser.add_argument("--rounds", type=int, default=200)
+
+    def handle(self, *args, **options):
+        results = import_string(SUITES[options["suite"]])(options)
+        for result in results:
+            self.stdout.write(
+                "  ".join(f"{key}={value}" for key, value in result.items())
+            )
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from drf_spectacular.drainage import GENERATOR_STATS
+from core.schema import generate_schema, write_schema
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates the OpenAPI schema into OPENAPI_SCHEMA_DIR, as YAML and "
+        "JSON files named after the API version, for api/schema/ to serve "
+        "instead of generating it per request. Run it when building the "
+        "production image."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fail-on-warn", action="store_true",
+            help="fail when generating the schema reports warnings or errors",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.OPENAPI_SCHEMA_DIR:
+            raise CommandError("OPENAPI_SCHEMA_DIR is not set")
+        GENERATOR_STATS.reset()
+        schema = generate_schema()
+        GENERATOR_STATS.emit_summary()
+        if options["fail_on_warn"] and GENERATOR_STATS:
+            raise CommandError("Schema generation reported warnings or errors")
+        for path in write_schema(schema):
+            self.stdout.write(f"wrote {path}")
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.db.partitions import (
+    add_months,
+    detach_partition,
+    ensure_monthly_partitions,
+    holds_kept_rows,
+    month_start,
+    monthly_partitions,
+    partitioned_models,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates the monthly partitions of the coming months for every "
+        "partitioned table and detaches the partitions past their retention "
+        "(PARTITION_RETENTION_MONTHS), so old rows go with a table drop "
+        "instead of a bulk delete. Partitions holding rows their model keeps "
+        "(partition_keep) stay attached. Run it periodically, e.g. daily."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months-ahead", type=int, default=settings.PARTITION_MONTHS_AHEAD)
+        parser.add_argument(
+            "--drop", action="store_true",
+            help="drop expired partitions instead of leaving them detached, e.g. for archiving",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="only list expired partitions")
+
+    def handle(self, *args, **options):
+        this_month = month_start(timezone.now().date())
+        for alias in settings.SHARDS:
+            for model in partitioned_models():
+                table = model._meta.db_table
+                if not options["dry_run"]:
+                    for partition in ensure_monthly_partitions(model, options["months_ahead"], using=alias):
+                        self.stdout.write(f"{alias}: created partition {partition}")
+
+                retention = settings.PARTITION_RETENTION_MONTHS.get(model._meta.label)
+                if not retention:
+                    continue
+                cutoff = add_months(this_month, -retention)
+                for month, partition in monthly_partitions(table, using=alias):
+                    if add_months(month, 1) > cutoff:
+                        break
+                    if holds_kept_rows(model, month, using=alias):
+                        self.stdout.write(self.style.WARNING(
+                            f"{alias}: kept partition {partition}, "
+                            f"it holds rows {model._meta.label} keeps"
+                        ))
+                        continue
+                    action = "dropped" if options["drop"] else "detached"
+                    if options["dry_run"]:
+                        action = "would have " + action
+                    else:
+                        detach_partition(table, partition, drop=options["drop"], using=alias)
+                    self.stdout.write(self.style.SUCCESS(f"{alias}: {action} partition {partition}"))
@@ -0,0 +1,73 @@
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from core.db.sharding import TenantCopy, shard_map
+from core.models import TenantShard
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves a tenant's inventory and order data to another shard. Rows are "
+        "copied while the tenant keeps working, then writes are frozen for a "
+        "final catch-up pass and the shard map is switched over."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True, help="username of the tenant to move")
+        parser.add_argument("--to", required=True, help="target shard, one of SHARDS")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--max-passes", type=int, default=5, help="catch-up passes before freezing writes")
+        parser.add_argument("--purge-source", action="store_true", help="delete the tenant's rows from the old shard")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+        target = options["to"]
+        if target not in settings.SHARDS:
+            raise CommandError(f"Unknown shard {target}, expected one of {', '.join(settings.SHARDS)}")
+
+        entry, _ = TenantShard.objects.get_or_create(user=user)
+        source = entry.shard
+        if entry.state != "ACTIVE":
+            raise CommandError(f"{user} is already being moved ({entry.state})")
+        if source == target:
+            raise CommandError(f"{user} already lives on {target}")
+
+        copy = TenantCopy(user.pk, source, target, batch_size=options["batch_size"])
+        self.set_state(entry, "COPYING")
+        try:
+            # catch up until the changes left fit one batch or stop shrinking
+            previous = None
+            for number in range(1, options["max_passes"] + 1):
+                copied = copy.copy()
+                self.stdout.write(f"pass {number}: copied {copied} rows from {source} to {target}")
+                if copied < options["batch_size"] or (previous is not None and copied >= previous):
+                    break
+                previous = copied
+
+            # wait until every worker has seen the freeze before the last pass
+            self.set_state(entry, "FROZEN")
+            time.sleep(settings.SHARD_MAP_CACHE_TTL + 1)
+            copied = copy.copy()
+            removed = copy.remove_deleted()
+            self.stdout.write(f"final pass: copied {copied} rows, removed {removed} deleted rows")
+        except BaseException:
+            self.set_state(entry, "ACTIVE")
+            raise
+
+        entry.shard = target
+        self.set_state(entry, "ACTIVE")
+        # stale workers keep rejecting writes until their shard map entry expires
+        time.sleep(settings.SHARD_MAP_CACHE_TTL + 1)
+
+        if options["purge_source"]:
+            self.stdout.write(f"purged {copy.purge_source()} rows from {source}")
+        self.stdout.write(self.style.SUCCESS(f"Moved {user} from {source} to {target}"))
+
+    def set_state(self, entry, state):
+        entry.state = state
+        entry.save()
+        shard_map.invalidate(entry.user_id)
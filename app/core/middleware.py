@@ -0,0 +1,44 @@
+import asyncio
+from django.http import JsonResponse
+from core.db.sharding import TenantMoving, current_request
+
+
+class TenantShardMiddleware:
+    """Exposes the request to the tenant shard router, which reads the
+    authenticated user from it once DRF has authenticated the request, and
+    answers writes of a tenant frozen for a move with 503. Runs on the event
+    loop under ASGI, as Django's middleware does."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # what MiddlewareMixin does to be called as a coroutine
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        else:
+            self._is_coroutine = None
+
+    def __call__(self, request):
+        if self._is_coroutine:
+            return self.__acall__(request)
+        token = current_request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            current_request.reset(token)
+
+    async def __acall__(self, request):
+        token = current_request.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            current_request.reset(token)
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, TenantMoving):
+            response = JsonResponse({"success": False, "message": str(exception)}, status=503)
+            response["Retry-After"] = "5"
+            return response
+        return None
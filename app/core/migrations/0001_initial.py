@@ -0,0 +1,30 @@
+# Generated by Django 4.1.4 on 2026-10-18 22:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantShard',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='tenant_shard', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('shard', models.CharField(default='default', max_length=100)),
+                ('state', models.CharField(choices=[('ACTIVE', 'ACTIVE'), ('COPYING', 'COPYING'), ('FROZEN', 'FROZEN')], default='ACTIVE', max_length=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tenantshard',
+            index=models.Index(fields=['shard'], name='tenant_shard_idx'),
+        ),
+    ]
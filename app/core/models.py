@@ -0,0 +1,26 @@
+from django.db import models
+from django.contrib.auth.models import User
+
+
+TENANT_SHARD_STATES = (
+    ("ACTIVE", "ACTIVE"),
+    ("COPYING", "COPYING"),
+    ("FROZEN", "FROZEN"),
+)
+
+
+class TenantShard(models.Model):
+    """Shard map: the database alias holding a tenant's inventory and order
+    rows. Tenants without a row live on the default database."""
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="tenant_shard"
+    )
+    shard = models.CharField(max_length=100, default="default")
+    state = models.CharField(max_length=20, choices=TENANT_SHARD_STATES, default="ACTIVE")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["shard"], name="tenant_shard_idx")]
+
+    def __str__(self):
+        return f"{self.user} -- {self.shard} ({self.state})"
@@ -0,0 +1,48 @@
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage, Page
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from .db.concurrent import aconcurrently
+
+
+class PageNumberPagination(pagination.PageNumberPagination):
+    """DRF's page number pagination, which async views page with
+    apaginate_queryset()"""
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() reading the count and the rows of the page
+        concurrently"""
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        page_number = request.query_params.get(self.page_query_param, 1)
+        if page_number in self.last_page_strings:
+            # which rows to read depends on the count
+            return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        try:
+            number = int(page_number)
+        except (TypeError, ValueError):
+            number = 0
+        rows = []
+        if number > 0:
+            bottom = (number - 1) * page_size
+            paginator.count, rows = await aconcurrently(
+                queryset.count, lambda: list(queryset[bottom:bottom + page_size])
+            )
+        try:
+            # the same checks as paginator.page(), the count is known now
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            )
+            raise NotFound(msg)
+        self.page = Page(rows, number, paginator)
+
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+
+        self.request = request
+        return rows
@@ -0,0 +1,104 @@
+"""
+JSON responses encoded with orjson.
+
+FastJSONRenderer gives the bytes DRF's JSONRenderer would, compact and UTF-8,
+from orjson's encoder: dicts, lists, strings, numbers and UUIDs are encoded
+natively, decimals, datetimes and the other types DRF knows go through DRF's
+encoder so that they are formatted the same. Documents orjson cannot encode,
+such as integers beyond 64 bits, are encoded with the json module. Indented output, asked for by
+the browsable API or an indent parameter of the media type, is left to
+JSONRenderer.
+
+StreamingJSONResponse sends a document as it is encoded, the rows of its
+list a chunk at a time as a generator yields them, so a large list is never
+held in memory whole and its first bytes leave before its last row is read.
+"""
+import json
+import uuid
+import orjson
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import JSONRenderer
+from django.http import StreamingHttpResponse
+from sentry_sdk import capture_exception
+
+
+STREAM_CHUNK_ROWS = 500
+OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+# placeholder of the rows in the document of a StreamingJSONResponse
+ROWS = object()
+
+encode_default = JSONEncoder().default
+
+
+def escape_separators(data):
+    # what JSONRenderer does for JSON embedded in JavaScript
+    if b"\xe2\x80" in data:
+        data = data.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+    return data
+
+
+def dumps(data, default=encode_default):
+    try:
+        encoded = orjson.dumps(data, default=default, option=OPTIONS)
+    except orjson.JSONEncodeError:
+        # integers beyond 64 bits and the like
+        encoded = json.dumps(
+            data, default=default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode()
+    return escape_separators(encoded)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+def chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_json(data, rows, chunk_size=STREAM_CHUNK_ROWS):
+    """Bytes of data with the list of rows in place of ROWS"""
+    marker = uuid.uuid4().hex
+
+    def default(value):
+        return marker if value is ROWS else encode_default(value)
+
+    head, tail = dumps(data, default).split(f'"{marker}"'.encode(), 1)
+    try:
+        yield head + b"["
+        separator = b""
+        for chunk in chunks(rows, chunk_size):
+            # the chunk encoded as a list, less its brackets
+            yield separator + dumps(chunk)[1:-1]
+            separator = b","
+        yield b"]" + tail
+    except Exception as e:
+        # the status is sent, the client sees a truncated document
+        capture_exception(e)
+        raise
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """
+    data encoded as JSON while it is sent, with the JSON-ready values rows
+    yields as the list in place of ROWS. rows is consumed as the response
+    is, after the view has returned: querysets in it must already be bound
+    to their database.
+    """
+
+    def __init__(self, data, rows, status=200, chunk_size=STREAM_CHUNK_ROWS, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(stream_json(data, rows, chunk_size), status=status, **kwargs)
@@ -0,0 +1,76 @@
+"""
+OpenAPI schema built once rather than on every request.
+
+manage.py build_schema generates the schema, as api/schema/ would, into
+openapi-<VERSION>.yaml and .json under OPENAPI_SCHEMA_DIR. The production
+image runs it at build time. SchemaView then answers from those files, read
+once, by the gunicorn master when it warms up, and kept in memory, with an
+ETag of their content so that the documentation pages revalidate instead of
+downloading it again. Without OPENAPI_SCHEMA_DIR, in development, the schema
+is generated per request and follows code changes as before.
+"""
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from drf_spectacular.generators import SchemaGenerator
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+
+RENDERERS = {"yaml": OpenApiYamlRenderer, "json": OpenApiJsonRenderer}
+
+
+def schema_path(format):
+    version = spectacular_settings.VERSION
+    return Path(settings.OPENAPI_SCHEMA_DIR) / f"openapi-{version}.{format}"
+
+
+def generate_schema():
+    return SchemaGenerator().get_schema(request=None, public=True)
+
+
+def write_schema(schema):
+    """Writes schema in every format served, returns the paths written"""
+    paths = []
+    for format, renderer in RENDERERS.items():
+        path = schema_path(format)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(renderer().render(schema, renderer_context={}))
+        paths.append(path)
+    return paths
+
+
+@lru_cache(maxsize=None)
+def built_schema(format):
+    """(content, ETag) of the schema built in format"""
+    content = schema_path(format).read_bytes()
+    return content, f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+class SchemaView(SpectacularAPIView):
+    """Serves the schema built by manage.py build_schema when
+    OPENAPI_SCHEMA_DIR is set, generates it otherwise"""
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        if not settings.OPENAPI_SCHEMA_DIR:
+            return super().get(request, *args, **kwargs)
+        format = request.accepted_renderer.format
+        content, etag = built_schema(format)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            content_type = request.accepted_media_type
+            if request.accepted_renderer.charset:
+                content_type = f"{content_type}; charset={request.accepted_renderer.charset}"
+            response = HttpResponse(content, content_type=content_type)
+            response["Content-Disposition"] = (
+                f'inline; filename="{spectacular_settings.TITLE or "schema"}.{format}"'
+            )
+        response["ETag"] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
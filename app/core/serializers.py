@@ -0,0 +1,220 @@
+"""
+Read-only serializers of values_list() rows for the hot list endpoints.
+
+A RowSerializer declares the fields of its model it outputs. When the class is
+created they become the columns of a values_list() query and an encoder, a
+function generated for the class, that turns one row tuple into the dict a
+ModelSerializer would have produced: decimals with their decimal places and
+UUIDs as strings, both selected as text, and datetimes in ISO 8601 with Z for
+UTC. No model instance, field object or OrderedDict is made per row.
+
+Many-to-many fields are selected as an array of the related primary keys and
+nested serializers as the columns of the related row, so a page is read with
+a single query. Views opt in with RowListMixin, which streams the rows, or
+reads them with the async ORM in async views.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db import models
+from django.db.models import OuterRef
+from django.db.models.functions import Cast
+from rest_framework.response import Response
+from .renderers import ROWS, STREAM_CHUNK_ROWS, StreamingJSONResponse
+
+
+def date_to_string(value):
+    return value.isoformat()
+
+
+def datetime_to_string(value):
+    value = value.isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+def selected_as_text(field):
+    # numeric columns are output with the scale of the column, their
+    # decimal_places, which is what DRF quantizes decimals to
+    if isinstance(field, models.ForeignKey):
+        return selected_as_text(field.target_field)
+    return isinstance(field, (models.UUIDField, models.DecimalField))
+
+
+def column(lookup, field):
+    """What values_list() selects for field, UUIDs and decimals as the text
+    they are output as rather than parsed and formatted again"""
+    if selected_as_text(field):
+        return Cast(lookup, models.TextField())
+    return lookup
+
+
+def converter(field):
+    """Function giving the JSON value of a value of field as selected, None
+    when the value is used as is"""
+    if isinstance(field, models.ForeignKey):
+        return converter(field.target_field)
+    if isinstance(field, models.DateTimeField):
+        return datetime_to_string
+    if isinstance(field, (models.DateField, models.TimeField)):
+        return date_to_string
+    return None
+
+
+def resolve(model, lookup):
+    """Model field at the end of a lookup such as product__selling_price"""
+    *path, name = lookup.split("__")
+    for part in path:
+        model = model._meta.get_field(part).related_model
+    return model._meta.get_field(name)
+
+
+def related_keys(field, prefix):
+    """Array of the primary keys related through a many-to-many field to the
+    row at prefix of the outer query, in the related model's ordering"""
+    through = field.remote_field.through
+    source = field.m2m_field_name()
+    target = field.m2m_reverse_field_name()
+    target_field = through._meta.get_field(target)
+    ordering = [
+        f"-{target}__{name[1:]}" if name.startswith("-") else f"{target}__{name}"
+        for name in field.related_model._meta.ordering
+    ]
+    return ArraySubquery(
+        through._default_manager.filter(**{source: OuterRef(f"{prefix}pk")})
+        .order_by(*ordering, f"{target}__pk")
+        .annotate(key=column(target_field.attname, target_field))
+        .values("key")
+    )
+
+
+class RowSerializer:
+    """
+    Serializes values_list() rows of model.
+
+    fields lists model fields or lookups across foreign keys, output under
+    their name, or (key, lookup) pairs. A many-to-many field outputs the
+    primary keys of the related rows in the related model's ordering. A
+    nested entry (key, foreign key, serializer) outputs the related row as
+    serializer does, or None.
+    """
+
+    model = None
+    fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.model is None:
+            return
+        columns = []
+        namespace = {}
+        source = cls.compile(columns, namespace)
+        exec(
+            compile(f"def encode(row):\n    return {source}\n", f"<{cls.__name__} encoder>", "exec"),
+            namespace,
+        )
+        cls.columns = tuple(columns)
+        cls.encode = staticmethod(namespace["encode"])
+
+    @classmethod
+    def compile(cls, columns, namespace, prefix=""):
+        """
+        Source of the dict expression making the output from the row tuple.
+        Appends what it reads to columns, lookups from prefix, and puts the
+        converters it calls in namespace.
+        """
+        items = []
+        for entry in cls.fields:
+            if isinstance(entry, str):
+                entry = (entry, entry)
+            key, lookup = entry[:2]
+            field = resolve(cls.model, lookup)
+            position = len(columns)
+            value = f"row[{position}]"
+            if len(entry) == 3:
+                columns.append(column(prefix + lookup, field))
+                nested = entry[2].compile(columns, namespace, f"{prefix}{lookup}__")
+                value = f"None if {value} is None else {nested}"
+            elif field.many_to_many:
+                columns.append(related_keys(field, prefix))
+            else:
+                columns.append(column(prefix + lookup, field))
+                convert = converter(field)
+                if convert is not None:
+                    namespace[convert.__name__] = convert
+                    value = f"{convert.__name__}({value})"
+                    # a lookup across a relation is null when the relation is
+                    if field.null or "__" in prefix + lookup:
+                        value = f"None if row[{position}] is None else {value}"
+            items.append(f"{key!r}: {value}")
+        return f"{{{', '.join(items)}}}"
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @classmethod
+    def values(cls, queryset):
+        """The rows of queryset to serialize"""
+        return queryset.values_list(*cls.columns)
+
+    @property
+    def data(self):
+        encode = self.encode
+        return [encode(row) for row in self.rows]
+
+
+class RowListMixin:
+    """
+    Lists with row_serializer_class when a view sets it, reading the rows
+    with values_list() instead of model instances and streaming them when
+    JSON is asked for. The response data is the same as serializer_class
+    gives.
+    """
+    row_serializer_class = None
+
+    def list_rows(self, queryset, envelope=None, paginate=True):
+        """
+        Response listing the page of queryset, or all of it without
+        pagination or with paginate False, read in chunks then. envelope,
+        given the list's data, returns the response data holding it.
+        """
+        serializer = self.row_serializer_class
+        rows = serializer.values(queryset)
+        page = self.paginate_queryset(rows) if paginate else None
+        paginated = page is not None
+        if not paginated:
+            # bound now, the router no longer sees the request once the
+            # view has returned
+            page = rows.using(rows.db).iterator(chunk_size=STREAM_CHUNK_ROWS)
+
+        def document(results):
+            if paginated:
+                results = self.get_paginated_response(results).data
+            return results if envelope is None else envelope(results)
+
+        encoded = map(serializer.encode, page)
+        if self.request.accepted_renderer.format == "json":
+            return StreamingJSONResponse(document(ROWS), encoded)
+        return Response(document(list(encoded)))
+
+    def list(self, request, *args, **kwargs):
+        if self.row_serializer_class is None:
+            return super().list(request, *args, **kwargs)
+        return self.list_rows(self.filter_queryset(self.get_queryset()))
+
+    async def alist_rows(self, queryset, envelope=None):
+        """list_rows() of async actions, see core.async_views: the page is
+        read along with the count and rendered whole"""
+        serializer = self.row_serializer_class
+        rows = serializer.values(queryset)
+        page = await self.apaginate_queryset(rows)
+        if page is None:
+            results = [serializer.encode(row) async for row in rows]
+        else:
+            results = self.get_paginated_response([serializer.encode(row) for row in page]).data
+        return Response(results if envelope is None else envelope(results))
+
+    async def alist(self, request, *args, **kwargs):
+        if self.row_serializer_class is None:
+            return await sync_to_async(self.list)(request, *args, **kwargs)
+        return await self.alist_rows(self.filter_queryset(self.get_queryset()))
@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 
 import dj_database_url
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 from django.core.management.utils import get_random_secret_key
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,9 +39,11 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'django_filters',
     'drf_spectacular',
+    'core',
     'inventory',
     'order',
 ]
@@ -52,6 +54,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.TenantShardMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -82,6 +85,60 @@ WSGI_APPLICATION = 'core.wsgi.application'
 
 DATABASES = {'default': dj_database_url.config(conn_max_age=60)}
 
+# Optional read replica for report and list endpoints. Pointing it at the
+# primary's URL gives two aliases on one database for local testing.
+if config('REPLICA_DATABASE_URL', default=''):
+    DATABASES['replica'] = dj_database_url.parse(config('REPLICA_DATABASE_URL'), conn_max_age=60)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+# Extra databases tenants can be moved to with manage.py move_tenant, given
+# as alias=url pairs. Tenants without a shard map entry stay on default.
+SHARDS = ['default']
+for shard in config('SHARD_DATABASE_URLS', default='', cast=Csv()):
+    alias, url = shard.split('=', 1)
+    DATABASES[alias] = dj_database_url.parse(url, conn_max_age=60)
+    SHARDS.append(alias)
+# seconds a worker trusts its cached copy of a tenant's shard map entry
+SHARD_MAP_CACHE_TTL = config('SHARD_MAP_CACHE_TTL', default=5, cast=int)
+
+# Monthly partitions of partitioned tables are created this many months ahead
+# by manage.py manage_partitions, which also detaches the partitions older
+# than the retention in months of their model (unset or 0 keeps them all).
+# A partition still holding rows its model keeps, e.g. unread notifications,
+# stays attached whatever its age
+PARTITION_MONTHS_AHEAD = config('PARTITION_MONTHS_AHEAD', default=2, cast=int)
+PARTITION_RETENTION_MONTHS = {
+    'order.Notification': config('NOTIFICATION_RETENTION_MONTHS', default=0, cast=int),
+}
+
+DATABASE_ROUTERS = ['core.db.routers.TenantShardRouter', 'core.db.routers.ReplicaRouter']
+# seconds a user's reads stay on the primary after they write
+REPLICA_STICKINESS = config('REPLICA_STICKINESS', default=5, cast=int)
+
+# Optional per-process connection pool, connections go back to the pool at
+# the end of each request instead of being kept by the thread
+if config('DATABASE_POOL', default=False, cast=bool):
+    for database in DATABASES.values():
+        database.update({
+            'ENGINE': 'core.db.backends.postgresql_pool',
+            'CONN_MAX_AGE': 0,
+            'POOL': {
+                'MIN_SIZE': config('DATABASE_POOL_MIN_SIZE', default=2, cast=int),
+                'MAX_SIZE': config('DATABASE_POOL_MAX_SIZE', default=10, cast=int),
+                'MAX_LIFETIME': config('DATABASE_POOL_MAX_LIFETIME', default=1800, cast=int),
+                'TIMEOUT': config('DATABASE_POOL_TIMEOUT', default=10, cast=int),
+                'CHECK_IDLE': config('DATABASE_POOL_CHECK_IDLE', default=10, cast=int),
+            },
+        })
+
+# Async actions of the viewsets served on the event loop, see
+# core.async_views. core/asgi.py turns it on, WSGI leaves it off.
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+# threads of a process running the queries core.db.concurrent runs at once
+CONCURRENT_QUERY_THREADS = config(
+    'CONCURRENT_QUERY_THREADS', default=config('DATABASE_POOL_MAX_SIZE', default=10, cast=int), cast=int
+)
+
 SWAGGER_SETTINGS = {
     "SECURITY_DEFINITIONS": {
         "Bearer": {
@@ -113,6 +170,41 @@ SPECTACULAR_SETTINGS = {
     "OAUTH2_REFRESH_URL": None,
     "OAUTH2_SCOPES": None,
 }
+# Directory of the OpenAPI schema built by manage.py build_schema, served by
+# api/schema/ from memory. Empty, in development, generates it per request.
+OPENAPI_SCHEMA_DIR = config('OPENAPI_SCHEMA_DIR', default='')
+
+# Rows the sales of a product and day are spread over: each checkout adds to
+# one at random, so concurrent checkouts of a best-seller seldom wait for
+# each other's row lock. Analytics sum them.
+SALES_ROLLUP_SHARDS = config('SALES_ROLLUP_SHARDS', default=8, cast=int)
+
+# manage.py suggest_reorders: sales of the window (days) set the velocity,
+# halving in weight every half life. Products are reordered once their stock
+# no longer covers the lead time plus their minimum stock, enough to last the
+# coverage period after delivery.
+REORDER_WINDOW_DAYS = config('REORDER_WINDOW_DAYS', default=28, cast=int)
+REORDER_HALF_LIFE_DAYS = config('REORDER_HALF_LIFE_DAYS', default=7, cast=int)
+REORDER_LEAD_TIME_DAYS = config('REORDER_LEAD_TIME_DAYS', default=7, cast=int)
+REORDER_COVERAGE_DAYS = config('REORDER_COVERAGE_DAYS', default=14, cast=int)
+
+# Product edits without an If-Match header are refused with 428 when set,
+# otherwise they apply to the version the request reads
+PRODUCT_EDIT_REQUIRE_IF_MATCH = config('PRODUCT_EDIT_REQUIRE_IF_MATCH', default=False, cast=bool)
+
+# Read notifications older than this many days are deleted by manage.py
+# prune_notifications, 0 keeps them
+NOTIFICATION_READ_RETENTION_DAYS = config('NOTIFICATION_READ_RETENTION_DAYS', default=30, cast=int)
+
+# Directory manage.py archive_orders writes old orders to, it has to be
+# shared by the API workers serving archived orders
+ORDER_ARCHIVE_DIR = config('ORDER_ARCHIVE_DIR', default=str(BASE_DIR / 'archive'))
+
+# In-process product name indexes used by the autocomplete endpoint, the
+# budget is the total number of names held across users per worker
+PRODUCT_AUTOCOMPLETE_MAX_NAMES = config('PRODUCT_AUTOCOMPLETE_MAX_NAMES', default=500000, cast=int)
+PRODUCT_AUTOCOMPLETE_MAX_AGE = config('PRODUCT_AUTOCOMPLETE_MAX_AGE', default=300, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -132,10 +224,24 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 REST_FRAMEWORK = {
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "core.authentication.SignedTokenAuthentication",
+        "rest_framework.authentication.SessionAuthentication",
+    ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "core.pagination.PageNumberPagination",
+    "PAGE_SIZE": config('PAGE_SIZE', default=100, cast=int),
 }
 
+# Signed API tokens, revoked by a password change or deactivation once the
+# cached user record expires
+AUTH_TOKEN_MAX_AGE = config('AUTH_TOKEN_MAX_AGE', default=60 * 60 * 24, cast=int)
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=60, cast=int)
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
 
@@ -16,7 +16,9 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.permissions import AllowAny
-from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
+from drf_spectacular.views import SpectacularRedocView, SpectacularSwaggerView
+from .schema import SchemaView
+from .views import ObtainTokenView, DatabasePoolStatsView
 # from drf_yasg.views import get_schema_view
 # from drf_yasg import openapi
 # from drf_yasg.generators import OpenAPISchemaGenerator
@@ -31,10 +33,12 @@ from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, Spec
 # )
 
 urlpatterns = [
-    path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
+    path("api/schema/", SchemaView.as_view(), name="schema"),
     path("api/v1/doc/", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),
     path("api/v1/redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
     path('admin/', admin.site.urls),
+    path('api/v1/auth/token', ObtainTokenView.as_view(), name="auth-token"),
+    path('api/v1/health/db-pool', DatabasePoolStatsView.as_view(), name="db-pool-stats"),
     path('api/v1/inventory', include('inventory.urls')),
     path('api/v1/order', include('order.urls')),
     # path('swagger/', schema_view.with_ui('swagger',
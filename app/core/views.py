@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.contrib.auth import authenticate
+from rest_framework import serializers, status
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from .authentication import issue_token
+from .db.pool import pool_stats
+
+
+class ObtainTokenSerializer(serializers.Serializer):
+    username = serializers.CharField()
+    password = serializers.CharField(style={"input_type": "password"}, trim_whitespace=False)
+
+
+class ObtainTokenView(APIView):
+    """This endpoint exchanges a username and password for a signed API token"""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    serializer_class = ObtainTokenSerializer
+
+    @extend_schema(request=ObtainTokenSerializer)
+    def post(self, request):
+        serializer = ObtainTokenSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {"success": False, "error": serializer.errors},
+                status.HTTP_400_BAD_REQUEST,
+            )
+        user = authenticate(request, **serializer.validated_data)
+        if user is None:
+            return Response(
+                {"success": False, "error": "Invalid username or password"},
+                status.HTTP_401_UNAUTHORIZED,
+            )
+        return Response(
+            {
+                "success": True,
+                "result": {
+                    "token": issue_token(user),
+                    "expires_in": settings.AUTH_TOKEN_MAX_AGE,
+                },
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class DatabasePoolStatsView(APIView):
+    """This endpoint reports the connection pool size and wait times of the worker serving it"""
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(responses={200: OpenApiTypes.OBJECT})
+    def get(self, request):
+        return Response({"success": True, "result": pool_stats()}, status=status.HTTP_200_OK)
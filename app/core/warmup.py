@@ -0,0 +1,134 @@
+"""
+Work a process would otherwise do while serving its first requests.
+
+warm_up() imports the modules the code only imports on first use, compiles
+the URL patterns, loads the classes DRF settings name, builds the fields of
+every view's serializers, which fills the model field caches they read,
+loads the translation catalogs and reads the prebuilt OpenAPI schema. It
+does not touch the database, gunicorn runs it once in the master before
+forking the workers, which then share the result.
+
+connect() opens each worker's database connections, filling the pools, so
+its first requests do not wait on connection setup.
+
+A step that fails is reported and skipped, a server starts without it.
+"""
+import time
+from importlib import import_module
+from django.conf import settings
+from django.db import connections
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import translation
+from rest_framework.settings import api_settings
+from sentry_sdk import capture_exception
+
+
+# slow to import, imported by the functions using them so that management
+# commands and the development server start without them
+DEFERRED_IMPORTS = ["email_validator"]
+
+
+def import_deferred():
+    for name in DEFERRED_IMPORTS:
+        import_module(name)
+
+
+def patterns(resolver):
+    """URL patterns of resolver and of the resolvers it includes"""
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            yield from patterns(pattern)
+        elif isinstance(pattern, URLPattern):
+            yield pattern
+
+
+def compile_urls():
+    resolver = get_resolver()
+    # regexes are compiled the first time a pattern is tried
+    for pattern in patterns(resolver):
+        pattern.pattern.regex
+    resolver.reverse_dict
+
+
+def load_api_settings():
+    for name in api_settings.defaults:
+        getattr(api_settings, name)
+
+
+def views():
+    """(view class, initkwargs, actions) of every URL pattern"""
+    for pattern in patterns(get_resolver()):
+        view = getattr(pattern.callback, "cls", None) or getattr(pattern.callback, "view_class", None)
+        if view is not None:
+            yield (
+                view,
+                getattr(pattern.callback, "initkwargs", {}),
+                getattr(pattern.callback, "actions", None) or {},
+            )
+
+
+def build_serializers():
+    built = set()
+    for view_class, initkwargs, actions in views():
+        for action in set(actions.values()) or {None}:
+            view = view_class(**initkwargs)
+            view.action = action
+            view.request = None
+            view.format_kwarg = None
+            try:
+                serializer_class = view.get_serializer_class()
+            except Exception:
+                # views without a serializer, or choosing it from the request
+                continue
+            if serializer_class not in built:
+                built.add(serializer_class)
+                serializer_class(context={}).fields
+
+
+def load_translations():
+    # the catalogs of every installed app are read on the first lookup
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext("")
+
+
+def load_schema():
+    if settings.OPENAPI_SCHEMA_DIR:
+        from .schema import RENDERERS, built_schema
+        for format in RENDERERS:
+            built_schema(format)
+
+
+STEPS = [
+    import_deferred,
+    compile_urls,
+    load_api_settings,
+    build_serializers,
+    load_translations,
+    load_schema,
+]
+
+
+def warm_up():
+    """Seconds each step took, by step name"""
+    timings = {}
+    for step in STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            capture_exception(e)
+        timings[step.__name__] = time.perf_counter() - started
+    return timings
+
+
+def connect():
+    """Opens a connection to every database, back to its pool when pooled"""
+    for connection in connections.all():
+        try:
+            connection.ensure_connection()
+        except Exception as e:
+            capture_exception(e)
+            continue
+        if getattr(connection, "connection_pool", None) is not None:
+            # pooled connections are shared by the worker's threads
+            connection.close()
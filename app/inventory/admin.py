@@ -1,6 +1,9 @@
 from django.contrib import admin
-from .models import ProductInventory, Label
+from .models import ProductInventory, ProductStockShard, StockMovement, StockSnapshot, Label
 
 
 admin.site.register(ProductInventory)
 admin.site.register(Label)
+admin.site.register(ProductStockShard)
+admin.site.register(StockMovement)
+admin.site.register(StockSnapshot)
@@ -0,0 +1,126 @@
+import heapq
+import threading
+import time
+import uuid
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import ProductInventory
+
+
+class ProductNameIndex:
+    """Sorted array of a user's casefolded product names for prefix lookups"""
+
+    def __init__(self, rows, version=None):
+        rows = sorted((name.casefold(), name, id, selling_price) for name, id, selling_price in rows)
+        self.keys = [row[0] for row in rows]
+        self.products = [
+            {"id": id, "name": name, "selling_price": selling_price}
+            for _, name, id, selling_price in rows
+        ]
+        self.version = version
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, prefix, limit):
+        """Products whose name starts with prefix, shortest names first"""
+        prefix = prefix.casefold()
+        start = bisect_left(self.keys, prefix)
+        end = bisect_right(self.keys, prefix + chr(0x10FFFF), lo=start)
+        matches = heapq.nsmallest(
+            limit, range(start, end), key=lambda position: len(self.keys[position])
+        )
+        return [self.products[position] for position in matches]
+
+
+class ProductNameIndexCache:
+    """Per-user product name indexes held in process memory.
+
+    Indexes are built lazily on the first lookup and kept in LRU order with a
+    budget on the total number of names across users. Writes invalidate the
+    user's index locally and bump a version in the Django cache so other
+    workers rebuild too when a shared cache backend is configured; the max age
+    bounds staleness otherwise.
+    """
+
+    def __init__(self):
+        self.indexes = OrderedDict()
+        self.size = 0
+        # users with more names than the whole budget: version and check time
+        self.oversized = {}
+        self.lock = threading.Lock()
+
+    @property
+    def max_names(self):
+        return settings.PRODUCT_AUTOCOMPLETE_MAX_NAMES
+
+    @property
+    def max_age(self):
+        return settings.PRODUCT_AUTOCOMPLETE_MAX_AGE
+
+    def version_key(self, user_id):
+        return f"product-name-index:{user_id}"
+
+    def is_fresh(self, version, built_version, built_at):
+        return built_version == version and time.monotonic() - built_at < self.max_age
+
+    def get(self, user_id):
+        """Returns the user's index, or None when it does not fit the budget"""
+        version = cache.get(self.version_key(user_id))
+        with self.lock:
+            index = self.indexes.get(user_id)
+            if index is not None:
+                if self.is_fresh(version, index.version, index.built_at):
+                    self.indexes.move_to_end(user_id)
+                    return index
+                self.discard(user_id)
+            oversized = self.oversized.get(user_id)
+            if oversized is not None and self.is_fresh(version, *oversized):
+                return None
+
+        rows = ProductInventory.objects.filter(created_by_id=user_id).values_list(
+            "name", "id", "selling_price"
+        )[: self.max_names + 1]
+        index = ProductNameIndex(rows, version=version)
+        if len(index) > self.max_names:
+            with self.lock:
+                self.oversized[user_id] = (version, index.built_at)
+            return None
+
+        with self.lock:
+            self.discard(user_id)
+            self.indexes[user_id] = index
+            self.size += len(index)
+            while self.size > self.max_names:
+                _, evicted = self.indexes.popitem(last=False)
+                self.size -= len(evicted)
+        return index
+
+    def discard(self, user_id):
+        index = self.indexes.pop(user_id, None)
+        if index is not None:
+            self.size -= len(index)
+
+    def invalidate(self, user_id):
+        """Drops the user's index once the current transaction commits"""
+
+        def drop():
+            cache.set(self.version_key(user_id), uuid.uuid4().hex, None)
+            with self.lock:
+                self.discard(user_id)
+                self.oversized.pop(user_id, None)
+
+        transaction.on_commit(drop)
+
+    def clear(self):
+        with self.lock:
+            self.indexes.clear()
+            self.oversized.clear()
+            self.size = 0
+
+
+product_name_indexes = ProductNameIndexCache()
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.db.sharding import shard_map, tenant
+from inventory.models import ProductInventory
+from inventory.stock import fold
+
+
+class Command(BaseCommand):
+    help = (
+        "Folds the sharded stock counters of hot products back into "
+        "current_quantity. Run it periodically so products that stopped "
+        "selling show their final stock."
+    )
+
+    def handle(self, *args, **options):
+        folded = 0
+        for alias in settings.SHARDS:
+            products = ProductInventory.objects.using(alias).filter(stock_shards__gt=0).only(
+                "id", "created_by_id", "stock_shards"
+            )
+            for product in products.iterator():
+                # skip copies left behind on a shard the tenant moved away from
+                if shard_map.get(product.created_by_id)[0] != alias:
+                    continue
+                with tenant(product.created_by_id):
+                    fold(product)
+                folded += 1
+        self.stdout.write(self.style.SUCCESS(f"Folded stock of {folded} products"))
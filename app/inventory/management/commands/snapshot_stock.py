@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from inventory.models import ProductInventory, StockMovement, StockSnapshot
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class Command(BaseCommand):
+    help = (
+        "Snapshots the stock of products with movements since their last "
+        "snapshot. Run it periodically, e.g. daily, next to manage_partitions "
+        "which creates the stock movement partitions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lag", type=int, default=300,
+            help="seconds back the snapshots are taken, so movements of transactions still open are included",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        taken_at = timezone.now() - timedelta(seconds=options["lag"])
+        for alias in settings.SHARDS:
+            taken = self.snapshot(alias, taken_at, options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"{alias}: snapshotted {taken} products"))
+
+    def snapshot(self, alias, taken_at, batch_size):
+        last = StockSnapshot.objects.filter(product=OuterRef("pk")).order_by("-taken_at")
+        moved = (
+            StockMovement.objects.filter(
+                product=OuterRef("pk"),
+                created_at__gt=Coalesce(OuterRef("last_taken_at"), Value(EPOCH)),
+                created_at__lte=taken_at,
+            )
+            .values("product")
+            .annotate(total=Sum("quantity"))
+            .values("total")
+        )
+        products = (
+            ProductInventory.objects.using(alias)
+            .annotate(
+                last_quantity=Subquery(last.values("quantity")[:1]),
+                last_taken_at=Subquery(last.values("taken_at")[:1]),
+            )
+            .annotate(moved=Subquery(moved))
+            .filter(moved__isnull=False)
+            .values_list("pk", "created_by_id", "last_quantity", "moved")
+        )
+
+        snapshots = []
+        taken = 0
+        for product_id, user_id, last_quantity, moved in products.iterator(chunk_size=batch_size):
+            snapshots.append(
+                StockSnapshot(
+                    product_id=product_id,
+                    created_by_id=user_id,
+                    quantity=(last_quantity or 0) + moved,
+                    taken_at=taken_at,
+                )
+            )
+            if len(snapshots) == batch_size:
+                taken += len(StockSnapshot.objects.using(alias).bulk_create(snapshots))
+                snapshots = []
+        taken += len(StockSnapshot.objects.using(alias).bulk_create(snapshots))
+        return taken
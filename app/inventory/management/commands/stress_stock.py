@@ -0,0 +1,86 @@
+import threading
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from core.db.sharding import tenant
+from inventory.models import ProductInventory, StockMovement
+from inventory.stock import fold, reserve, shard_stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress test of concurrent stock reservations on a single product, "
+        "reporting throughput for each number of stock shards"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True, help="username owning the scratch product")
+        parser.add_argument("--shards", default="0,1,4,16", help="comma separated shard counts, 0 is the unsharded product row")
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--reservations", type=int, default=2000, help="reservations per run")
+        parser.add_argument("--hold", type=float, default=0.002, help="seconds each checkout transaction stays open after reserving")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+        shard_counts = [int(count) for count in options["shards"].split(",")]
+        threads = options["threads"]
+        reservations = options["reservations"] // threads * threads
+
+        with tenant(user):
+            product = ProductInventory.objects.create(
+                name=f"stress-stock-{time.time_ns()}",
+                category="stress",
+                cost_price=1,
+                selling_price=1,
+                default_quantity=reservations,
+                current_quantity=reservations,
+                created_by=user,
+            )
+        try:
+            for shards in shard_counts:
+                with tenant(user):
+                    product.restock(reservations)
+                    product = shard_stock(product, shards)
+                elapsed, failures = self.run(user, product, threads, reservations // threads, options["hold"])
+                with tenant(user):
+                    left = fold(product) if shards else ProductInventory.objects.get(pk=product.pk).current_quantity
+                self.stdout.write(
+                    f"shards={shards:<3} {reservations / elapsed:8.0f} reservations/s "
+                    f"({elapsed:.2f}s, {failures} failed, {left} left)"
+                )
+                if failures or left != 0:
+                    raise CommandError("stock does not add up after the run")
+        finally:
+            with tenant(user):
+                product.delete()
+
+    def run(self, user, product, threads, per_thread, hold):
+        failures = []
+        start = threading.Barrier(threads + 1)
+
+        def worker():
+            failed = 0
+            with tenant(user):
+                start.wait()
+                for _ in range(per_thread):
+                    # as a cart request: the ledger rows are inserted at the
+                    # end, their foreign key checks share-lock the product row
+                    with StockMovement.objects.batch():
+                        if not reserve(product):
+                            failed += 1
+                        time.sleep(hold)
+            failures.append(failed)
+            connections.close_all()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        start.wait()
+        started = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        return time.perf_counter() - started, sum(failures)
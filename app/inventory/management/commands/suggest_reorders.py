@@ -0,0 +1,34 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from inventory.reorder import ReorderJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Computes the sales velocity, margin, days of stock and suggested "
+        "reorder quantity of every product from its recent sales. Run it "
+        "nightly, the suggestions are served by inventory/reorder-suggestions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--window-days", type=int, default=settings.REORDER_WINDOW_DAYS)
+        parser.add_argument("--half-life-days", type=int, default=settings.REORDER_HALF_LIFE_DAYS)
+        parser.add_argument("--lead-time-days", type=int, default=settings.REORDER_LEAD_TIME_DAYS)
+        parser.add_argument("--coverage-days", type=int, default=settings.REORDER_COVERAGE_DAYS)
+
+    def handle(self, *args, **options):
+        for alias in settings.SHARDS:
+            started = time.monotonic()
+            due = ReorderJob(
+                using=alias,
+                window_days=options["window_days"],
+                half_life_days=options["half_life_days"],
+                lead_time_days=options["lead_time_days"],
+                coverage_days=options["coverage_days"],
+            ).run()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{alias}: {due} products due for a reorder ({time.monotonic() - started:.1f}s)"
+                )
+            )
@@ -0,0 +1,42 @@
+# Generated by Django 4.1.4 on 2026-10-18 22:42
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='productinventory',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='product_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='productinventory',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['category'], name='product_category_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='productinventory',
+            index=models.Index(models.F('created_by'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('name', output_field=models.TextField())), name='text_pattern_ops'), name='product_name_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productinventory',
+            index=models.Index(fields=['created_by', 'cost_price'], name='product_cost_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productinventory',
+            index=models.Index(fields=['created_by', 'selling_price'], name='product_selling_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productinventory',
+            index=models.Index(fields=['created_by', 'current_quantity'], name='product_current_qty_idx'),
+        ),
+    ]
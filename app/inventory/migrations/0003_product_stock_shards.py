@@ -0,0 +1,39 @@
+# Generated by Django 4.1.4 on 2026-10-18 23:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_product_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productinventory',
+            name='stock_shards',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ProductStockShard',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shard_counters', to='inventory.productinventory')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='productstockshard',
+            constraint=models.UniqueConstraint(fields=('product', 'shard'), name='unique_product_stock_shard'),
+        ),
+        migrations.AddConstraint(
+            model_name='productstockshard',
+            constraint=models.CheckConstraint(check=models.Q(('quantity__gte', 0)), name='stock_shard_quantity_gte_0'),
+        ),
+    ]
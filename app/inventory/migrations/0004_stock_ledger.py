@@ -0,0 +1,147 @@
+from datetime import date
+from django.conf import settings
+from django.db import connections, migrations, models, transaction
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+# frozen copies of core.db.partitions as of this migration, so that later
+# changes to the live helpers don't change what it creates
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(day, months):
+    years, month = divmod(day.month - 1 + months, 12)
+    return date(day.year + years, month + 1, 1)
+
+
+def create_monthly_partition(table, column, month, using="default"):
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    name = f"{table}_p{month:%Y%m}"
+    start, end = month_start(month), add_months(month, 1)
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is not None:
+            return False
+        cursor.execute(
+            f"CREATE TABLE {quote(name)} "
+            f"(LIKE {quote(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {quote(table + '_default')} "
+            f"WHERE {quote(column)} >= %s AND {quote(column)} < %s RETURNING *) "
+            f"INSERT INTO {quote(name)} SELECT * FROM moved",
+            [start, end],
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+    return True
+
+
+CREATE_STOCK_MOVEMENT = """
+CREATE TABLE "inventory_stockmovement" (
+    "id" uuid NOT NULL,
+    "quantity" integer NOT NULL,
+    "reason" varchar(20) NOT NULL,
+    "created_at" timestamp with time zone NOT NULL,
+    "created_by_id" integer NOT NULL
+        REFERENCES "auth_user" ("id") DEFERRABLE INITIALLY DEFERRED,
+    "product_id" uuid NOT NULL
+        REFERENCES "inventory_productinventory" ("id") DEFERRABLE INITIALLY DEFERRED,
+    PRIMARY KEY ("id", "created_at")
+) PARTITION BY RANGE ("created_at");
+CREATE TABLE "inventory_stockmovement_default" PARTITION OF "inventory_stockmovement" DEFAULT;
+CREATE INDEX "stock_movement_product_idx" ON "inventory_stockmovement" ("product_id", "created_at");
+CREATE INDEX "stock_movement_owner_idx" ON "inventory_stockmovement" ("created_by_id", "created_at");
+"""
+
+# the stock every product holds now opens its ledger
+OPENING_SNAPSHOTS = """
+INSERT INTO "inventory_stocksnapshot"
+    ("id", "created_at", "updated_at", "quantity", "taken_at", "created_by_id", "product_id")
+SELECT md5(random()::text || clock_timestamp()::text || p."id"::text)::uuid, now(), now(),
+       COALESCE(s."total", p."current_quantity"), now(), p."created_by_id", p."id"
+FROM "inventory_productinventory" p
+LEFT JOIN (
+    SELECT "product_id", SUM("quantity") AS "total"
+    FROM "inventory_productstockshard" GROUP BY "product_id"
+) s ON s."product_id" = p."id" AND p."stock_shards" > 0
+"""
+
+
+def create_partitions(apps, schema_editor):
+    this_month = month_start(django.utils.timezone.now().date())
+    for months in range(3):
+        create_monthly_partition(
+            "inventory_stockmovement",
+            "created_at",
+            add_months(this_month, months),
+            using=schema_editor.connection.alias,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0003_product_stock_shards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('quantity', models.IntegerField()),
+                ('taken_at', models.DateTimeField()),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='inventory.productinventory')),
+            ],
+            options={
+                'ordering': ('-taken_at',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stocksnapshot',
+            constraint=models.UniqueConstraint(fields=('product', 'taken_at'), name='unique_stock_snapshot'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='StockMovement',
+                    fields=[
+                        ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                        ('quantity', models.IntegerField()),
+                        ('reason', models.CharField(choices=[('OPENING', 'OPENING'), ('RESTOCK', 'RESTOCK'), ('ADJUSTMENT', 'ADJUSTMENT'), ('RESERVED', 'RESERVED'), ('RELEASED', 'RELEASED')], max_length=20)),
+                        ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                        ('created_by', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to=settings.AUTH_USER_MODEL)),
+                        ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='inventory.productinventory')),
+                    ],
+                    options={
+                        'ordering': ('-created_at',),
+                    },
+                ),
+                migrations.AddIndex(
+                    model_name='stockmovement',
+                    index=models.Index(fields=['product', 'created_at'], name='stock_movement_product_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='stockmovement',
+                    index=models.Index(fields=['created_by', 'created_at'], name='stock_movement_owner_idx'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(CREATE_STOCK_MOVEMENT, 'DROP TABLE "inventory_stockmovement"'),
+            ],
+        ),
+        migrations.RunPython(create_partitions, migrations.RunPython.noop),
+        migrations.RunSQL(OPENING_SNAPSHOTS, migrations.RunSQL.noop),
+    ]
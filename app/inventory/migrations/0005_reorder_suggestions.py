@@ -0,0 +1,38 @@
+# Generated by Django 4.1.4 on 2026-10-18 23:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0004_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReorderSuggestion',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('velocity', models.FloatField(default=0)),
+                ('margin', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('days_of_stock', models.FloatField(blank=True, null=True)),
+                ('reorder_quantity', models.PositiveIntegerField(default=0)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reorder_suggestions', to=settings.AUTH_USER_MODEL)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reorder_suggestion', to='inventory.productinventory')),
+            ],
+            options={
+                'ordering': ('days_of_stock',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reordersuggestion',
+            index=models.Index(condition=models.Q(('reorder_quantity__gt', 0)), fields=['created_by', 'days_of_stock'], name='reorder_suggestion_due_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+import core.db.fields
+from django.db import migrations, models
+
+
+# a column cannot become generated in place, so it is added again
+GENERATE_LOW_QUANTITY = """
+ALTER TABLE "inventory_productinventory" DROP COLUMN "low_quantity";
+ALTER TABLE "inventory_productinventory" ADD COLUMN "low_quantity" boolean
+    GENERATED ALWAYS AS ("current_quantity" <= COALESCE("minimum_stock_quantity", 0)) STORED NOT NULL;
+"""
+
+STORE_LOW_QUANTITY = """
+ALTER TABLE "inventory_productinventory" DROP COLUMN "low_quantity";
+ALTER TABLE "inventory_productinventory" ADD COLUMN "low_quantity" boolean NOT NULL DEFAULT false;
+UPDATE "inventory_productinventory"
+SET "low_quantity" = "current_quantity" <= COALESCE("minimum_stock_quantity", 0);
+ALTER TABLE "inventory_productinventory" ALTER COLUMN "low_quantity" DROP DEFAULT;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_reorder_suggestions'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='productinventory',
+                    name='low_quantity',
+                    field=core.db.fields.GeneratedBooleanField(expression='"current_quantity" <= COALESCE("minimum_stock_quantity", 0)'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(GENERATE_LOW_QUANTITY, STORE_LOW_QUANTITY),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='productinventory',
+            index=models.Index(condition=models.Q(('low_quantity', True)), fields=['created_by', '-created_at'], include=('id', 'name', 'category', 'current_quantity', 'minimum_stock_quantity'), name='product_low_stock_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.4 on 2026-10-18 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_product_low_quantity_generated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productinventory',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -1,8 +1,28 @@
-from django.db import models
+from django.db import DatabaseError, models
 import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models import F, Q, Sum, TextField
+from django.db.models.functions import Cast, Upper
+from django.utils import timezone
+from core.db.fields import GeneratedBooleanField
+from core.db.sharding import tenant_atomic
+from core.db.tracking import DirtyFieldsMixin
 
-class Base(models.Model):
+STOCK_MOVEMENT_REASONS = (
+    ("OPENING", "OPENING"),
+    ("RESTOCK", "RESTOCK"),
+    ("ADJUSTMENT", "ADJUSTMENT"),
+    ("RESERVED", "RESERVED"),
+    ("RELEASED", "RELEASED"),
+)
+
+pending_movements = ContextVar("pending_movements", default=None)
+
+
+class Base(DirtyFieldsMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -26,6 +46,10 @@ class Label(Base):
 
 
 
+class EditConflict(DatabaseError):
+    """The product changed since the version an edit was based on"""
+
+
 class ProductInventory(Base):
     name = models.CharField(max_length=255)
     cost_price = models.DecimalField(max_digits=12, decimal_places=2)
@@ -37,21 +61,264 @@ class ProductInventory(Base):
     )
     labels = models.ManyToManyField(Label)
     category = models.CharField(max_length=255)
-    low_quantity = models.BooleanField(default=False)
+    # kept by the database on every write of the quantities
+    low_quantity = GeneratedBooleanField(
+        expression='"current_quantity" <= COALESCE("minimum_stock_quantity", 0)'
+    )
+    # number of ProductStockShard counters holding the stock, 0 keeps it in
+    # current_quantity
+    stock_shards = models.PositiveSmallIntegerField(default=0)
+    # bumped by every edit and restock, not by sales, and served as the ETag
+    version = models.PositiveIntegerField(default=1)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="product_owner")
     
     class Meta:
         ordering = ("-created_at",)
         verbose_name_plural = "ProductInventories"
         unique_together = ("name", "created_by")
+        indexes = [
+            GinIndex(fields=["name"], name="product_name_trgm_idx", opclasses=["gin_trgm_ops"]),
+            GinIndex(
+                fields=["category"], name="product_category_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+            # matches the UPPER(name::text) LIKE 'PREFIX%' that istartswith compiles to
+            models.Index(
+                F("created_by"),
+                OpClass(Upper(Cast("name", output_field=TextField())), name="text_pattern_ops"),
+                name="product_name_prefix_idx",
+            ),
+            models.Index(fields=["created_by", "cost_price"], name="product_cost_price_idx"),
+            models.Index(fields=["created_by", "selling_price"], name="product_selling_price_idx"),
+            models.Index(
+                fields=["created_by", "current_quantity"], name="product_current_qty_idx"
+            ),
+            # covers the restock notice list, so it never reads the table
+            models.Index(
+                fields=["created_by", "-created_at"],
+                include=["id", "name", "category", "current_quantity", "minimum_stock_quantity"],
+                condition=Q(low_quantity=True),
+                name="product_low_stock_idx",
+            ),
+        ]
     
     def __str__(self):
         return f"{self.name} -- {self.category}"
     
+    def save(self, *args, **kwargs):
+        if not self._state.adding or not self.current_quantity:
+            return super().save(*args, **kwargs)
+        with tenant_atomic(ProductInventory):
+            super().save(*args, **kwargs)
+            StockMovement.objects.record(self, self.current_quantity, "OPENING")
+    
+    @property
+    def etag(self):
+        return f'"{self.version}"'
+
+    def save_edit(self, version, values=None):
+        """
+        Writes the changed fields and values as the next version, in a single
+        UPDATE that only applies while the product is still at version.
+        Raises EditConflict when another edit got there first.
+        """
+        values = {**(values or {}), "version": version + 1}
+        if version != self.version or not self.save_where(values, version=version):
+            raise EditConflict("The product was changed meanwhile, reload it and try again")
+
+    def locked_stock(self):
+        """Stock on hand, locking the rows holding it until the transaction ends"""
+        if self.stock_shards:
+            return sum(
+                ProductStockShard.objects.select_for_update()
+                .filter(product=self)
+                .values_list("quantity", flat=True)
+            )
+        return ProductInventory.objects.select_for_update(no_key=True).values_list(
+            "current_quantity", flat=True
+        ).get(pk=self.pk)
+    
     def restock(self, quantity):
-        self.current_quantity = quantity
-        self.default_quantity = quantity
-        self.save()
-        if self.current_quantity > self.minimum_stock_quantity:
-            self.low_quantity = False
-            self.save()
+        with tenant_atomic(ProductInventory):
+            previous = self.locked_stock()
+            # written even when equal to the loaded values, sales may have
+            # changed the stock since
+            self.save_where(
+                {"current_quantity": quantity, "default_quantity": quantity, "version": F("version") + 1}
+            )
+            if self.stock_shards:
+                ProductStockShard.objects.spread(self, quantity)
+            StockMovement.objects.record(self, quantity - previous, "RESTOCK")
+
+
+class ProductStockShardManager(models.Manager):
+    def spread(self, product, quantity):
+        """Splits quantity evenly over the product's stock_shards counters"""
+        shards = product.stock_shards
+        base, extra = divmod(quantity, shards)
+        with tenant_atomic(self.model):
+            list(self.select_for_update().filter(product=product).values_list("pk"))
+            self.filter(product=product, shard__gte=shards).delete()
+            self.bulk_create(
+                [
+                    self.model(product=product, shard=shard, quantity=base + (shard < extra))
+                    for shard in range(shards)
+                ],
+                update_conflicts=True,
+                unique_fields=["product", "shard"],
+                update_fields=["quantity", "updated_at"],
+            )
+
+    def total(self, product):
+        return self.filter(product=product).aggregate(total=models.Sum("quantity"))["total"] or 0
+
+
+class ProductStockShard(Base):
+    """One of the counters a hot product's stock is split over, so concurrent
+    reservations lock different rows"""
+    product = models.ForeignKey(
+        ProductInventory, on_delete=models.CASCADE, related_name="stock_shard_counters"
+    )
+    shard = models.PositiveSmallIntegerField()
+    quantity = models.IntegerField(default=0)
+
+    objects = ProductStockShardManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "shard"], name="unique_product_stock_shard"),
+            models.CheckConstraint(check=Q(quantity__gte=0), name="stock_shard_quantity_gte_0"),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} -- shard {self.shard} ({self.quantity})"
+
+
+class StockMovementManager(models.Manager):
+    def record(self, product, quantity, reason):
+        """Appends a stock change of product to the ledger. Call it in the
+        transaction changing the stock, inside batch() the row is written
+        with the others of the batch."""
+        quantity = int(quantity)
+        if not quantity:
+            return None
+        movement = self.model(
+            product_id=product.pk,
+            created_by_id=product.created_by_id,
+            quantity=quantity,
+            reason=reason,
+        )
+        batch = pending_movements.get()
+        if batch is not None:
+            batch.append(movement)
+        else:
+            movement.save(force_insert=True)
+        return movement
+
+    @contextmanager
+    def batch(self):
+        """Transaction writing the movements recorded inside it with a single
+        insert before it commits"""
+        if pending_movements.get() is not None:
+            yield
+            return
+        token = pending_movements.set([])
+        try:
+            with tenant_atomic(self.model):
+                yield
+                self.bulk_create(pending_movements.get())
+        finally:
+            pending_movements.reset(token)
+
+    def balance(self, product, at):
+        """Stock of product at the time at: the nearest snapshot taken before
+        it plus the movements since, both indexed range scans"""
+        snapshot = (
+            StockSnapshot.objects.filter(product=product, taken_at__lte=at)
+            .order_by("-taken_at")
+            .values_list("quantity", "taken_at")
+            .first()
+        )
+        quantity, since = snapshot or (0, None)
+        movements = self.filter(product=product, created_at__lte=at)
+        if since is not None:
+            movements = movements.filter(created_at__gt=since)
+        return quantity + (movements.aggregate(total=Sum("quantity"))["total"] or 0)
+
+
+class StockMovement(models.Model):
+    """Append-only ledger of stock changes, range partitioned by month on
+    created_at. The table's primary key is (id, created_at)."""
+    partition_by = "created_at"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    product = models.ForeignKey(
+        ProductInventory, on_delete=models.CASCADE, related_name="stock_movements", db_index=False
+    )
+    created_by = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="stock_movements", db_index=False
+    )
+    quantity = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=STOCK_MOVEMENT_REASONS)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = StockMovementManager()
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["product", "created_at"], name="stock_movement_product_idx"),
+            models.Index(fields=["created_by", "created_at"], name="stock_movement_owner_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -- {self.quantity:+d} ({self.reason})"
+
+
+class StockSnapshot(Base):
+    """Stock of a product at taken_at, so balances only replay the ledger
+    from the nearest snapshot"""
+    product = models.ForeignKey(
+        ProductInventory, on_delete=models.CASCADE, related_name="stock_snapshots", db_index=False
+    )
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="stock_snapshots")
+    quantity = models.IntegerField()
+    taken_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ("-taken_at",)
+        constraints = [
+            models.UniqueConstraint(fields=["product", "taken_at"], name="unique_stock_snapshot")
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -- {self.quantity} at {self.taken_at}"
+
+
+class ReorderSuggestion(Base):
+    """What to reorder of a product, written by manage.py suggest_reorders
+    from its recent sales"""
+    product = models.OneToOneField(
+        ProductInventory, on_delete=models.CASCADE, related_name="reorder_suggestion"
+    )
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="reorder_suggestions")
+    # units sold per day, recent days weighing more
+    velocity = models.FloatField(default=0)
+    # average selling_price - product_cost_price of the units sold, the
+    # current prices when none were
+    margin = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # null when the product is not selling
+    days_of_stock = models.FloatField(blank=True, null=True)
+    reorder_quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ("days_of_stock",)
+        indexes = [
+            models.Index(
+                fields=["created_by", "days_of_stock"],
+                condition=Q(reorder_quantity__gt=0),
+                name="reorder_suggestion_due_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -- reorder {self.reorder_quantity}"
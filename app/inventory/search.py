@@ -0,0 +1,59 @@
+from decimal import Decimal, InvalidOperation
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Q
+from django.db.models.functions import Greatest
+from rest_framework import filters
+
+
+class TrigramSearchFilter(filters.SearchFilter):
+    """Ranked fuzzy search served by the pg_trgm GIN indexes.
+
+    Text ``search_fields`` are matched with word similarity (``<%``), which the
+    trigram indexes support, instead of ``icontains`` over casts.
+    ``search_numeric_fields`` are only matched, exactly, when the search term
+    is a number. Results are ordered by their best similarity.
+    """
+
+    def get_search_term(self, request):
+        term = request.query_params.get(self.search_param, "")
+        return term.replace("\x00", "").strip()
+
+    def get_number(self, term):
+        try:
+            number = Decimal(term)
+        except InvalidOperation:
+            return None
+        return number if number.is_finite() else None
+
+    def get_numeric_lookups(self, queryset, fields, number):
+        lookups = Q()
+        for field in fields:
+            internal_type = queryset.model._meta.get_field(field).get_internal_type()
+            if internal_type == "DecimalField":
+                lookups |= Q(**{field: number})
+            elif number == number.to_integral_value():
+                lookups |= Q(**{field: int(number)})
+        return lookups
+
+    def filter_queryset(self, request, queryset, view):
+        term = self.get_search_term(request)
+        text_fields = self.get_search_fields(view, request) or []
+        numeric_fields = getattr(view, "search_numeric_fields", None) or []
+        if not term or not (text_fields or numeric_fields):
+            return queryset
+
+        lookups = Q()
+        for field in text_fields:
+            lookups |= Q(**{f"{field}__trigram_word_similar": term})
+        number = self.get_number(term)
+        if number is not None:
+            lookups |= self.get_numeric_lookups(queryset, numeric_fields, number)
+        if not lookups:
+            return queryset.none()
+        queryset = queryset.filter(lookups)
+
+        if text_fields:
+            similarities = [TrigramWordSimilarity(term, field) for field in text_fields]
+            rank = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+            queryset = queryset.annotate(search_rank=rank).order_by("-search_rank")
+        return queryset
@@ -1,5 +1,8 @@
 from rest_framework import serializers
-from .models import ProductInventory, Label
+from core.db.sharding import tenant_atomic
+from core.serializers import RowSerializer
+from .models import ProductInventory, ProductStockShard, ReorderSuggestion, StockMovement, Label
+from .autocomplete import product_name_indexes
 
 
 class LabelSerializer(serializers.ModelSerializer):
@@ -27,7 +30,8 @@ class ProductInventorySerializer(serializers.ModelSerializer):
     def validate(self, attrs):
         instance = getattr(self, 'instance', None)
         user = self.context["request"].user
-        name = attrs.get("name", None)
+        # partial edits leave out the fields they keep
+        name = attrs.get("name", getattr(instance, "name", None))
         minimum_stock_quantity = attrs.get("minimum_stock_quantity") or 0
         current_quantity = attrs.get("current_quantity") or 0
         
@@ -46,14 +50,30 @@ class ProductInventorySerializer(serializers.ModelSerializer):
         if not validated_data.get("minimum_stock_quantity"):
             validated_data["minimum_stock_quantity"] = 0
         
-        return super().create(validated_data)
+        product = super().create(validated_data)
+        product_name_indexes.invalidate(user.id)
+        return product
     
     def update(self, instance, validated_data):
+        """Saves the edit with ProductInventory.save_edit(), as the version
+        passed to save() or the one of instance"""
+        version = validated_data.pop("version", instance.version)
+        stock = validated_data.pop("current_quantity", None)
         validated_data["created_by"] = self.context["request"].user
-        validated_data['current_quantity'] = validated_data["default_quantity"]
-        if not validated_data.get("minimum_stock_quantity"):
+        if "minimum_stock_quantity" in validated_data and not validated_data["minimum_stock_quantity"]:
             validated_data["minimum_stock_quantity"] = 0
-        return super().update(instance, validated_data)
+        with tenant_atomic(ProductInventory):
+            previous = instance.locked_stock() if stock is not None else None
+            for field, value in validated_data.items():
+                setattr(instance, field, value)
+            instance.save_edit(version, None if stock is None else {"current_quantity": int(stock)})
+            if stock is not None:
+                quantity = int(stock)
+                if instance.stock_shards:
+                    ProductStockShard.objects.spread(instance, quantity)
+                StockMovement.objects.record(instance, quantity - previous, "ADJUSTMENT")
+        product_name_indexes.invalidate(instance.created_by_id)
+        return instance
 
 
 class ProductListInventorySerializer(serializers.ModelSerializer):
@@ -67,5 +87,44 @@ class ProductListInventorySerializer(serializers.ModelSerializer):
         }
 
 
+class ProductRowSerializer(RowSerializer):
+    """Output of ProductListInventorySerializer from values_list() rows"""
+    model = ProductInventory
+    fields = (
+        "id", "created_at", "updated_at", "name", "cost_price", "selling_price",
+        "default_quantity", "current_quantity", "minimum_stock_quantity", "category",
+        "low_quantity", "stock_shards", "version", "created_by", "labels",
+    )
+
+
 class RestockProductSerializer(serializers.Serializer):
     quantity = serializers.IntegerField()
+
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StockMovement
+        fields = ("id", "quantity", "reason", "created_at")
+
+
+class StockHistoryQuerySerializer(serializers.Serializer):
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+
+
+class ReorderSuggestionSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source="product.name", read_only=True)
+    current_quantity = serializers.IntegerField(source="product.current_quantity", read_only=True)
+
+    class Meta:
+        model = ReorderSuggestion
+        fields = (
+            "product",
+            "name",
+            "current_quantity",
+            "velocity",
+            "margin",
+            "days_of_stock",
+            "reorder_quantity",
+            "updated_at",
+        )
@@ -0,0 +1,183 @@
+"""
+Stock reservations for products, optionally spread over sharded counters.
+
+A product with stock_shards = K keeps its available stock in K
+ProductStockShard rows. Reservations decrement a random shard that no other
+transaction holds and only wait for a busy one when none is free, so
+concurrent checkouts of a best-seller lock different rows instead of queueing
+on the product row.
+
+current_quantity of a sharded product is folded from the shards after each
+reservation unless another transaction is folding it already, and by
+manage.py fold_stock for products that went quiet. low_quantity follows
+current_quantity in the database.
+
+Every change is recorded in the stock movement ledger in the same
+transaction.
+"""
+import random
+from django.db.models import F
+from django.utils import timezone
+from core.db.sharding import tenant_atomic
+from .models import ProductInventory, ProductStockShard, StockMovement
+
+
+def adjust_product(product, quantity):
+    """Adds quantity (negative to take it) to current_quantity in a single
+    conditional update, returns False when the stock would go below zero"""
+    updated = ProductInventory.objects.filter(
+        pk=product.pk, current_quantity__gte=max(-quantity, 0)
+    ).update(
+        current_quantity=F("current_quantity") + quantity,
+        updated_at=timezone.now(),
+    )
+    if updated:
+        # already stored, so a later save() does not write it again
+        product.current_quantity += quantity
+        product.remember(["current_quantity"])
+    return bool(updated)
+
+
+def shard_order(product):
+    shards = list(range(product.stock_shards))
+    start = random.randrange(len(shards))
+    return shards[start:] + shards[:start]
+
+
+def reserve(product, quantity=1):
+    """Takes quantity off the product's stock, returns False when there is
+    not enough left"""
+    with tenant_atomic(StockMovement):
+        if product.stock_shards:
+            reserved = take_from_shards(product, quantity)
+        else:
+            reserved = adjust_product(product, -quantity)
+        if reserved:
+            StockMovement.objects.record(product, -quantity, "RESERVED")
+    if reserved and product.stock_shards:
+        fold(product, wait=False)
+    return reserved
+
+
+def take_from_shards(product, quantity):
+    now = timezone.now()
+    # a random shard with enough stock that no other checkout holds
+    counter = ProductStockShard.objects.select_for_update(skip_locked=True).filter(
+        product=product, quantity__gte=quantity
+    ).order_by("?").values_list("pk", flat=True).first()
+    if counter is not None and ProductStockShard.objects.filter(pk=counter).update(
+        quantity=F("quantity") - quantity, updated_at=now
+    ):
+        return True
+
+    # every shard with enough stock is busy, wait for one of them
+    for shard in shard_order(product):
+        if ProductStockShard.objects.filter(
+            product=product, shard=shard, quantity__gte=quantity
+        ).update(quantity=F("quantity") - quantity, updated_at=now):
+            return True
+
+    # no single shard holds enough, take it from several at once
+    counters = list(
+        ProductStockShard.objects.select_for_update()
+        .filter(product=product, quantity__gt=0)
+        .order_by("shard")
+    )
+    if not counters and not ProductStockShard.objects.filter(product=product).exists():
+        # stock was folded back into the product row meanwhile
+        product.stock_shards = 0
+        product.remember(["stock_shards"])
+        return adjust_product(product, -quantity)
+    if sum(counter.quantity for counter in counters) < quantity:
+        return False
+    remaining = quantity
+    for counter in counters:
+        taken = min(counter.quantity, remaining)
+        counter.quantity -= taken
+        counter.save(update_fields=["quantity", "updated_at"])
+        remaining -= taken
+        if not remaining:
+            break
+    return True
+
+
+def release(product, quantity=1):
+    """Puts quantity back into the product's stock"""
+    with tenant_atomic(StockMovement):
+        if not (product.stock_shards and put_into_shards(product, quantity)):
+            adjust_product(product, quantity)
+        StockMovement.objects.record(product, quantity, "RELEASED")
+    if product.stock_shards:
+        fold(product, wait=False)
+    return True
+
+
+def put_into_shards(product, quantity):
+    """Adds quantity to a shard of the product, returns False when it has
+    none left: shard_stock() folded them back into current_quantity"""
+    now = timezone.now()
+    if ProductStockShard.objects.filter(
+        product=product, shard=random.randrange(product.stock_shards)
+    ).update(quantity=F("quantity") + quantity, updated_at=now):
+        return True
+    # resharded into fewer shards meanwhile, any of them will do
+    counter = ProductStockShard.objects.filter(product=product).values_list("pk", flat=True).first()
+    if counter is not None and ProductStockShard.objects.filter(pk=counter).update(
+        quantity=F("quantity") + quantity, updated_at=now
+    ):
+        return True
+    product.stock_shards = 0
+    product.remember(["stock_shards"])
+    return False
+
+
+def fold(product, wait=True):
+    """
+    Writes the shard total to current_quantity, returns None when there is
+    nothing to fold. Without wait it gives up when another transaction holds
+    the product row, the next reservation or fold_stock run catches up.
+    """
+    with tenant_atomic(ProductInventory):
+        # FOR NO KEY UPDATE, held to the end of the checkout: the foreign key
+        # checks of the cart and ledger rows inserted for the product meanwhile
+        # take FOR KEY SHARE, which only FOR UPDATE would make wait
+        locked = ProductInventory.objects.select_for_update(
+            no_key=True, skip_locked=not wait
+        ).filter(pk=product.pk)
+        shards = list(locked.values_list("stock_shards", flat=True))
+        if not shards:
+            return None
+        if not shards[0]:
+            # folded back by shard_stock() since the product was read, the
+            # shard total is 0 and current_quantity is the stock
+            product.stock_shards = 0
+            product.remember(["stock_shards"])
+            return None
+        total = ProductStockShard.objects.total(product)
+        ProductInventory.objects.filter(pk=product.pk).update(
+            current_quantity=total, updated_at=timezone.now()
+        )
+    product.current_quantity = total
+    product.remember(["current_quantity"])
+    return total
+
+
+def shard_stock(product, shards):
+    """Spreads the product's stock over shards counters, 0 folds it back into
+    current_quantity"""
+    with tenant_atomic(ProductInventory):
+        product = ProductInventory.objects.select_for_update(no_key=True).get(pk=product.pk)
+        if product.stock_shards:
+            list(ProductStockShard.objects.select_for_update().filter(product=product).values_list("pk"))
+            quantity = ProductStockShard.objects.total(product)
+        else:
+            quantity = product.current_quantity
+
+        product.stock_shards = shards
+        product.current_quantity = quantity
+        product.save(update_fields=["stock_shards", "current_quantity", "updated_at"])
+        if shards:
+            ProductStockShard.objects.spread(product, quantity)
+        else:
+            ProductStockShard.objects.filter(product=product).delete()
+    return product
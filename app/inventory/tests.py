@@ -1,3 +1,107 @@
-from django.test import TestCase
+import re
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from .models import ProductInventory
 
-# Create your tests here.
+
+def product_of(user):
+    return ProductInventory.objects.create(
+        name="Rice",
+        cost_price=5,
+        selling_price=8,
+        default_quantity=10,
+        current_quantity=10,
+        category="food",
+        created_by=user,
+    )
+
+
+class ProductEditTest(TestCase):
+    """Edits of a product guarded by the ETag it was read with"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("owner")
+
+    def setUp(self):
+        self.product = product_of(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def edit(self, data, if_match=None):
+        headers = {} if if_match is None else {"HTTP_IF_MATCH": if_match}
+        url = reverse("inventory:productinventory-detail", args=[self.product.pk])
+        return self.client.patch(url, data, format="json", **headers)
+
+    def stored_name(self):
+        return ProductInventory.objects.values_list("name", flat=True).get(pk=self.product.pk)
+
+    def test_edit_with_current_etag(self):
+        response = self.edit({"name": "Brown rice"}, self.product.etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["ETag"], '"2"')
+        self.assertEqual(self.stored_name(), "Brown rice")
+
+    def test_stale_etag_is_refused(self):
+        self.assertEqual(self.edit({"name": "Brown rice"}, '"1"').status_code, status.HTTP_200_OK)
+        response = self.edit({"name": "White rice"}, '"1"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(response["ETag"], '"2"')
+        self.assertEqual(self.stored_name(), "Brown rice")
+
+    def test_weak_etag_is_compared_as_strong(self):
+        response = self.edit({"name": "Brown rice"}, 'W/"1"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.stored_name(), "Brown rice")
+
+    def test_malformed_etag_is_refused(self):
+        for tag in ["1", '"1', '"one"', ""]:
+            with self.subTest(tag=tag):
+                response = self.edit({"name": "Brown rice"}, tag)
+                self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(self.stored_name(), "Rice")
+
+    def test_edit_without_if_match(self):
+        self.assertEqual(self.edit({"name": "Brown rice"}).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.stored_name(), "Brown rice")
+
+    @override_settings(PRODUCT_EDIT_REQUIRE_IF_MATCH=True)
+    def test_if_match_required(self):
+        response = self.edit({"name": "Brown rice"})
+        self.assertEqual(response.status_code, status.HTTP_428_PRECONDITION_REQUIRED)
+        self.assertEqual(self.stored_name(), "Rice")
+        self.assertEqual(self.edit({"name": "Brown rice"}, '"1"').status_code, status.HTTP_200_OK)
+
+
+class DirtyFieldsTest(TestCase):
+    """save() of a loaded product writes only the fields changed since"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("owner")
+        cls.pk = product_of(cls.user).pk
+
+    def test_unchanged_product_is_not_written(self):
+        product = ProductInventory.objects.get(pk=self.pk)
+        with CaptureQueriesContext(connection) as queries:
+            product.save()
+        self.assertEqual(len(queries), 0)
+
+    def test_changed_fields_are_written_with_updated_at(self):
+        product = ProductInventory.objects.get(pk=self.pk)
+        product.name = "Brown rice"
+        product.selling_price = 9
+        with CaptureQueriesContext(connection) as queries:
+            product.save()
+        updates = [query["sql"] for query in queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        assignments = updates[0].split(" SET ", 1)[1].split(" WHERE ", 1)[0]
+        self.assertEqual(
+            set(re.findall(r'"(\w+)" =', assignments)), {"name", "selling_price", "updated_at"}
+        )
+        self.assertEqual(product.dirty_fields(), set())
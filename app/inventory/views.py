@@ -6,38 +6,81 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import serializers
 from rest_framework.parsers import MultiPartParser
 from sentry_sdk import capture_exception
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from django.conf import settings
 from django.db.models import Sum
-from .models import ProductInventory
+from django.utils import timezone
+from datetime import timedelta
+from core.async_views import AsyncViewSetMixin
+from core.db.routers import ReplicaRoutingMixin
+from core.serializers import RowListMixin
+from .models import EditConflict, ProductInventory, ReorderSuggestion, StockMovement
+from .search import TrigramSearchFilter
+from .autocomplete import product_name_indexes
 from order.models import OrderItem
 from django.db.models import Count, Sum
 from order.serializers import OrderCustomerSerializer
 from .serializers import (
     ProductInventorySerializer,
     ProductListInventorySerializer,
+    ProductRowSerializer,
+    ReorderSuggestionSerializer,
     RestockProductSerializer,
+    StockHistoryQuerySerializer,
+    StockMovementSerializer,
 )
 from django.db.models import F
+from django.db.models.functions import Length
 
 
-class ProductInventoryViewSet(viewsets.ModelViewSet):
+AUTOCOMPLETE_LIMIT = 20
+STOCK_HISTORY_DAYS = 30
+
+
+def succeeded(result):
+    return {"success": True, "result": result}
+
+
+def if_match_version(request):
+    """Product version named by the If-Match header, None without one or
+    for *. Raises ValueError for anything else."""
+    tag = request.headers.get("If-Match", "*").strip()
+    if tag == "*":
+        return None
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    if len(tag) < 2 or tag[0] != '"' or tag[-1] != '"':
+        raise ValueError(tag)
+    return int(tag[1:-1])
+
+
+class ProductInventoryViewSet(ReplicaRoutingMixin, AsyncViewSetMixin, RowListMixin, viewsets.ModelViewSet):
     queryset = ProductInventory.objects.all()
     serializer_class = ProductInventorySerializer
+    row_serializer_class = ProductRowSerializer
     http_method_names = ["get", "post", "patch", "delete"]
+    replica_actions = ["list", "export", "get_summary", "customers", "stock_history", "reorder_suggestions"]
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
+        TrigramSearchFilter,
         filters.OrderingFilter,
     ]
     permission_classes = [IsAuthenticated]
     search_fields = [
         "name",
+        "category",
+    ]
+    search_numeric_fields = [
         "cost_price",
         "selling_price",
         "current_quantity",
-        "default_quantity",
-        "minimum_stock_quantity",
     ]
+    filterset_fields = {
+        "category": ["exact"],
+        "cost_price": ["exact", "gte", "lte"],
+        "selling_price": ["exact", "gte", "lte"],
+        "current_quantity": ["exact", "gte", "lte"],
+    }
     ordering_fields = ["name", "quantity", "selling_price", "cost_price"]
     
     def get_queryset(self):
@@ -56,25 +99,17 @@ class ProductInventoryViewSet(viewsets.ModelViewSet):
             return result
         return serializer
     
+    def perform_destroy(self, instance):
+        instance.delete()
+        product_name_indexes.invalidate(instance.created_by_id)
+    
     @extend_schema(
         responses={200: ProductInventorySerializer(many=True)}
     )
     def list(self, request):
         try:
-            data = self.get_queryset()
-            serializer = ProductListInventorySerializer(data, many=True)
-            data = self.filter_queryset(data)
-            page = self.paginate_queryset(data)
-            if page is not None:
-                serializer = ProductListInventorySerializer(page, many=True)
-                results = self.get_paginated_response(serializer.data)
-                return Response(
-                    {"success": True, "result": results.data}, status=status.HTTP_200_OK
-                )
-            return Response(
-                {"success": False, "error": serializer.errors},
-                status.HTTP_400_BAD_REQUEST,
-            )
+            data = self.filter_queryset(self.get_queryset())
+            return self.list_rows(data, envelope=succeeded)
         except Exception as e:
             capture_exception(e)
             return Response(
@@ -92,6 +127,7 @@ class ProductInventoryViewSet(viewsets.ModelViewSet):
                 return Response(
                     {"success": True, "result": serializer.data, "errors": {}},
                     status=status.HTTP_200_OK,
+                    headers={"ETag": item.etag},
                 )
             return Response(
                 {"success": False, "error": serializer.errors},
@@ -103,15 +139,105 @@ class ProductInventoryViewSet(viewsets.ModelViewSet):
                 {"success": False, "message": str(e)},
                 status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+
+    async def alist(self, request):
+        try:
+            data = self.filter_queryset(self.get_queryset())
+            return await self.alist_rows(data, envelope=succeeded)
+        except Exception as e:
+            capture_exception(e)
+            return Response(
+                {"success": False, "message": str(e)},
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    async def aretrieve(self, request, *args, **kwargs):
+        try:
+            # labels read by aget() too, the serializer runs on the event loop
+            item = await ProductInventory.objects.prefetch_related("labels").aget(
+                pk=kwargs.get("pk"), created_by=request.user
+            )
+            serializer = ProductListInventorySerializer(item, many=False)
+            return Response(
+                {"success": True, "result": serializer.data, "errors": {}},
+                status=status.HTTP_200_OK,
+                headers={"ETag": item.etag},
+            )
+        except Exception as e:
+            capture_exception(e)
+            return Response(
+                {"success": False, "message": str(e)},
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
     
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "If-Match",
+                str,
+                OpenApiParameter.HEADER,
+                description="ETag of the product the edit is based on",
+            )
+        ]
+    )
+    def partial_update(self, request, pk=None):
+        """This endpoint to edit a product. Send the ETag the product was read
+        with as If-Match, the edit is refused with 412 when the product was
+        changed since."""
+        try:
+            product = ProductInventory.objects.filter(pk=pk, created_by=request.user).first()
+            if product is None:
+                return Response(
+                    {"success": False, "error": "Product not found"},
+                    status.HTTP_404_NOT_FOUND,
+                )
+            try:
+                version = if_match_version(request)
+            except ValueError:
+                version = -1
+            if version is None and settings.PRODUCT_EDIT_REQUIRE_IF_MATCH:
+                return Response(
+                    {"success": False, "error": "If-Match header is required"},
+                    status.HTTP_428_PRECONDITION_REQUIRED,
+                )
+            serializer = self.get_serializer(product, data=request.data, partial=True)
+            if serializer.is_valid():
+                serializer.save(version=product.version if version is None else version)
+                return Response(
+                    {"success": True, "result": serializer.data, "errors": {}},
+                    status=status.HTTP_200_OK,
+                    headers={"ETag": product.etag},
+                )
+            return Response(
+                {"success": False, "error": serializer.errors},
+                status.HTTP_400_BAD_REQUEST,
+            )
+        except EditConflict as e:
+            current = ProductInventory.objects.filter(pk=pk).values_list("version", flat=True).first()
+            return Response(
+                {"success": False, "error": str(e)},
+                status.HTTP_412_PRECONDITION_FAILED,
+                headers={"ETag": f'"{current}"'} if current is not None else None,
+            )
+        except serializers.ValidationError as e:
+            return Response(
+                {"success": False, "error": e.detail[0]}, status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            capture_exception(e)
+            return Response(
+                {"success": False, "message": str(e)},
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
     @action(methods=["GET"], detail=False, url_path="summary")
     def get_summary(self, request):
         try:
-            data = self.get_queryset()
-            if data:
-                results = data.aggregate(
-                    items=Sum("current_quantity"), values=Sum("selling_price")
-                )
+            # whether there are products at all counted by the same query
+            results = self.get_queryset().aggregate(
+                items=Sum("current_quantity"), values=Sum("selling_price"), products=Count("pk")
+            )
+            if results.pop("products"):
                 return Response(results, status=status.HTTP_200_OK)
             return Response(
                 {"success": False, "error": "Product not found"},
@@ -124,6 +250,82 @@ class ProductInventoryViewSet(viewsets.ModelViewSet):
                 status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    async def aget_summary(self, request):
+        try:
+            # whether there are products at all counted by the same query
+            results = await self.get_queryset().aaggregate(
+                items=Sum("current_quantity"), values=Sum("selling_price"), products=Count("pk")
+            )
+            if results.pop("products"):
+                return Response(results, status=status.HTTP_200_OK)
+            return Response(
+                {"success": False, "error": "Product not found"},
+                status.HTTP_400_BAD_REQUEST,
+            )
+        except Exception as e:
+            capture_exception(e)
+            return Response(
+                {"success": False, "message": str(e)},
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    @extend_schema(
+        responses={200: ProductListInventorySerializer(many=True)}
+    )
+    @action(methods=["GET"], detail=False, url_path="export")
+    def export(self, request):
+        """This endpoint to stream every product matching the list filters, without pages"""
+        try:
+            products = self.filter_queryset(self.get_queryset())
+            return self.list_rows(products, envelope=succeeded, paginate=False)
+        except Exception as e:
+            capture_exception(e)
+            return Response(
+                {"success": False, "message": str(e)},
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter("q", str, description="product name prefix"),
+            OpenApiParameter("limit", int, description=f"at most {AUTOCOMPLETE_LIMIT}"),
+        ]
+    )
+    @action(methods=["GET"], detail=False, url_path="autocomplete")
+    def autocomplete(self, request):
+        """This endpoint to get the products whose name starts with the typed prefix"""
+        try:
+            prefix = request.query_params.get("q", "").strip()
+            limit = int(request.query_params.get("limit", AUTOCOMPLETE_LIMIT))
+            limit = max(1, min(limit, AUTOCOMPLETE_LIMIT))
+            results = []
+            if prefix:
+                index = product_name_indexes.get(request.user.id)
+                if index is not None:
+                    results = index.search(prefix, limit)
+                else:
+                    # too many products for the in-process index
+                    results = (
+                        self.get_queryset()
+                        .filter(name__istartswith=prefix)
+                        .order_by(Length("name"), "name")
+                        .values("id", "name", "selling_price")[:limit]
+                    )
+            return Response(
+                {"success": True, "result": list(results)}, status=status.HTTP_200_OK
+            )
+        except ValueError:
+            return Response(
+                {"success": False, "error": "limit must be a number"},
+                status.HTTP_400_BAD_REQUEST,
+            )
+        except Exception as e:
+            capture_exception(e)
+            return Response(
+                {"success": False, "message": str(e)},
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
     @action(
         methods=["PATCH"],
         detail=True,
@@ -139,7 +341,6 @@ class ProductInventoryViewSet(viewsets.ModelViewSet):
             if serializer.is_valid():
                 restock_quantity = data.get("quantity", 0)
                 product_obj.restock(int(restock_quantity))
-                product_obj.save()
                 return Response(
                     {"success": True, "result": serializer.data, "errors": {}},
                     status=status.HTTP_200_OK,
@@ -159,6 +360,81 @@ class ProductInventoryViewSet(viewsets.ModelViewSet):
                 status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
     
+    @extend_schema(
+        parameters=[StockHistoryQuerySerializer],
+        responses={200: StockMovementSerializer(many=True)},
+    )
+    @action(
+        methods=["GET"],
+        detail=True,
+        serializer_class=StockMovementSerializer,
+        filter_backends=[],
+        url_path="stock-history",
+    )
+    def stock_history(self, request, pk=None):
+        """This endpoint to get the stock of a product at the start and end of a period
+        and the stock movements in between, the last 30 days by default"""
+        try:
+            query = StockHistoryQuerySerializer(data=request.query_params)
+            if not query.is_valid():
+                return Response(
+                    {"success": False, "error": query.errors},
+                    status.HTTP_400_BAD_REQUEST,
+                )
+            end = query.validated_data.get("end") or timezone.now()
+            start = query.validated_data.get("start") or end - timedelta(days=STOCK_HISTORY_DAYS)
+            product = ProductInventory.objects.filter(pk=pk, created_by=request.user).first()
+            if product is None:
+                return Response(
+                    {"success": False, "error": "Product not found"},
+                    status.HTTP_404_NOT_FOUND,
+                )
+            movements = StockMovement.objects.filter(
+                product=product, created_at__gt=start, created_at__lte=end
+            )
+            page = self.paginate_queryset(movements)
+            result = self.get_paginated_response(
+                StockMovementSerializer(page, many=True).data
+            ).data
+            result["opening"] = StockMovement.objects.balance(product, start)
+            result["closing"] = StockMovement.objects.balance(product, end)
+            return Response({"success": True, "result": result}, status=status.HTTP_200_OK)
+        except Exception as e:
+            capture_exception(e)
+            return Response(
+                {"success": False, "message": str(e)},
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+    
+    @extend_schema(responses={200: ReorderSuggestionSerializer(many=True)})
+    @action(
+        methods=["GET"],
+        detail=False,
+        serializer_class=ReorderSuggestionSerializer,
+        filter_backends=[],
+        url_path="reorder-suggestions",
+    )
+    def reorder_suggestions(self, request):
+        """This endpoint to get a paginated list of the products due for a reorder,
+        the ones running out soonest first"""
+        try:
+            suggestions = (
+                ReorderSuggestion.objects.filter(created_by=request.user, reorder_quantity__gt=0)
+                .select_related("product")
+                .order_by(F("days_of_stock").asc(nulls_last=True))
+            )
+            page = self.paginate_queryset(suggestions)
+            result = self.get_paginated_response(
+                ReorderSuggestionSerializer(page, many=True).data
+            )
+            return Response({"success": True, "result": result.data}, status=status.HTTP_200_OK)
+        except Exception as e:
+            capture_exception(e)
+            return Response(
+                {"success": False, "message": str(e)},
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
     @extend_schema(responses={200: OrderCustomerSerializer(many=True)})
     @action(
         methods=["GET"],
@@ -166,6 +442,7 @@ class ProductInventoryViewSet(viewsets.ModelViewSet):
         serializer_class=OrderCustomerSerializer,
         permission_classes=[IsAuthenticated],
         filter_backends=[DjangoFilterBackend, filters.SearchFilter],
+        filterset_fields={"created_at": ["gte", "lt"]},
         search_fields=[
             "order__customer__customer_name",
             "order__customer__customer_email",
@@ -0,0 +1,97 @@
+"""
+Sales analytics bucketed by hour, day, week or month.
+
+Short ranges and hourly buckets aggregate order items with date_trunc over
+the (created_by, created_at) index. Longer ranges read the daily SalesRollup
+rows for the whole days they cover and only aggregate order items for the
+partial days at their edges. Buckets are in UTC.
+"""
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.db.models import DateField, DecimalField, F, Sum
+from django.db.models.functions import Trunc
+from .models import OrderItem, SalesRollup
+
+
+BUCKETS = ("hour", "day", "week", "month")
+# ranges covering at least this many whole days are read from the rollups
+ROLLUP_MIN_DAYS = 7
+
+
+def midnight(day):
+    return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+
+def product_filters(product=None, category=None, label=None):
+    """Lookups shared by order items and rollups, both point at a product"""
+    filters = {}
+    if product is not None:
+        filters["product"] = product
+    if category:
+        filters["product__category"] = category
+    if label is not None:
+        filters["product__labels"] = label
+    return filters
+
+
+def live_buckets(user, start, end, bucket, filters):
+    if start >= end:
+        return []
+    return (
+        OrderItem.objects.filter(created_by=user, created_at__gte=start, created_at__lt=end, **filters)
+        .annotate(period=Trunc("created_at", bucket, tzinfo=dt_timezone.utc))
+        .values("period")
+        .annotate(
+            revenue=Sum("total_price"),
+            cost=Sum(
+                F("product_cost_price") * F("quantity"),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+            units=Sum("quantity"),
+        )
+        .order_by("period")
+    )
+
+
+def rollup_buckets(user, first_day, last_day, bucket, filters):
+    """Buckets of the days from first_day up to, not including, last_day"""
+    rollups = (
+        SalesRollup.objects.filter(created_by=user, day__gte=first_day, day__lt=last_day, **filters)
+        .annotate(period=Trunc("day", bucket, output_field=DateField()))
+        .values("period")
+        .annotate(revenue=Sum("revenue"), cost=Sum("cost"), units=Sum("units"))
+        .order_by("period")
+    )
+    for row in rollups:
+        yield {**row, "period": midnight(row["period"])}
+
+
+def sales(user, start, end, bucket="day", **lookups):
+    """Returns the source used, "live" or "rollup", and the revenue, cost,
+    margin and units sold in each bucket between start and end"""
+    filters = product_filters(**lookups)
+    start = start.astimezone(dt_timezone.utc)
+    end = end.astimezone(dt_timezone.utc)
+    first_day = start.date() if start == midnight(start.date()) else start.date() + timedelta(days=1)
+    last_day = end.date()
+
+    if bucket == "hour" or (last_day - first_day).days < ROLLUP_MIN_DAYS:
+        source = "live"
+        parts = [live_buckets(user, start, end, bucket, filters)]
+    else:
+        source = "rollup"
+        parts = [
+            live_buckets(user, start, midnight(first_day), bucket, filters),
+            rollup_buckets(user, first_day, last_day, bucket, filters),
+            live_buckets(user, midnight(last_day), end, bucket, filters),
+        ]
+
+    buckets = {}
+    for part in parts:
+        for row in part:
+            total = buckets.setdefault(row["period"], {"revenue": 0, "cost": 0, "units": 0})
+            for field in ("revenue", "cost", "units"):
+                total[field] += row[field] or 0
+    return source, [
+        {"period": period, **total, "margin": total["revenue"] - total["cost"]}
+        for period, total in sorted(buckets.items())
+    ]
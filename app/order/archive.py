@@ -0,0 +1,164 @@
+"""
+Cold archive of old orders.
+
+manage.py archive_orders streams orders created before a date, with their
+items, out of the database into gzip compressed JSON lines files under
+ORDER_ARCHIVE_DIR and deletes them in batches. Every run appends to a file of
+its own, one gzip member per batch, and archive files are never rewritten.
+index/<user id>.jsonl records which member of which file holds each
+customer's orders, so a lookup only decompresses those members.
+
+A batch is written and synced before it is deleted, so a run interrupted in
+between archives those orders again next time; lookups keep the last copy of
+each order.
+"""
+import gzip
+import json
+import os
+import time
+from collections import defaultdict
+from pathlib import Path
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Order, OrderItem
+
+
+ARCHIVE_BATCH_SIZE = 500
+
+
+def archive_dir():
+    return Path(settings.ORDER_ARCHIVE_DIR)
+
+
+def index_path(user_id):
+    return archive_dir() / "index" / f"{user_id}.jsonl"
+
+
+def append(path, data):
+    """Appends data to path and syncs it, returns the offset it starts at"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "ab") as file:
+        offset = file.tell()
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    return offset
+
+
+class OrderArchive:
+    """Archives the orders of one database created before a moment"""
+
+    def __init__(self, before, using="default", batch_size=ARCHIVE_BATCH_SIZE, sleep=0):
+        self.before = before
+        self.using = using
+        self.batch_size = batch_size
+        self.sleep = sleep
+        self.name = f"orders-{using}-{timezone.now():%Y%m%dT%H%M%S%f}.jsonl.gz"
+        self.archived = 0
+
+    @property
+    def path(self):
+        return archive_dir() / self.name
+
+    def run(self):
+        orders = Order.objects.using(self.using).filter(created_at__lt=self.before).order_by("pk")
+        fields = [field.attname for field in Order._meta.concrete_fields]
+        last = None
+        while True:
+            batch = orders if last is None else orders.filter(pk__gt=last)
+            batch = list(batch.values(*fields)[: self.batch_size])
+            if not batch:
+                break
+            self.archive_batch(batch)
+            last = batch[-1]["id"]
+            if self.sleep:
+                time.sleep(self.sleep)
+        return self
+
+    def archive_batch(self, orders):
+        ids = [order["id"] for order in orders]
+        items = defaultdict(list)
+        fields = [field.attname for field in OrderItem._meta.concrete_fields]
+        # items are created with their order, the lower bound skips the
+        # partitions of older months
+        for item in OrderItem.objects.using(self.using).filter(
+            order_id__in=ids, created_at__gte=min(order["created_at"] for order in orders)
+        ).values(*fields):
+            items[item["order_id"]].append(item)
+        for order in orders:
+            order["items"] = items[order["id"]]
+
+        data = gzip.compress(
+            "".join(json.dumps(order, cls=DjangoJSONEncoder) + "\n" for order in orders).encode()
+        )
+        offset = append(self.path, data)
+        self.write_index(orders, offset, len(data))
+
+        with transaction.atomic(using=self.using):
+            OrderItem.objects.using(self.using).filter(order_id__in=ids).delete()
+            Order.objects.using(self.using).filter(pk__in=ids).delete()
+        self.archived += len(orders)
+
+    def write_index(self, orders, offset, length):
+        entries = defaultdict(lambda: defaultdict(list))
+        for order in orders:
+            entries[order["created_by_id"]][order["customer_id"]].append(order["created_at"])
+        for user_id, customers in entries.items():
+            lines = [
+                {
+                    "customer": customer and str(customer),
+                    "file": self.name,
+                    "offset": offset,
+                    "length": length,
+                    "orders": len(created),
+                    "first": min(created),
+                    "last": max(created),
+                }
+                for customer, created in customers.items()
+            ]
+            append(
+                index_path(user_id),
+                "".join(json.dumps(line, cls=DjangoJSONEncoder) + "\n" for line in lines).encode(),
+            )
+
+
+def archived_orders(user_id, customer=None, start=None, end=None):
+    """Archived orders of user_id, newest first, optionally of one customer
+    and created within [start, end)"""
+    try:
+        with open(index_path(user_id)) as file:
+            entries = [json.loads(line) for line in file]
+    except FileNotFoundError:
+        return []
+
+    members = set()
+    for entry in entries:
+        if customer is not None and entry["customer"] != str(customer):
+            continue
+        if start is not None and parse_datetime(entry["last"]) < start:
+            continue
+        if end is not None and parse_datetime(entry["first"]) >= end:
+            continue
+        members.add((entry["file"], entry["offset"], entry["length"]))
+
+    orders = {}
+    # the files of a database sort by run, so a later copy of an order
+    # replaces the one an interrupted run left behind
+    for name, offset, length in sorted(members):
+        with open(archive_dir() / name, "rb") as file:
+            file.seek(offset)
+            data = gzip.decompress(file.read(length))
+        for line in data.decode().splitlines():
+            order = json.loads(line)
+            created_at = parse_datetime(order["created_at"])
+            if order["created_by_id"] != user_id:
+                continue
+            if customer is not None and order["customer_id"] != str(customer):
+                continue
+            if (start is not None and created_at < start) or (end is not None and created_at >= end):
+                continue
+            orders[order["id"]] = order
+    return sorted(orders.values(), key=lambda order: parse_datetime(order["created_at"]), reverse=True)
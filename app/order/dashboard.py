@@ -0,0 +1,100 @@
+"""
+The sections of the POS home screen, read for one response.
+
+Each section is a function of the user reading what the screen shows of it.
+They do not depend on each other, so dashboard() runs them concurrently, see
+core.db.concurrent, each on a connection of its own: the response takes
+about as long as the slowest section rather than all of them. The time each
+took is returned with their data.
+"""
+import time
+from django.db.models import Sum
+from django.utils import timezone
+from inventory.models import ProductInventory
+from core.db.concurrent import aconcurrently, concurrently
+from .analytics import midnight, sales
+from .models import Cart, Notification
+from .serializers import (
+    DashboardSalesSerializer,
+    NotificationRowSerializer,
+    RestockNoticeSerializer,
+)
+
+
+# latest unread notifications and restock notices shown, with their count
+DASHBOARD_ITEMS = 5
+
+
+def inventory_summary(user):
+    """What inventory/summary/ gives, None for both without products"""
+    return ProductInventory.objects.filter(created_by=user).aggregate(
+        items=Sum("current_quantity"), values=Sum("selling_price")
+    )
+
+
+def cart_details(user):
+    """What cart/cart-details/ gives, None for both with an empty cart"""
+    return Cart.objects.filter(created_by=user).aggregate(
+        values=Sum("total_price"), items=Sum("quantity")
+    )
+
+
+def unread_notifications(user):
+    queryset = Notification.objects.filter(receiver=user, status="UNREAD")
+    rows = NotificationRowSerializer.values(queryset[:DASHBOARD_ITEMS])
+    return {"count": queryset.count(), "results": NotificationRowSerializer(rows).data}
+
+
+def restock_notice(user):
+    # the columns of product_low_stock_idx, as notification/restock-notice/
+    queryset = ProductInventory.objects.filter(created_by=user, low_quantity=True).only(
+        *RestockNoticeSerializer.Meta.fields
+    )
+    return {
+        "count": queryset.count(),
+        "results": RestockNoticeSerializer(queryset[:DASHBOARD_ITEMS], many=True).data,
+    }
+
+
+def sales_today(user):
+    """Revenue, cost, margin and units sold since midnight UTC"""
+    now = timezone.now()
+    _, buckets = sales(user, midnight(now.date()), now)
+    totals = buckets[0] if buckets else {"revenue": 0, "cost": 0, "margin": 0, "units": 0}
+    return DashboardSalesSerializer(totals).data
+
+
+SECTIONS = {
+    "inventory_summary": inventory_summary,
+    "cart_details": cart_details,
+    "unread_notifications": unread_notifications,
+    "restock_notice": restock_notice,
+    "sales_today": sales_today,
+}
+
+
+def timed(section, user):
+    def run():
+        started = time.perf_counter()
+        data = section(user)
+        return data, time.perf_counter() - started
+    return run
+
+
+def collect(results):
+    data = {}
+    timings = {}
+    for name, (section, seconds) in zip(SECTIONS, results):
+        data[name] = section
+        timings[name] = round(seconds * 1000, 2)
+    return data, timings
+
+
+def dashboard(user):
+    """The data of each section and the milliseconds it took"""
+    return collect(concurrently(*(timed(section, user) for section in SECTIONS.values())))
+
+
+async def adashboard(user):
+    """dashboard() for async views"""
+    return collect(await aconcurrently(*(timed(section, user) for section in SECTIONS.values())))
@@ -0,0 +1,177 @@
+import csv
+import io
+from django.db.models import Q
+from core.db.sharding import tenant_atomic
+from .models import Customer
+from .utils import (
+    sanitize_emails,
+    sanitize_phone_numbers,
+    ANONYMOUS_NAME,
+    EMPTY_CONTACT,
+)
+
+
+IMPORT_BATCH_SIZE = 1000
+# columns of a row checked against the max_length of their field
+LENGTH_CHECKED_FIELDS = ("customer_name", "customer_phone", "customer_email")
+
+
+class CustomerImport:
+    """Imports customers for a user from spreadsheet rows.
+
+    Rows are handled in chunks: phones and emails are sanitized column by
+    column, values longer than their column are rejected, duplicates are checked against the rest of the file in memory and
+    against the database with one query per chunk, and accepted rows are
+    written with a single bulk insert.
+    """
+
+    def __init__(self, user, batch_size=IMPORT_BATCH_SIZE):
+        self.user = user
+        self.batch_size = batch_size
+        self.created = 0
+        self.rejected = []
+        self.seen = {"name": set(), "phone": set(), "email": set()}
+
+    @classmethod
+    def from_csv(cls, user, file, batch_size=IMPORT_BATCH_SIZE):
+        if isinstance(file, (bytes, bytearray)):
+            file = io.BytesIO(file)
+        # uploaded files wrap the underlying binary stream
+        file = getattr(file, "file", file)
+        if not isinstance(file, io.TextIOBase):
+            file = io.TextIOWrapper(file, encoding="utf-8-sig")
+        return cls(user, batch_size=batch_size).run(csv.DictReader(file))
+
+    def run(self, rows):
+        chunk = []
+        # line 1 of the spreadsheet is the header
+        for line, row in enumerate(rows, start=2):
+            chunk.append((line, row))
+            if len(chunk) >= self.batch_size:
+                self.import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.import_chunk(chunk)
+        return self
+
+    @property
+    def result(self):
+        return {"created": self.created, "rejected": self.rejected}
+
+    def import_chunk(self, chunk):
+        names = [(row.get("customer_name") or "").strip() for _, row in chunk]
+        phones = sanitize_phone_numbers([row.get("customer_phone") for _, row in chunk])
+        emails = sanitize_emails([row.get("customer_email") for _, row in chunk])
+
+        candidates = []
+        for (line, row), name, phone, email in zip(chunk, names, phones, emails):
+            errors = []
+            if isinstance(phone, dict):
+                errors.append(phone["message"])
+            if isinstance(email, dict):
+                errors.append(email["message"])
+            if (phone or email) and not name:
+                errors.append("Customer name is required")
+            if errors:
+                self.rejected.append({"row": line, "errors": errors})
+                continue
+            customer = Customer(
+                customer_name=name.capitalize() if name else ANONYMOUS_NAME,
+                customer_phone=phone or EMPTY_CONTACT,
+                customer_email=email or EMPTY_CONTACT,
+                description=row.get("description") or None,
+                created_by=self.user,
+            )
+            errors = self.length_errors(customer)
+            if errors:
+                self.rejected.append({"row": line, "errors": errors})
+                continue
+            customer.normalize()
+            candidates.append((line, customer))
+
+        existing = self.existing_values(candidates)
+        lines = []
+        customers = []
+        for line, customer in candidates:
+            errors = []
+            for field in ("name", "phone", "email"):
+                value = getattr(customer, f"normalized_{field}")
+                if value is None:
+                    continue
+                if value in existing[field]:
+                    errors.append(f"Customer with {field} already exists")
+                elif value in self.seen[field]:
+                    errors.append(f"Duplicate {field} in file")
+            if errors:
+                self.rejected.append({"row": line, "errors": errors})
+                continue
+            for field in ("name", "phone", "email"):
+                value = getattr(customer, f"normalized_{field}")
+                if value is not None:
+                    self.seen[field].add(value)
+            lines.append(line)
+            customers.append(customer)
+
+        with tenant_atomic(Customer):
+            Customer.objects.bulk_create(
+                customers, batch_size=self.batch_size, ignore_conflicts=True
+            )
+            # the primary keys are set here, those not found were skipped
+            inserted = set(
+                Customer.objects.filter(pk__in=[customer.pk for customer in customers])
+                .values_list("pk", flat=True)
+            )
+        skipped = [
+            (line, customer)
+            for line, customer in zip(lines, customers)
+            if customer.pk not in inserted
+        ]
+        self.reject_existing(skipped)
+        self.created += len(customers) - len(skipped)
+
+    def length_errors(self, customer):
+        """Values longer than their column, which would fail the whole insert"""
+        errors = []
+        for name in LENGTH_CHECKED_FIELDS:
+            field = Customer._meta.get_field(name)
+            value = getattr(customer, name)
+            if value is not None and len(value) > field.max_length:
+                label = name.replace("_", " ").capitalize()
+                errors.append(f"{label} is longer than {field.max_length} characters")
+        return errors
+
+    def reject_existing(self, candidates):
+        existing = self.existing_values(candidates)
+        for line, customer in candidates:
+            errors = []
+            for field in ("name", "phone", "email"):
+                value = getattr(customer, f"normalized_{field}")
+                if value is not None and value in existing[field]:
+                    errors.append(f"Customer with {field} already exists")
+            self.rejected.append({"row": line, "errors": errors or ["Customer already exists"]})
+
+    def existing_values(self, candidates):
+        """Normalized values of the chunk already stored for the user, in one query"""
+        values = {"name": set(), "phone": set(), "email": set()}
+        for _, customer in candidates:
+            for field in values:
+                value = getattr(customer, f"normalized_{field}")
+                if value is not None:
+                    values[field].add(value)
+
+        lookups = Q()
+        for field, field_values in values.items():
+            if field_values:
+                lookups |= Q(**{f"normalized_{field}__in": field_values})
+        existing = {"name": set(), "phone": set(), "email": set()}
+        if not lookups:
+            return existing
+
+        rows = Customer.objects.filter(lookups, created_by=self.user).values_list(
+            "normalized_name", "normalized_phone", "normalized_email"
+        )
+        for name, phone, email in rows:
+            existing["name"].add(name)
+            existing["phone"].add(phone)
+            existing["email"].add(email)
+        return existing
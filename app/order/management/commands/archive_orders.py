@@ -0,0 +1,37 @@
+from datetime import datetime, time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from order.archive import ARCHIVE_BATCH_SIZE, OrderArchive
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves orders created before a date, with their items, out of the "
+        "database into compressed archive files under ORDER_ARCHIVE_DIR. "
+        "Archived orders stay readable from the orders/archived endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--before", required=True, help="archive orders created before this date, YYYY-MM-DD")
+        parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+        parser.add_argument("--sleep", type=float, default=0, help="seconds to pause between batches")
+        parser.add_argument("--database", choices=settings.SHARDS, help="only archive this shard")
+
+    def handle(self, *args, **options):
+        try:
+            day = datetime.strptime(options["before"], "%Y-%m-%d").date()
+        except ValueError:
+            raise CommandError(f"Invalid date {options['before']}, expected YYYY-MM-DD")
+        if day > timezone.now().date():
+            raise CommandError("Cannot archive orders created in the future")
+        before = timezone.make_aware(datetime.combine(day, time.min))
+
+        for alias in [options["database"]] if options["database"] else settings.SHARDS:
+            archive = OrderArchive(
+                before, using=alias, batch_size=options["batch_size"], sleep=options["sleep"]
+            ).run()
+            message = f"{alias}: archived {archive.archived} orders"
+            if archive.archived:
+                message += f" to {archive.path}"
+            self.stdout.write(self.style.SUCCESS(message))
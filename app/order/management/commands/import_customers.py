@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from core.db.sharding import tenant
+from order.imports import CustomerImport, IMPORT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Imports customers for a user from a CSV file in bulk"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with customer_name, customer_phone, customer_email and description columns")
+        parser.add_argument("--user", required=True, help="username of the retailer owning the customers")
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+
+        with tenant(user), open(options["path"], encoding="utf-8-sig", newline="") as file:
+            customer_import = CustomerImport.from_csv(
+                user, file, batch_size=options["batch_size"]
+            )
+
+        for reject in customer_import.rejected:
+            self.stderr.write(f"row {reject['row']}: {'; '.join(reject['errors'])}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {customer_import.created} customers, "
+                f"rejected {len(customer_import.rejected)} rows"
+            )
+        )
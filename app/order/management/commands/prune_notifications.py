@@ -0,0 +1,53 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from order.models import Notification
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes read notifications older than NOTIFICATION_READ_RETENTION_DAYS "
+        "in small primary key ordered batches, pausing between them so it can "
+        "run next to regular traffic. Run it periodically, e.g. hourly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.NOTIFICATION_READ_RETENTION_DAYS)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--sleep", type=float, default=0.2, help="seconds to pause between batches")
+        parser.add_argument("--max-batches", type=int, default=0, help="stop after this many batches, 0 for no limit")
+
+    def handle(self, *args, **options):
+        if options["days"] <= 0:
+            raise CommandError("Retention is disabled, pass --days or set NOTIFICATION_READ_RETENTION_DAYS")
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size must be positive")
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        for alias in settings.SHARDS:
+            deleted = self.prune(alias, cutoff, options)
+            self.stdout.write(self.style.SUCCESS(f"{alias}: deleted {deleted} read notifications"))
+
+    def prune(self, alias, cutoff, options):
+        # the created_at bound limits the scan to the partitions of expired
+        # months, the primary key one resumes after the previous batch
+        expired = Notification.objects.using(alias).filter(
+            status="READ", created_at__lt=cutoff
+        ).order_by("pk")
+        deleted = 0
+        batches = 0
+        last = None
+        while not options["max_batches"] or batches < options["max_batches"]:
+            batch = expired if last is None else expired.filter(pk__gt=last)
+            ids = list(batch.values_list("pk", flat=True)[: options["batch_size"]])
+            if not ids:
+                break
+            # each batch commits on its own so row locks are held briefly
+            deleted += expired.filter(pk__in=ids).delete()[0]
+            batches += 1
+            last = ids[-1]
+            if len(ids) < options["batch_size"]:
+                break
+            time.sleep(options["sleep"])
+        return deleted
@@ -0,0 +1,68 @@
+# Generated by Django 4.1.4 on 2026-10-18 22:36
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+
+
+def backfill_order_totals(apps, schema_editor):
+    Order = apps.get_model("order", "Order")
+    OrderItem = apps.get_model("order", "OrderItem")
+    totals = (
+        OrderItem.objects.filter(order__isnull=False)
+        .values("order_id")
+        .annotate(
+            item_count=Count("id"),
+            total_quantity=Sum("quantity"),
+            grand_total=Sum("total_price"),
+            total_cost=Sum(
+                ExpressionWrapper(
+                    F("product_cost_price") * F("quantity"),
+                    output_field=DecimalField(max_digits=12, decimal_places=2),
+                )
+            ),
+        )
+    )
+    orders = []
+    for row in totals.iterator():
+        orders.append(
+            Order(
+                id=row["order_id"],
+                item_count=row["item_count"],
+                total_quantity=row["total_quantity"],
+                grand_total=row["grand_total"],
+                total_cost=row["total_cost"],
+            )
+        )
+    Order.objects.bulk_update(
+        orders, ["item_count", "total_quantity", "grand_total", "total_cost"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_by', '-created_at'], name='order_creator_created_idx'),
+        ),
+        migrations.RunPython(backfill_order_totals, migrations.RunPython.noop),
+    ]
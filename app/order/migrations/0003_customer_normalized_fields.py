@@ -0,0 +1,109 @@
+# Generated by Django 4.1.4 on 2026-10-18 22:38
+
+import re
+from django.db import migrations, models
+
+
+# frozen copies of order.utils as of this migration, so that later changes
+# to the live helpers don't change what it backfills
+PHONE_INVALID_CHARACTERS = re.compile(r'[@_!#$%^&*()<>?/\|}{~`:;,.-]')
+ANONYMOUS_NAME = "Anonymous"
+EMPTY_CONTACT = "None"
+
+
+def sanitize_phone_number(value):
+    if PHONE_INVALID_CHARACTERS.search(value) is not None:
+        return {"message": "Invalid Phone Number"}
+    if value.startswith("+") and len(value) == 14:
+        return value
+    elif len(value) == 10:
+        return "+234" + value
+    elif len(value) == 11 and value.startswith("0"):
+        return "+234" + value[1:]
+    elif len(value) == 13 and value.startswith("234"):
+        return f"+{value}"
+    return {"message": "Number {0} is invalid nigerian number".format(value)}
+
+
+def normalize_name(value):
+    if not value or value == ANONYMOUS_NAME:
+        return None
+    return " ".join(value.split()).lower()
+
+
+def normalize_phone(value):
+    if not value or value == EMPTY_CONTACT:
+        return None
+    phone_number = sanitize_phone_number(value.strip())
+    if isinstance(phone_number, dict):
+        return value.strip()
+    return phone_number
+
+
+def normalize_email(value):
+    if not value or value == EMPTY_CONTACT:
+        return None
+    return value.strip().lower()
+
+
+def backfill_normalized_fields(apps, schema_editor):
+    """Existing duplicates keep their oldest customer as the normalized owner,
+    later ones are left NULL so the unique constraints can be created"""
+    Customer = apps.get_model("order", "Customer")
+    seen = set()
+    customers = []
+    for customer in Customer.objects.order_by("created_at").iterator():
+        for field, normalize in (
+            ("name", normalize_name),
+            ("phone", normalize_phone),
+            ("email", normalize_email),
+        ):
+            value = normalize(getattr(customer, f"customer_{field}"))
+            key = (customer.created_by_id, field, value)
+            if value is None or key in seen:
+                value = None
+            else:
+                seen.add(key)
+            setattr(customer, f"normalized_{field}", value)
+        customers.append(customer)
+    Customer.objects.bulk_update(
+        customers, ["normalized_name", "normalized_phone", "normalized_email"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0002_order_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='normalized_email',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='normalized_name',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='normalized_phone',
+            field=models.CharField(blank=True, editable=False, max_length=17, null=True),
+        ),
+        migrations.RunPython(backfill_normalized_fields, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customer',
+            constraint=models.UniqueConstraint(fields=('created_by', 'normalized_name'), name='unique_customer_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='customer',
+            constraint=models.UniqueConstraint(fields=('created_by', 'normalized_phone'), name='unique_customer_phone'),
+        ),
+        migrations.AddConstraint(
+            model_name='customer',
+            constraint=models.UniqueConstraint(fields=('created_by', 'normalized_email'), name='unique_customer_email'),
+        ),
+    ]
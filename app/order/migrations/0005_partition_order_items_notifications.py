@@ -0,0 +1,159 @@
+# Generated by Django 4.1.4 on 2026-10-18 23:12
+
+from datetime import date
+from django.db import connections, migrations, models, transaction
+import django.utils.timezone
+
+
+# frozen copies of core.db.partitions as of this migration, so that later
+# changes to the live helpers don't change what it rebuilds
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(day, months):
+    years, month = divmod(day.month - 1 + months, 12)
+    return date(day.year + years, month + 1, 1)
+
+
+def create_monthly_partition(table, column, month, using="default"):
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    name = f"{table}_p{month:%Y%m}"
+    start, end = month_start(month), add_months(month, 1)
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is not None:
+            return False
+        cursor.execute(
+            f"CREATE TABLE {quote(name)} "
+            f"(LIKE {quote(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {quote(table + '_default')} "
+            f"WHERE {quote(column)} >= %s AND {quote(column)} < %s RETURNING *) "
+            f"INSERT INTO {quote(name)} SELECT * FROM moved",
+            [start, end],
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+    return True
+
+
+def rebuild_table(schema_editor, model, partition_by=None, months_ahead=2):
+    """
+    Rebuilds the table of model range partitioned by month on the
+    partition_by column, or back into a plain table without partition_by.
+    Rows, indexes and foreign keys are carried over, so run it in a
+    migration while the table is not written to. Tables other tables
+    reference, or with unique constraints besides the primary key, are not
+    supported.
+    """
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    rebuilt = f"{table}_rebuild"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM pg_constraint "
+            "WHERE (confrelid = %s::regclass AND contype = 'f') "
+            "OR (conrelid = %s::regclass AND contype IN ('u', 'x'))",
+            [table, table],
+        )
+        if cursor.fetchone()[0]:
+            raise ValueError(f"{table} has unique constraints or is referenced by foreign keys")
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            "SELECT i.relname, pg_get_indexdef(i.oid) FROM pg_index x "
+            "JOIN pg_class i ON i.oid = x.indexrelid "
+            "WHERE x.indrelid = %s::regclass AND NOT x.indisprimary",
+            [table],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'",
+            [table],
+        )
+        primary_key = cursor.fetchone()[0]
+
+        for name, _ in indexes:
+            cursor.execute(f"DROP INDEX {quote(name)}")
+        cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(rebuilt)}")
+        cursor.execute(
+            f"ALTER TABLE {quote(rebuilt)} RENAME CONSTRAINT {quote(primary_key)} "
+            f"TO {quote(rebuilt + '_pkey')}"
+        )
+
+        key = [model._meta.pk.column]
+        partitioning = ""
+        if partition_by:
+            key.append(partition_by)
+            partitioning = f" PARTITION BY RANGE ({quote(partition_by)})"
+        cursor.execute(
+            f"CREATE TABLE {quote(table)} (LIKE {quote(rebuilt)} "
+            f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS){partitioning}"
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(primary_key)} "
+            f"PRIMARY KEY ({', '.join(quote(column) for column in key)})"
+        )
+
+        if partition_by:
+            cursor.execute(
+                f"CREATE TABLE {quote(table + '_default')} "
+                f"PARTITION OF {quote(table)} DEFAULT"
+            )
+            cursor.execute(f"SELECT min({quote(partition_by)}) FROM {quote(rebuilt)}")
+            oldest = cursor.fetchone()[0]
+            this_month = month_start(django.utils.timezone.now().date())
+            month = month_start(oldest.date()) if oldest else this_month
+            while month <= add_months(this_month, months_ahead):
+                create_monthly_partition(table, partition_by, month, using=connection.alias)
+                month = add_months(month, 1)
+
+        cursor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(rebuilt)}")
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}")
+        cursor.execute(f"DROP TABLE {quote(rebuilt)}")
+
+
+PARTITIONED = ["OrderItem", "Notification"]
+
+
+def partition_tables(apps, schema_editor):
+    for name in PARTITIONED:
+        rebuild_table(schema_editor, apps.get_model("order", name), partition_by="created_at")
+
+
+def unpartition_tables(apps, schema_editor):
+    for name in PARTITIONED:
+        rebuild_table(schema_editor, apps.get_model("order", name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0004_customer_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, unpartition_tables),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['receiver', '-created_at'], name='notification_receiver_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['created_by', '-created_at'], name='order_item_creator_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.1.4 on 2026-10-18 23:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+# rolls up the order items sold so far
+BACKFILL_ROLLUPS = """
+INSERT INTO "order_salesrollup"
+    ("id", "created_at", "updated_at", "created_by_id", "product_id", "day", "revenue", "cost", "units")
+SELECT md5(random()::text || clock_timestamp()::text || i."product_id"::text || i."day"::text)::uuid,
+       now(), now(), i."created_by_id", i."product_id", i."day", i."revenue", i."cost", i."units"
+FROM (
+    SELECT COALESCE(oi."created_by_id", p."created_by_id") AS "created_by_id", oi."product_id",
+           (oi."created_at" AT TIME ZONE 'UTC')::date AS "day",
+           SUM(oi."total_price") AS "revenue",
+           SUM(oi."product_cost_price" * oi."quantity") AS "cost",
+           SUM(oi."quantity") AS "units"
+    FROM "order_orderitem" oi
+    JOIN "inventory_productinventory" p ON p."id" = oi."product_id"
+    GROUP BY 1, 2, 3
+) i
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_stock_ledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('order', '0005_partition_order_items_notifications'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('day', models.DateField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('created_by', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='inventory.productinventory')),
+            ],
+            options={
+                'ordering': ('-day',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='salesrollup',
+            index=models.Index(fields=['created_by', 'day'], name='sales_rollup_owner_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='salesrollup',
+            constraint=models.UniqueConstraint(fields=('created_by', 'product', 'day'), name='unique_sales_rollup'),
+        ),
+        migrations.RunSQL(BACKFILL_ROLLUPS, migrations.RunSQL.noop),
+    ]
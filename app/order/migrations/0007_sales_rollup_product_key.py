@@ -0,0 +1,21 @@
+# Generated by Django 4.1.4 on 2026-10-18 23:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0006_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='salesrollup',
+            name='unique_sales_rollup',
+        ),
+        migrations.AddConstraint(
+            model_name='salesrollup',
+            constraint=models.UniqueConstraint(fields=('product', 'day', 'created_by'), name='unique_sales_rollup'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.1.4 on 2026-10-19 01:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0007_sales_rollup_product_key'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='salesrollup',
+            name='unique_sales_rollup',
+        ),
+        migrations.AddField(
+            model_name='salesrollup',
+            name='shard',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='salesrollup',
+            constraint=models.UniqueConstraint(fields=('product', 'day', 'created_by', 'shard'), name='unique_sales_rollup'),
+        ),
+    ]
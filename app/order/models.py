@@ -1,7 +1,16 @@
+import random
 import uuid
-from django.db import models
+from django.conf import settings
+from django.db import connections, models, router
+from django.db.models import Q
+from django.utils import timezone
+from psycopg2.extras import execute_values
 from decimal import Decimal
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from core.db.tracking import DirtyFieldsMixin
+from inventory.stock import reserve
+from .utils import normalize_email, normalize_name, normalize_phone
 
 
 NOTIFICATION_STATUS = (
@@ -10,7 +19,7 @@ NOTIFICATION_STATUS = (
 )
 
 
-class Base(models.Model):
+class Base(DirtyFieldsMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -21,19 +30,14 @@ class Base(models.Model):
 
 class CartManager(models.Manager):
     def create_cart(self, product, selling_price, created_by):
-        item = self.create(
-            product=product, selling_price=selling_price, created_by=created_by
-        )
-        product = item.product
-        item.total_price = item.selling_price
-        qty = product.current_quantity
-        if qty < 1:
-            self.delete()
+        if not reserve(product):
             raise ValueError("Inventory is low")
-        product.current_quantity = product.current_quantity - 1
-        product.save()
-        item.save()
-        return item
+        return self.create(
+            product=product,
+            selling_price=selling_price,
+            total_price=selling_price,
+            created_by=created_by,
+        )
 
 
 class Cart(Base):
@@ -57,33 +61,47 @@ class Cart(Base):
     
     def get_total_price(self):
         total_price = self.product.selling_price * self.quantity
-        self.save()
         return float("%.2f" % total_price)
     
     def add_to_cart(self):
-        product = self.product
-        if product.current_quantity > 0:
+        if reserve(self.product):
             self.quantity = self.quantity + 1
-            product.current_quantity = product.current_quantity - 1
             self.total_price = self.selling_price * self.quantity
-            product.save()
             self.save()
-        if product.current_quantity <= product.minimum_stock_quantity:
-            product.low_quantity = True
-        else:
-            product.low_quantity = False
-        product.save()
-        self.save()
     
     def __str__(self):
         return f"{self.product.name} -- ({self.created_by})"
 
 
+class CustomerManager(models.Manager):
+    def duplicate_fields(self, created_by, exclude=None, **normalized):
+        """Returns the normalized fields (name, phone, email) already used by
+        another customer of created_by, looked up in a single indexed query"""
+        lookups = Q()
+        for field, value in normalized.items():
+            if value:
+                lookups |= Q(**{f"normalized_{field}": value})
+        if not lookups:
+            return set()
+        qs = self.filter(lookups, created_by=created_by)
+        if exclude is not None:
+            qs = qs.exclude(pk=exclude)
+        duplicates = set()
+        for row in qs.values("normalized_name", "normalized_phone", "normalized_email")[:3]:
+            for field, value in normalized.items():
+                if value and row[f"normalized_{field}"] == value:
+                    duplicates.add(field)
+        return duplicates
+
+
 class Customer(Base):
     customer_name = models.CharField(max_length=255, blank=True, null=True)
     customer_phone = models.CharField(max_length=17, blank=True, null=True)
     customer_email = models.CharField(max_length=100, blank=True, null=True)
     description = models.TextField(blank=True, null=True)
+    normalized_name = models.CharField(max_length=255, blank=True, null=True, editable=False)
+    normalized_phone = models.CharField(max_length=17, blank=True, null=True, editable=False)
+    normalized_email = models.CharField(max_length=100, blank=True, null=True, editable=False)
     created_by = models.ForeignKey(
         User, on_delete=models.CASCADE, 
         related_name="customer_creator", 
@@ -91,11 +109,51 @@ class Customer(Base):
         null=True
         )
 
+    objects = CustomerManager()
+
     class Meta:
         ordering = ("customer_name",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=["created_by", "normalized_name"], name="unique_customer_name"
+            ),
+            models.UniqueConstraint(
+                fields=["created_by", "normalized_phone"], name="unique_customer_phone"
+            ),
+            models.UniqueConstraint(
+                fields=["created_by", "normalized_email"], name="unique_customer_email"
+            ),
+        ]
+        indexes = [
+            GinIndex(
+                fields=["customer_name"], name="customer_name_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+            GinIndex(
+                fields=["customer_phone"], name="customer_phone_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+            GinIndex(
+                fields=["customer_email"], name="customer_email_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+        ]
     
     def __str__(self):
         return f"{self.customer_name} -- {self.created_by}"
+    
+    def normalize(self):
+        """Fills the normalized columns backing the per-user unique constraints.
+        The "None"/"Anonymous" placeholders are stored as NULL so they never clash."""
+        self.normalized_name = normalize_name(self.customer_name)
+        self.normalized_phone = normalize_phone(self.customer_phone)
+        self.normalized_email = normalize_email(self.customer_email)
+    
+    def save(self, *args, **kwargs):
+        self.normalize()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {
+                *update_fields, "normalized_name", "normalized_phone", "normalized_email"
+            }
+        return super().save(*args, **kwargs)
 
 
 class Order(Base):
@@ -115,6 +173,9 @@ class Order(Base):
     total_price = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     payment_date = models.DateTimeField(blank=True, null=True)
     grand_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    item_count = models.PositiveIntegerField(default=0)
+    total_quantity = models.PositiveIntegerField(default=0)
+    total_cost = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     created_by = models.ForeignKey(
         User, 
         on_delete=models.CASCADE, 
@@ -125,12 +186,19 @@ class Order(Base):
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["created_by", "-created_at"], name="order_creator_created_idx"),
+        ]
     
     def __str__(self):
         return f"{self.customer.customer_name} {self.created_by}"
 
 
 class OrderItem(Base):
+    """Range partitioned by month on created_at, the table's primary key is
+    (id, created_at)."""
+    partition_by = "created_at"
+
     product = models.ForeignKey(
         "inventory.ProductInventory",
         on_delete=models.CASCADE,
@@ -160,12 +228,111 @@ class OrderItem(Base):
 
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["created_by", "-created_at"], name="order_item_creator_idx"),
+        ]
     
     def __str__(self):
         return f"{self.product.name} -- {self.order.customer.customer_name} -- {self.created_by}"
 
 
+class SalesRollupManager(models.Manager):
+    def record(self, items):
+        """Adds saved order items to the rollups of their product and day in
+        one upsert, each to one of SALES_ROLLUP_SHARDS rows picked at random"""
+        totals = {}
+        for item in items:
+            if item.product_id is None:
+                continue
+            key = (
+                item.created_by_id or item.product.created_by_id,
+                item.product_id,
+                item.created_at.date(),
+            )
+            revenue, cost, units = totals.get(key, (0, 0, 0))
+            totals[key] = (
+                revenue + item.total_price,
+                cost + item.product_cost_price * item.quantity,
+                units + item.quantity,
+            )
+        if not totals:
+            return
+        shards = {
+            key + (random.randrange(settings.SALES_ROLLUP_SHARDS),): total
+            for key, total in totals.items()
+        }
+        now = timezone.now()
+        # rows are locked in key order so concurrent checkouts cannot deadlock
+        rows = [
+            (uuid.uuid4(), now, now, created_by, product_id, day, shard, revenue, cost, units)
+            for (created_by, product_id, day, shard), (revenue, cost, units) in sorted(
+                shards.items(),
+                key=lambda total: (total[0][0], str(total[0][1]), total[0][2], total[0][3]),
+            )
+        ]
+        using = router.db_for_write(self.model)
+        with connections[using].cursor() as cursor:
+            execute_values(
+                cursor.cursor,
+                """
+                INSERT INTO "order_salesrollup" ("id", "created_at", "updated_at",
+                    "created_by_id", "product_id", "day", "shard", "revenue", "cost", "units")
+                VALUES %s
+                ON CONFLICT ("created_by_id", "product_id", "day", "shard") DO UPDATE SET
+                    "revenue" = "order_salesrollup"."revenue" + EXCLUDED."revenue",
+                    "cost" = "order_salesrollup"."cost" + EXCLUDED."cost",
+                    "units" = "order_salesrollup"."units" + EXCLUDED."units",
+                    "updated_at" = EXCLUDED."updated_at"
+                """,
+                rows,
+            )
+
+
+class SalesRollup(Base):
+    """Sales of a product by a user on a day (UTC), kept up to date at
+    checkout so analytics over long ranges read a few rows per product and
+    day instead of every order item: the day's sales are spread over shard
+    rows, summed when read. Rollups outlive archived orders."""
+    created_by = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="sales_rollups", db_index=False
+    )
+    product = models.ForeignKey(
+        "inventory.ProductInventory",
+        on_delete=models.CASCADE,
+        related_name="sales_rollups",
+        db_index=False,
+    )
+    day = models.DateField()
+    shard = models.PositiveSmallIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.PositiveIntegerField(default=0)
+
+    objects = SalesRollupManager()
+
+    class Meta:
+        ordering = ("-day",)
+        constraints = [
+            # product first, it also serves the product's foreign key
+            models.UniqueConstraint(
+                fields=["product", "day", "created_by", "shard"], name="unique_sales_rollup"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["created_by", "day"], name="sales_rollup_owner_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -- {self.day}"
+
+
 class Notification(Base):
+    """Range partitioned by month on created_at, the table's primary key is
+    (id, created_at). Unread notifications keep their partition past the
+    retention, only read ones are deleted, see prune_notifications."""
+    partition_by = "created_at"
+    partition_keep = {"status": "UNREAD"}
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     receiver = models.ForeignKey(
         User,
@@ -189,6 +356,9 @@ class Notification(Base):
     
     class Meta:
         ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["receiver", "-created_at"], name="notification_receiver_idx"),
+        ]
     
     def __str__(self):
         return f"{self.receiver}"
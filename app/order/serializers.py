@@ -1,22 +1,44 @@
 from rest_framework import serializers
-from .models import Cart, Customer, Order, OrderItem, Notification
-from .utils import sanitize_phone_number
-from email_validator import validate_email, EmailNotValidError
-from django.db import transaction
+from .analytics import BUCKETS
+from .models import Cart, Customer, Order, OrderItem, Notification, SalesRollup
+from .utils import (
+    sanitize_phone_number,
+    normalize_email,
+    normalize_name,
+    normalize_phone,
+    ANONYMOUS_NAME,
+    EMPTY_CONTACT,
+)
+from django.db import IntegrityError
+from core.db.sharding import tenant_atomic
 from inventory.models import ProductInventory
-from inventory.serializers import ProductInventorySerializer
+from inventory.stock import release, reserve
+from inventory.serializers import ProductInventorySerializer, ProductRowSerializer
+from core.serializers import RowSerializer
 from django.db.models import Sum
 from drf_spectacular.utils import extend_schema_field
 from drf_spectacular.types import OpenApiTypes
+from django.utils import timezone
 import datetime
 
 
+SALES_ANALYTICS_DAYS = 30
+HOURLY_MAX_DAYS = 31
+
+
 class ProductCartSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductInventory
         fields = "__all__"
 
 
+class RestockNoticeSerializer(serializers.ModelSerializer):
+    # the columns product_low_stock_idx covers
+    class Meta:
+        model = ProductInventory
+        fields = ("id", "name", "category", "current_quantity", "minimum_stock_quantity", "created_at")
+
+
 class CartSerializer(serializers.ModelSerializer):
     name = serializers.CharField(source="product.name")
     quantity = serializers.IntegerField(default=1)
@@ -56,23 +78,15 @@ class CartSerializer(serializers.ModelSerializer):
         product = instance.product
         
         if new_cart_quantity:
-            current_cart_quantity = instance.quantity
-            diff = new_cart_quantity - current_cart_quantity
-            if (
-                diff <= product.current_quantity
-                and new_cart_quantity <= product.default_quantity
+            diff = new_cart_quantity - instance.quantity
+            if new_cart_quantity > product.default_quantity or (
+                diff > 0 and not reserve(product, diff)
             ):
-                instance.quantity = new_cart_quantity
-                product.current_quantity = product.current_quantity - diff
-                product.save()
-            else:
                 raise serializers.ValidationError("Quantity is low")
+            if diff < 0:
+                release(product, -diff)
+            instance.quantity = new_cart_quantity
     
-        if product.current_quantity <= product.minimum_stock_quantity:
-            product.low_quantity = True
-        else:
-            product.low_quantity = False
-        product.save()
         instance = super().update(instance, data)
         instance.refresh_from_db()
         return instance
@@ -84,11 +98,54 @@ class CartSerializer(serializers.ModelSerializer):
         return serializers.data
 
 
+class CartRowSerializer(RowSerializer):
+    """Output of CartSerializer from values_list() rows"""
+    model = Cart
+    fields = (
+        "id",
+        ("name", "product__name"),
+        ("selling_price", "product__selling_price"),
+        ("cost_price", "product__cost_price"),
+        "total_price",
+        ("current_quantity", "product__current_quantity"),
+        "quantity",
+        ("product", "product", ProductRowSerializer),
+    )
+
+
+DUPLICATE_CUSTOMER_MESSAGES = {
+    "email": "Customer with email already exists",
+    "phone": "Customer with phone number already exists",
+    "name": "Customer with name already exists",
+}
+
+
+def check_duplicate_customer(user, attrs, exclude=None):
+    duplicates = Customer.objects.duplicate_fields(
+        user,
+        exclude=exclude,
+        email=normalize_email(attrs.get("customer_email")),
+        phone=normalize_phone(attrs.get("customer_phone")),
+        name=normalize_name(attrs.get("customer_name")),
+    )
+    for field, message in DUPLICATE_CUSTOMER_MESSAGES.items():
+        if field in duplicates:
+            raise serializers.ValidationError(message)
+
+
+def duplicate_customer_error(error):
+    """Maps a unique constraint violation raised on insert to its message"""
+    for field, message in DUPLICATE_CUSTOMER_MESSAGES.items():
+        if f"unique_customer_{field}" in str(error):
+            return serializers.ValidationError(message)
+    return serializers.ValidationError("Customer already exists")
+
+
 class CustomerListSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Customer
-        exclude = ("created_by",)
+        exclude = ("created_by", "normalized_name", "normalized_phone", "normalized_email")
         extra_kwargs = {
             "created_by": {"read_only": True},
         }
@@ -100,20 +157,18 @@ class CustomerListSerializer(serializers.ModelSerializer):
         user = self.context["request"].user
 
         if not phone:
-            attrs["customer_phone"] = "None"
+            attrs["customer_phone"] = EMPTY_CONTACT
         if not email:
-            attrs["customer_email"] = "None"
+            attrs["customer_email"] = EMPTY_CONTACT
         if not name:
-            attrs["customer_name"] = "Anonymous"
+            attrs["customer_name"] = ANONYMOUS_NAME
         
-        qs = Customer.objects.filter(created_by=user)
         if email:
+            from email_validator import validate_email, EmailNotValidError
             try:
                 email = validate_email(email.lower().strip()).email
             except EmailNotValidError as e:
                 raise serializers.ValidationError("Email not valid")
-            if qs.filter(customer_email=email).exists():
-                raise serializers.ValidationError("Customer with email already exists")
             if not name:
                 raise serializers.ValidationError(
                     "Customer name is required"
@@ -124,14 +179,6 @@ class CustomerListSerializer(serializers.ModelSerializer):
             phone_number = sanitize_phone_number(phone)
             if isinstance(phone_number, dict):
                 raise serializers.ValidationError({"phone": phone_number["message"]})
-            if qs.filter(customer_phone=phone_number).exists():
-                raise serializers.ValidationError(
-                    "Account with phone number already exists"
-                )
-            if qs.filter(customer_phone=phone_number).exists():
-                raise serializers.ValidationError(
-                    "Customer with phone number already exists"
-                )
             if not name:
                 raise serializers.ValidationError(
                     "Customer name is required")
@@ -139,15 +186,18 @@ class CustomerListSerializer(serializers.ModelSerializer):
         
         if name:
             attrs["customer_name"] = name.capitalize()
-            if qs.filter(customer_name=name.capitalize()).exists():
-                raise serializers.ValidationError("Customer with name already exists")
+        
+        check_duplicate_customer(user, attrs)
         return super().validate(attrs)
     
     def save(self, validated_data):
         user = self.context["request"].user
-        customer = Customer.objects.get_or_create(
-            **validated_data, defaults={"created_by": user}
-        )
+        # the unique constraints settle races between validate and insert
+        try:
+            with tenant_atomic(Customer):
+                customer = Customer.objects.create(**validated_data, created_by=user)
+        except IntegrityError as e:
+            raise duplicate_customer_error(e)
         return customer
 
 
@@ -159,7 +209,7 @@ class CustomerDetailSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Customer
-        exclude = ("created_by",)
+        exclude = ("created_by", "normalized_name", "normalized_phone", "normalized_email")
     
     def validate(self, attrs):
         email = attrs.get("customer_email", None)
@@ -167,18 +217,13 @@ class CustomerDetailSerializer(serializers.ModelSerializer):
         name = attrs.get("customer_name", None)
         user = self.context["request"].user
         customer_id = self.context["customer"]
-        qs = Customer.objects.filter(created_by=user)
         
         if email:
+            from email_validator import validate_email, EmailNotValidError
             try:
                 email = validate_email(email.lower().strip()).email
             except EmailNotValidError as e:
                 raise serializers.ValidationError("Email not valid")
-            
-            email_exist = qs.filter(customer_email=email, pk=customer_id).first()
-            
-            if email_exist is None and qs.filter(customer_email=email).exists():
-                raise serializers.ValidationError("Customer with email already exists")
             attrs["customer_email"] = email
 
         if phone:
@@ -186,22 +231,26 @@ class CustomerDetailSerializer(serializers.ModelSerializer):
             
             if isinstance(phone_number, dict):
                 raise serializers.ValidationError({"phone": phone_number["message"]})
-            
-            if qs.filter(phone=phone_number).exists():
-                raise serializers.ValidationError(
-                    "Account with phone number already exists"
-                )
-            
-            phone_exist = qs.filter(customer_phone=phone, id=customer_id).first()
-            if phone_exist is None and qs.filter(customer_phone=phone_number).exists():
-                raise serializers.ValidationError(
-                    "Customer with phone number already exists"
-                )
             attrs["customer_phone"] = phone_number
         
         if name:
             attrs["customer_name"] = name.capitalize()
+        
+        check_duplicate_customer(user, attrs, exclude=customer_id)
         return super().validate(attrs)
+    
+    def update(self, instance, validated_data):
+        try:
+            with tenant_atomic(Customer):
+                return super().update(instance, validated_data)
+        except IntegrityError as e:
+            raise duplicate_customer_error(e)
+
+
+class CustomerImportSerializer(serializers.Serializer):
+    file = serializers.FileField(
+        help_text="CSV with customer_name, customer_phone, customer_email and description columns"
+    )
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -210,6 +259,9 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         exclude = ("grand_total",)
         extra_kwargs = {"balance": {"read_only": True},
+                        "item_count": {"read_only": True},
+                        "total_quantity": {"read_only": True},
+                        "total_cost": {"read_only": True},
                         "payment_option": {"required": True}}
     
     def payment_validation(self, amount_paid):
@@ -238,35 +290,45 @@ class OrderSerializer(serializers.ModelSerializer):
     
     def save(self, validated_data):
         user = self.context["request"].user
-        cart_items = Cart.objects.filter(created_by=user)
+        cart_items = Cart.objects.filter(created_by=user).select_related("product")
         
         if cart_items:
-            with transaction.atomic():
-                order = Order.objects.create(**validated_data, created_by=user)
+            with tenant_atomic(Order):
                 orderItems_list = []
-                order_item_name = []
                 sum_total_price = 0
+                sum_total_cost = 0
+                sum_quantity = 0
                 
                 for item in cart_items:
-                    product = ProductInventory.objects.filter(
-                        id=item.product_id
-                    ).first()
+                    product = item.product
                     orderItems = OrderItem(
                         product=product,
                         created_by=item.created_by,
-                        order=order,
                         quantity=item.quantity,
                         product_cost_price=product.cost_price,
                         selling_price=item.selling_price,
                         total_price=item.total_price,
                     )
                     orderItems_list.append(orderItems)
-                    order_item_name.append(product.name)
                     sum_total_price = sum_total_price + item.total_price
-                    item.delete()
+                    sum_total_cost = sum_total_cost + product.cost_price * item.quantity
+                    sum_quantity = sum_quantity + item.quantity
 
-                OrderItem.objects.bulk_create(orderItems_list, batch_size=10)                
-                order.save()
+                # order totals are stored at checkout so listing orders never
+                # has to aggregate the order items again
+                order = Order.objects.create(
+                    **validated_data,
+                    created_by=user,
+                    item_count=len(orderItems_list),
+                    total_quantity=sum_quantity,
+                    grand_total=sum_total_price,
+                    total_cost=sum_total_cost,
+                )
+                for orderItems in orderItems_list:
+                    orderItems.order = order
+                OrderItem.objects.bulk_create(orderItems_list, batch_size=10)
+                SalesRollup.objects.record(orderItems_list)
+                cart_items.delete()
 
                 # create notification for low stock products
                 if product.current_quantity <= product.minimum_stock_quantity:
@@ -390,44 +452,146 @@ class NotificationListSerializer(serializers.ModelSerializer):
         return None
 
 
+class NotificationRowSerializer(RowSerializer):
+    """Output of NotificationListSerializer from values_list() rows"""
+    model = Notification
+    fields = (
+        "id",
+        ("product", "product", ProductRowSerializer),
+        "created_at",
+        "updated_at",
+        "text",
+        "type",
+        "status",
+    )
+
+
 class MarkASReadSerializer(serializers.Serializer):
     id = serializers.UUIDField(read_only=True)
 
 
 class OrderListSerializer(serializers.Serializer):
-    """gets each customer product details"""
-    order = serializers.SerializerMethodField("get_orders", read_only=True)
-    customer = serializers.SerializerMethodField("get_customers", read_only=True)
-    product = serializers.SerializerMethodField("get_product_count", read_only=True)
-    total_amount = serializers.SerializerMethodField("get_total_amount", read_only=True)
-    
-    @extend_schema_field(OpenApiTypes.OBJECT)
-    def get_orders(self, obj):
-        serializers = OrderSerializer(obj)
-        return serializers.data
-    
-    @extend_schema_field(OpenApiTypes.OBJECT)
-    def get_customers(self, obj):
-        qs = Customer.objects.filter(id=obj.customer_id).first()
-        if qs:
-            serializers = CustomerListSerializer(qs)
-            return serializers.data
-        return None
-    
-    @extend_schema_field(OpenApiTypes.STR)
-    def get_total_product(self, obj):
-        product_count = OrderItem.objects.filter(order=obj.id).count()
-        return product_count
-    
-    @extend_schema_field(OpenApiTypes.STR)
-    def get_total_amount(self, obj):
-        orderItems = OrderItem.objects.filter(order=obj.id)
-        amount = []
-        for sale in orderItems:
-            product = ProductInventory.objects.filter(id=sale.product_id).first()
-            if product:
-                cost = (
-                    sale.quantity * product.selling_price
-                ) - sale.discount_selling_price
-                amount.append(int(cost))
-        return sum(amount)
+    """gets each customer product details
+
+    Reads the order totals stored at checkout and the customer joined in by
+    the viewset, so serializing a page of orders issues no extra queries.
+    """
+    order = OrderListMainSerializer(source="*", read_only=True)
+    customer = CustomerListSerializer(read_only=True)
+    product = serializers.IntegerField(source="item_count", read_only=True)
+    total_amount = serializers.DecimalField(
+        max_digits=12, decimal_places=2, source="grand_total", read_only=True
+    )
+
+
+class ArchivedOrderQuerySerializer(serializers.Serializer):
+    customer = serializers.UUIDField(required=False)
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+
+
+class ArchivedOrderItemSerializer(serializers.Serializer):
+    """order item as written to the archive"""
+    id = serializers.UUIDField(read_only=True)
+    product = serializers.UUIDField(source="product_id", read_only=True)
+    quantity = serializers.IntegerField(read_only=True)
+    product_cost_price = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    selling_price = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    total_price = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    created_at = serializers.DateTimeField(read_only=True)
+
+
+class ArchivedOrderSerializer(serializers.Serializer):
+    """order as written to the archive, customers are referenced by id as
+    they may have changed or gone since"""
+    id = serializers.UUIDField(read_only=True)
+    customer = serializers.UUIDField(source="customer_id", read_only=True)
+    amount_payment = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    balance = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    total_price = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    payment_date = serializers.DateTimeField(read_only=True)
+    grand_total = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    item_count = serializers.IntegerField(read_only=True)
+    total_quantity = serializers.IntegerField(read_only=True)
+    total_cost = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    created_at = serializers.DateTimeField(read_only=True)
+    items = ArchivedOrderItemSerializer(many=True, read_only=True)
+
+
+class SalesAnalyticsQuerySerializer(serializers.Serializer):
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    bucket = serializers.ChoiceField(choices=BUCKETS, default="day")
+    product = serializers.UUIDField(required=False)
+    category = serializers.CharField(required=False)
+    label = serializers.UUIDField(required=False)
+
+    def validate(self, attrs):
+        attrs.setdefault("end", timezone.now())
+        attrs.setdefault("start", attrs["end"] - datetime.timedelta(days=SALES_ANALYTICS_DAYS))
+        if attrs["start"] >= attrs["end"]:
+            raise serializers.ValidationError({"start": "start must be before end"})
+        if attrs["bucket"] == "hour" and attrs["end"] - attrs["start"] > datetime.timedelta(
+            days=HOURLY_MAX_DAYS
+        ):
+            raise serializers.ValidationError(
+                {"bucket": f"Hourly buckets cover at most {HOURLY_MAX_DAYS} days"}
+            )
+        return attrs
+
+
+class SalesBucketSerializer(serializers.Serializer):
+    period = serializers.DateTimeField(read_only=True)
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    cost = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    margin = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    units = serializers.IntegerField(read_only=True)
+
+
+class SalesAnalyticsSerializer(serializers.Serializer):
+    bucket = serializers.ChoiceField(choices=BUCKETS, read_only=True)
+    start = serializers.DateTimeField(read_only=True)
+    end = serializers.DateTimeField(read_only=True)
+    source = serializers.ChoiceField(choices=("live", "rollup"), read_only=True)
+    buckets = SalesBucketSerializer(many=True, read_only=True)
+
+
+class DashboardSalesSerializer(serializers.Serializer):
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    cost = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    margin = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    units = serializers.IntegerField(read_only=True)
+
+
+class DashboardSummarySerializer(serializers.Serializer):
+    items = serializers.IntegerField(read_only=True, allow_null=True)
+    values = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True, allow_null=True)
+
+
+class DashboardNotificationsSerializer(serializers.Serializer):
+    count = serializers.IntegerField(read_only=True)
+    results = NotificationListSerializer(many=True, read_only=True)
+
+
+class DashboardRestockNoticeSerializer(serializers.Serializer):
+    count = serializers.IntegerField(read_only=True)
+    results = RestockNoticeSerializer(many=True, read_only=True)
+
+
+class DashboardTimingsSerializer(serializers.Serializer):
+    inventory_summary = serializers.FloatField(read_only=True)
+    cart_details = serializers.FloatField(read_only=True)
+    unread_notifications = serializers.FloatField(read_only=True)
+    restock_notice = serializers.FloatField(read_only=True)
+    sales_today = serializers.FloatField(read_only=True)
+
+
+class DashboardSerializer(serializers.Serializer):
+    """What order/dashboard/ returns, the milliseconds each section took
+    under timings"""
+    inventory_summary = DashboardSummarySerializer(read_only=True)
+    cart_details = DashboardSummarySerializer(read_only=True)
+    unread_notifications = DashboardNotificationsSerializer(read_only=True)
+    restock_notice = DashboardRestockNoticeSerializer(read_only=True)
+    sales_today = DashboardSalesSerializer(read_only=True)
+    timings = DashboardTimingsSerializer(read_only=True)
@@ -1,5 +1,5 @@
 from django.urls import path, include
-from rest_framework.routers import DefaultRouter
+from rest_framework.routers import DefaultRouter, SimpleRouter
 from .views import CartViewSet, CustomerViewSet, OrdersViewSet, NotificationViewSet
 
 
@@ -7,10 +7,17 @@ app_name = "order"
 
 router = DefaultRouter()
 router.register("cart", CartViewSet)
-router.register("cart", CustomerViewSet)
-router.register("cart", NotificationViewSet)
+router.register("customer", CustomerViewSet)
+router.register("notification", NotificationViewSet)
 router.register("", OrdersViewSet)
 
+# The notification routes clients reached under cart/ before the viewsets
+# got prefixes of their own. The cart detail route shadowed the others.
+LEGACY_ROUTES = ["cart-notification-mark-read", "cart-notification-restock-notice"]
+legacy_router = SimpleRouter()
+legacy_router.register("cart", NotificationViewSet, basename="cart-notification")
+
 urlpatterns = [
+    path("", include([url for url in legacy_router.urls if url.name in LEGACY_ROUTES])),
     path("", include(router.urls)),
 ]
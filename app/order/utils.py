@@ -1,8 +1,13 @@
 import re
+from functools import lru_cache
+
+PHONE_INVALID_CHARACTERS = re.compile(r'[@_!#$%^&*()<>?/\|}{~`:;,.-]')
+# plain ASCII dot-atom local part as accepted by email_validator
+EMAIL_LOCAL_PART = re.compile(r"[a-z0-9!#$%&'*+/=?^_`{|}~-]+(\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*")
+
 
 def sanitize_phone_number(value):
-    regex = re.compile('[@_!#$%^&*()<>?/\|}{~`:;,.-]')
-    if regex.search(value) != None:
+    if PHONE_INVALID_CHARACTERS.search(value) is not None:
         return {"message": "Invalid Phone Number"}
     if value.startswith("+") and len(value) == 14:
         return value
@@ -13,4 +18,74 @@ def sanitize_phone_number(value):
     elif len(value) == 13 and value.startswith("234"):
         return f"+{value}"
     return {"message": "Number {0} is invalid nigerian number".format(value)}
-    
\ No newline at end of file
+
+
+def sanitize_phone_numbers(values):
+    """Sanitizes a whole column of phone numbers, returning a list aligned with
+    values where blanks are None and invalid numbers are error dicts"""
+    sanitized = {}
+    results = []
+    for value in values:
+        value = (value or "").strip()
+        if not value:
+            results.append(None)
+            continue
+        if value not in sanitized:
+            sanitized[value] = sanitize_phone_number(value)
+        results.append(sanitized[value])
+    return results
+
+
+def sanitize_emails(values):
+    """Validates and lowercases a whole column of emails without the DNS
+    deliverability check, same conventions as sanitize_phone_numbers"""
+    # imported when needed, it loads dnspython and slows every start
+    from email_validator import validate_email, EmailNotValidError
+    results = []
+    for value in values:
+        value = (value or "").strip().lower()
+        if not value:
+            results.append(None)
+            continue
+        local, _, domain = value.rpartition("@")
+        try:
+            if len(local) <= 64 and EMAIL_LOCAL_PART.fullmatch(local):
+                results.append(f"{local}@{validate_email_domain(domain)}")
+            else:
+                results.append(validate_email(value, check_deliverability=False).email)
+        except EmailNotValidError:
+            results.append({"message": "Email {0} is not valid".format(value)})
+    return results
+
+
+@lru_cache(maxsize=4096)
+def validate_email_domain(domain):
+    """Imported columns share a handful of domains, validate each one once"""
+    from email_validator import validate_email
+    return validate_email(f"user@{domain}", check_deliverability=False).domain
+
+
+# placeholders written by the customer serializers when a field is left out
+ANONYMOUS_NAME = "Anonymous"
+EMPTY_CONTACT = "None"
+
+
+def normalize_name(value):
+    if not value or value == ANONYMOUS_NAME:
+        return None
+    return " ".join(value.split()).lower()
+
+
+def normalize_phone(value):
+    if not value or value == EMPTY_CONTACT:
+        return None
+    phone_number = sanitize_phone_number(value.strip())
+    if isinstance(phone_number, dict):
+        return value.strip()
+    return phone_number
+
+
+def normalize_email(value):
+    if not value or value == EMPTY_CONTACT:
+        return None
+    return value.strip().lower()
@@ -1,35 +1,54 @@
 from rest_framework.response import Response
 from rest_framework import viewsets, status, filters
+from rest_framework import serializers
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from drf_spectacular.utils import extend_schema
 from drf_spectacular.utils import extend_schema
 from django.db.models import Count, Sum, F
 from sentry_sdk import capture_exception
-from django.db import transaction
-from inventory.models import ProductInventory
+from core.async_views import AsyncViewSetMixin
+from core.db.routers import ReplicaRoutingMixin
+from core.serializers import RowListMixin
+from inventory.models import ProductInventory, StockMovement
+from inventory.search import TrigramSearchFilter
+from inventory.stock import release
 from .models import Cart, Customer, OrderItem, Order, Notification
+from .analytics import sales
+from . import dashboard as home_screen
+from .archive import archived_orders
+from .imports import CustomerImport
 from .serializers import (
+    ArchivedOrderQuerySerializer,
+    ArchivedOrderSerializer,
+    SalesAnalyticsQuerySerializer,
+    SalesAnalyticsSerializer,
     CartSerializer,
+    CartRowSerializer,
     CustomerDetailSerializer,
     CustomerListSerializer,
+    CustomerImportSerializer,
+    DashboardSerializer,
     OrderItemListSerializer,
     OrderSerializer,
     OrderListSerializer,
     OrderItemListSerializer,
     OrderCustomerSerializer,
     NotificationListSerializer,
+    NotificationRowSerializer,
     MarkASReadSerializer,
     ProductCartSerializer,
-    ProductCartSerializer,
+    RestockNoticeSerializer,
 )
 from order.models import Customer
 
 
-class CartViewSet(viewsets.ModelViewSet):
+class CartViewSet(ReplicaRoutingMixin, RowListMixin, viewsets.ModelViewSet):
     queryset = Cart.objects.all()
     serializer_class = CartSerializer
+    row_serializer_class = CartRowSerializer
     http_method_names = ["get", "post", "patch", "delete"]
     filterset_fields = ["quantity"]
     search_fields = [
@@ -68,7 +87,8 @@ class CartViewSet(viewsets.ModelViewSet):
             user = request.user
             data = request.data
             products = data.get("products", None)
-            with transaction.atomic():
+            # one insert for the stock movements of all the products
+            with StockMovement.objects.batch():
                 for product in products:
                     product_instance = ProductInventory.objects.get(pk=product)
                     # Product exists in cart
@@ -107,9 +127,7 @@ class CartViewSet(viewsets.ModelViewSet):
                 return Response(
                     {"message": "Item not in cart"}, status=status.HTTP_404_NOT_FOUND
                 )
-            product = item.product
-            product.current_quantity = product.current_quantity + item.quantity
-            product.save()
+            release(item.product, item.quantity)
             item.delete()
 
             return Response(
@@ -170,17 +188,18 @@ class CartViewSet(viewsets.ModelViewSet):
             )
 
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(ReplicaRoutingMixin, viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerListSerializer
     http_method_names = ["get", "post", "patch", "delete"]
+    replica_actions = ["list"]
     filterset_fields = [
         "customer_name",
     ]
     search_fields = ["customer_name", "customer_email", "customer_phone"]
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
+        TrigramSearchFilter,
         filters.OrderingFilter,
     ]
     permission_classes = [IsAuthenticated]
@@ -215,6 +234,10 @@ class CustomerViewSet(viewsets.ModelViewSet):
                 {"success": False, "error": serializer.errors},
                 status.HTTP_400_BAD_REQUEST,
             )
+        except serializers.ValidationError as e:
+            return Response(
+                {"success": False, "error": e.detail[0]}, status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             capture_exception(e)
             return Response(
@@ -245,6 +268,10 @@ class CustomerViewSet(viewsets.ModelViewSet):
                 {"success": False, "error": serializer.errors},
                 status.HTTP_400_BAD_REQUEST,
             )
+        except serializers.ValidationError as e:
+            return Response(
+                {"success": False, "error": e.detail[0]}, status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             capture_exception(e)
             return Response(
@@ -253,23 +280,72 @@ class CustomerViewSet(viewsets.ModelViewSet):
             )
 
 
-class OrdersViewSet(viewsets.GenericViewSet):
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="import",
+        serializer_class=CustomerImportSerializer,
+        parser_classes=[MultiPartParser],
+        permission_classes=[IsAuthenticated],
+    )
+    def import_customers(self, request):
+        """This endpoint for RETAILERS to import customers from a CSV file in bulk"""
+        try:
+            serializer = self.get_serializer(data=request.data)
+            if serializer.is_valid():
+                customer_import = CustomerImport.from_csv(
+                    request.user, serializer.validated_data["file"]
+                )
+                return Response(
+                    {"success": True, "result": customer_import.result},
+                    status=status.HTTP_200_OK,
+                )
+            return Response(
+                {"success": False, "error": serializer.errors},
+                status.HTTP_400_BAD_REQUEST,
+            )
+        except Exception as e:
+            capture_exception(e)
+            return Response(
+                {"success": False, "message": str(e)},
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+def dashboard_response(data, timings):
+    response = Response(
+        {"success": True, "result": {**data, "timings": timings}}, status=status.HTTP_200_OK
+    )
+    response["Server-Timing"] = ", ".join(
+        f"{section};dur={milliseconds}" for section, milliseconds in timings.items()
+    )
+    return response
+
+
+class OrdersViewSet(ReplicaRoutingMixin, AsyncViewSetMixin, viewsets.GenericViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderListSerializer
     http_method_names = ["get", "post", "patch", "delete"]
+    replica_actions = ["list", "get_products", "get_customers", "sales", "dashboard"]
     filter_backends = [
         DjangoFilterBackend,
         filters.SearchFilter,
         filters.OrderingFilter,
     ]
     # filterset_class = OrderFilter
+    # order items are partitioned by month, a created_at range only scans
+    # the partitions it covers
+    filterset_fields = {"created_at": ["gte", "lt"]}
     search_fields = [
-        "product__name",
+        "customer__customer_name",
     ]
+    ordering_fields = ["created_at", "grand_total", "item_count"]
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         queryset = Order.objects.filter(created_by=self.request.user)
+        if self.action == "list":
+            return queryset.select_related("customer")
         if self.action == "get_products" or self.action == "get_customers":
             return OrderItem.objects.filter(created_by=self.request.user)
         return queryset
@@ -291,6 +367,29 @@ class OrdersViewSet(viewsets.GenericViewSet):
             return OrderSerializer
         return super().get_serializer_class()        
     
+    @extend_schema(responses={200: OrderListSerializer(many=True)})
+    def list(self, request):
+        """This endpoint to get a paginated list of orders with their customer and totals"""
+        try:
+            data = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(data)
+            if page is not None:
+                serializer = OrderListSerializer(page, many=True)
+                results = self.get_paginated_response(serializer.data)
+                return Response(
+                    {"success": True, "result": results.data}, status=status.HTTP_200_OK
+                )
+            serializer = OrderListSerializer(data, many=True)
+            return Response(
+                {"success": True, "result": serializer.data}, status=status.HTTP_200_OK
+            )
+        except Exception as e:
+            capture_exception(e)
+            return Response(
+                {"success": False, "message": str(e)},
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+    
     def create(self, request):
         """This endpoint creates order items"""
         try:
@@ -385,18 +484,132 @@ class OrdersViewSet(viewsets.GenericViewSet):
             )
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
+    @extend_schema(
+        parameters=[SalesAnalyticsQuerySerializer],
+        responses={200: SalesAnalyticsSerializer},
+    )
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="sales",
+        serializer_class=SalesAnalyticsSerializer,
+        permission_classes=[IsAuthenticated],
+        filter_backends=[],
+    )
+    def sales(self, request):
+        """This endpoint to get the revenue, cost, margin and units sold per hour, day,
+        week or month over a period, the last 30 days by default"""
+        try:
+            query = SalesAnalyticsQuerySerializer(data=request.query_params)
+            if not query.is_valid():
+                return Response(
+                    {"success": False, "error": query.errors},
+                    status.HTTP_400_BAD_REQUEST,
+                )
+            params = query.validated_data
+            source, buckets = sales(
+                request.user,
+                params["start"],
+                params["end"],
+                params["bucket"],
+                product=params.get("product"),
+                category=params.get("category"),
+                label=params.get("label"),
+            )
+            serializer = SalesAnalyticsSerializer(
+                {**params, "source": source, "buckets": buckets}
+            )
+            return Response({"success": True, "result": serializer.data}, status=status.HTTP_200_OK)
+        except Exception as e:
+            capture_exception(e)
+            return Response(
+                {"success": False, "message": str(e)},
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    @extend_schema(responses={200: DashboardSerializer})
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="dashboard",
+        serializer_class=DashboardSerializer,
+        permission_classes=[IsAuthenticated],
+        filter_backends=[],
+    )
+    def dashboard(self, request):
+        """This endpoint to get the inventory summary, cart details, latest unread notifications,
+        restock notice and today's sales of the home screen at once, with the milliseconds
+        each took, also in the Server-Timing header"""
+        try:
+            return dashboard_response(*home_screen.dashboard(request.user))
+        except Exception as e:
+            capture_exception(e)
+            return Response(
+                {"success": False, "message": str(e)},
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    async def adashboard(self, request):
+        try:
+            return dashboard_response(*await home_screen.adashboard(request.user))
+        except Exception as e:
+            capture_exception(e)
+            return Response(
+                {"success": False, "message": str(e)},
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    @extend_schema(
+        parameters=[ArchivedOrderQuerySerializer],
+        responses={200: ArchivedOrderSerializer(many=True)},
+    )
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="archived",
+        serializer_class=ArchivedOrderSerializer,
+        permission_classes=[IsAuthenticated],
+        filter_backends=[],
+    )
+    def archived(self, request):
+        """This endpoint to get a paginated list of archived orders with their items,
+        optionally of one customer and created between start and end"""
+        try:
+            query = ArchivedOrderQuerySerializer(data=request.query_params)
+            if not query.is_valid():
+                return Response(
+                    {"success": False, "error": query.errors},
+                    status.HTTP_400_BAD_REQUEST,
+                )
+            orders = archived_orders(request.user.pk, **query.validated_data)
+            page = self.paginate_queryset(orders)
+            result = self.get_paginated_response(
+                ArchivedOrderSerializer(page, many=True).data
+            )
+            return Response({"success": True, "result": result.data}, status=status.HTTP_200_OK)
+        except Exception as e:
+            capture_exception(e)
+            return Response(
+                {"success": False, "message": str(e)},
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class NotificationViewSet(ReplicaRoutingMixin, AsyncViewSetMixin, RowListMixin, viewsets.ModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationListSerializer
+    row_serializer_class = NotificationRowSerializer
     http_method_names = ["get", "post"]
+    replica_actions = ["list", "restock_notice"]
     filter_backends = [
         DjangoFilterBackend,
         filters.SearchFilter,
         filters.OrderingFilter,
     ]
-    filterset_fields = [
-        "text",
-    ]
+    filterset_fields = {
+        "text": ["exact"],
+        "created_at": ["gte", "lt"],
+    }
     search_fields = [
         "text",
     ]
@@ -410,11 +623,18 @@ class NotificationViewSet(viewsets.ModelViewSet):
     
     def get_response_data(self, queryset):
         page = self.paginate_queryset(queryset)
-        serializer = self.serializer_class(queryset, many=True)
         if page is not None:
-            result = self.get_paginated_response(serializer.data)
-            return result
-        return serializer
+            serializer = self.serializer_class(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        return Response(self.serializer_class(queryset, many=True).data)
+
+    async def aget_response_data(self, queryset):
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.serializer_class(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        items = [item async for item in queryset]
+        return Response(self.serializer_class(items, many=True).data)
     
     def get_serializer_class(self):
         return super().get_serializer_class()
@@ -426,12 +646,17 @@ class NotificationViewSet(viewsets.ModelViewSet):
         url_path="(?P<id>[^/.]+)/mark-read",
         permission_classes=[IsAuthenticated],
     )
-    def mark_read(self, request, pk=None):
+    def mark_read(self, request, id=None):
         """This endpoint to mark as read notification"""
         try:
             notification = Notification.objects.filter(
-                receiver=request.user, pk=pk
+                receiver=request.user, pk=id
             ).first()
+            if notification is None:
+                return Response(
+                    {"success": False, "error": "Notification not found"},
+                    status.HTTP_404_NOT_FOUND,
+                )
             serializer = NotificationListSerializer(
                 instance=notification, data={"status": "READ"}, partial=True
             )
@@ -452,11 +677,11 @@ class NotificationViewSet(viewsets.ModelViewSet):
                 status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
     
-    @extend_schema(responses={200: ProductCartSerializer(many=True)})
+    @extend_schema(responses={200: RestockNoticeSerializer(many=True)})
     @action(
         methods=["GET"],
         detail=False,
-        serializer_class=ProductCartSerializer,
+        serializer_class=RestockNoticeSerializer,
         url_path="restock-notice",
         permission_classes=[IsAuthenticated],
         filter_backends=[DjangoFilterBackend, filters.SearchFilter],
@@ -471,7 +696,10 @@ class NotificationViewSet(viewsets.ModelViewSet):
     def restock_notice(self, request, pk=None):
         """This endpoint to  get a list of paginated  restock notice product"""
         try:
-            qs = self.get_queryset().filter(created_by=request.user, low_quantity=True)
+            # only the columns of product_low_stock_idx, an index-only scan
+            qs = self.get_queryset().filter(created_by=request.user, low_quantity=True).only(
+                *RestockNoticeSerializer.Meta.fields
+            )
             product = self.filter_queryset(qs)
             return self.get_response_data(product)
         
@@ -481,3 +709,17 @@ class NotificationViewSet(viewsets.ModelViewSet):
                 {"success": False, "message": str(e)},
                 status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+
+    async def arestock_notice(self, request, pk=None):
+        try:
+            qs = self.get_queryset().filter(created_by=request.user, low_quantity=True).only(
+                *RestockNoticeSerializer.Meta.fields
+            )
+            product = self.filter_queryset(qs)
+            return await self.aget_response_data(product)
+        except Exception as e:
+            capture_exception(e)
+            return Response(
+                {"success": False, "message": str(e)},
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )